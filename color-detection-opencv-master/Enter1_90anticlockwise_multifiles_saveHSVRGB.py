@@ -1,18 +1,29 @@
 import sys
-import cv2
-import numpy as np
-import csv
+import argparse
+from dataclasses import replace
 import os
+import shutil
+import tempfile
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton,
-    QVBoxLayout, QHBoxLayout, QTextEdit, QFileDialog, QScrollArea, QGridLayout, QSizePolicy
+    QVBoxLayout, QHBoxLayout, QTextEdit, QFileDialog, QProgressBar
 )
-from PyQt6.QtGui import QImage, QPixmap
 from PyQt6.QtCore import Qt
-import matplotlib.pyplot as plt
+from colordetect.lazy import LazyModule
+from colordetect.engine import PipelineConfig, process_image
+from colordetect.gallery import ThumbnailGallery
+from colordetect.qtwidgets import ImageViewer
+from colordetect.qtworker import BatchWorker
+from colordetect.sink import CsvSink, read_rows, result_header
+from colordetect.table import TABLE_FILTER, is_columnar, run_metadata, write_rows
+
+# pyplot is imported when the first plot is opened, not at start-up
+plt = LazyModule("matplotlib.pyplot")
+
+AUTOSAVE_NAME = "light_intensity_autosave.csv"
 
 class ImageProcessor(QWidget):
-    def __init__(self):
+    def __init__(self, autosave_dir=None):
         super().__init__()
 
         self.text_box = QTextEdit(self)
@@ -20,45 +31,57 @@ class ImageProcessor(QWidget):
         self.save_button = QPushButton("Save Last Image", self)
         self.save_csv_button = QPushButton("Save Light Intensity CSV", self)
         self.plot_button = QPushButton("Plot Light Intensity", self)
+        self.cancel_button = QPushButton("Cancel", self)
         self.exit_button = QPushButton("Exit", self)
+        self.progress_bar = QProgressBar(self)
 
-        self.annotated_images = []  # Store all annotated images
-        self.image_labels = []      # Store QLabel widgets for images
-        self.light_intensity_data = []  # Store tuples: (image_idx, object_idx, blue_intensity)
+        self.worker = None          # BatchWorker of the batch in progress
+        self.sink = None
+        self.viewers = []           # Open full resolution windows
+        # Rows are streamed to this CSV as images complete instead of kept in memory
+        self.autosave_path = ""
+        # Folder of the autosave CSV; None writes it next to the images
+        self.autosave_dir = autosave_dir
+        self.rows_written = 0
 
         self.input_image_dir = ""  # Store directory of first input image
 
+        # Blue object detection on images rotated 90 degrees anticlockwise
+        self.config = PipelineConfig(mode="objects", rotate=True)
+
         # Set button widths
         self.open_button.setFixedWidth(200)
         self.save_button.setFixedWidth(150)
         self.save_csv_button.setFixedWidth(200)
         self.plot_button.setFixedWidth(200)
+        self.cancel_button.setFixedWidth(80)
+        self.cancel_button.setEnabled(False)
         self.exit_button.setFixedWidth(50)
 
         self.open_button.clicked.connect(self.open_images)
         self.save_button.clicked.connect(self.save_image)
         self.save_csv_button.clicked.connect(self.save_csv)
         self.plot_button.clicked.connect(self.plot_light_intensity)
+        self.cancel_button.clicked.connect(self.cancel_processing)
         self.exit_button.clicked.connect(self.close)
 
         layout = QVBoxLayout()
 
-        # Scroll area for images
-        self.scroll_area = QScrollArea(self)
-        self.scroll_widget = QWidget()
-        self.grid_layout = QGridLayout(self.scroll_widget)
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setWidget(self.scroll_widget)
-        layout.addWidget(self.scroll_area)
+        # Thumbnail gallery: only visible tiles are decoded and painted
+        self.gallery = ThumbnailGallery((200, 150), parent=self)
+        self.gallery.image_clicked.connect(self.show_full_image)
+        layout.addWidget(self.gallery)
 
         self.text_box.setFixedHeight(100)
         layout.addWidget(self.text_box)
+        layout.addWidget(self.progress_bar)
 
         button_layout = QHBoxLayout()
         button_layout.addWidget(self.open_button)
         button_layout.addWidget(self.save_button)
         button_layout.addWidget(self.save_csv_button)
         button_layout.addWidget(self.plot_button)
+        button_layout.addWidget(self.cancel_button)
         button_layout.addWidget(self.exit_button)
         layout.addLayout(button_layout)
 
@@ -70,6 +93,7 @@ class ImageProcessor(QWidget):
         self.window_width = int(screen.width() * 0.75)
         self.window_height = int(screen.height() * 0.75)
         self.resize(self.window_width, self.window_height)
+        self.gallery.set_tile_size(self.thumbnail_size())
 
     def open_images(self):
         file_names, _ = QFileDialog.getOpenFileNames(
@@ -77,31 +101,83 @@ class ImageProcessor(QWidget):
         )
         if file_names:
             self.input_image_dir = os.path.dirname(file_names[0])  # Store directory for CSV default
-            self.annotated_images.clear()
+            self.gallery.thumbnail_model.clear()
             self.text_box.clear()
-            self.light_intensity_data.clear()
-            # Remove old QLabel widgets from grid
-            for label in self.image_labels:
-                self.grid_layout.removeWidget(label)
-                label.deleteLater()
-            self.image_labels.clear()
-
-            all_dimensions = []
-            all_summaries = []
-            for idx, file_name in enumerate(file_names):
-                annotated_img, dimensions, summary, intensities = self.process_image(file_name, idx+1)
-                if annotated_img is not None:
-                    self.annotated_images.append(annotated_img)
-                    all_dimensions.extend(dimensions)
-                    all_summaries.append(f"Image {idx+1}: {summary.strip()}")
-                    self.light_intensity_data.extend(intensities)
-            self.display_images(self.annotated_images)
-            self.text_box.append("\n".join(all_dimensions))
-            self.text_box.append("\n".join(all_summaries))
+            self.rows_written = 0
+            self.sink = self.open_autosave()
+
+            # Process in the background; tiles and text arrive one image at a time
+            self.config.thumbnail_size = self.thumbnail_size()
+            self.worker = BatchWorker(file_names, self.config, parent=self)
+            self.worker.result_ready.connect(self.on_image_processed)
+            self.worker.progress.connect(self.on_progress)
+            self.worker.finished.connect(self.on_batch_finished)
+            self.set_running(True, len(file_names))
+            self.worker.start()
+
+    def open_autosave(self):
+        # Next to the images unless a folder was given; a read-only image folder
+        # falls back to a new file in the temp folder
+        directory = self.autosave_dir or self.input_image_dir
+        self.autosave_path = os.path.join(directory, AUTOSAVE_NAME)
+        try:
+            return CsvSink(self.autosave_path, result_header("objects"))
+        except OSError as e:
+            self.text_box.append(f"Cannot autosave to {directory} ({e.strerror}).")
+        try:
+            fd, self.autosave_path = tempfile.mkstemp(prefix="light_intensity_", suffix="_autosave.csv")
+            os.close(fd)
+            sink = CsvSink(self.autosave_path, result_header("objects"))
+        except OSError as e:
+            self.text_box.append(f"Autosave disabled ({e.strerror}); results are only shown.")
+            self.autosave_path = ""
+            return None
+        self.text_box.append(f"Autosaving to {self.autosave_path}")
+        return sink
+
+    def on_image_processed(self, idx, file_name, result):
+        annotated_img, dimensions, summary, intensities = result
+        if annotated_img is not None:
+            self.gallery.thumbnail_model.append(file_name, idx + 1, annotated_img)
+            if dimensions:
+                self.text_box.append("\n".join(dimensions))
+            self.text_box.append(f"Image {idx+1}: {summary.strip()}")
+            if self.sink is not None:
+                self.sink.write([list(row) + [file_name] for row in intensities])
+                self.rows_written += len(intensities)
+
+    def on_progress(self, done, total):
+        self.progress_bar.setValue(done)
+
+    def on_batch_finished(self):
+        if self.worker.cancelled:
+            self.text_box.append(f"Cancelled after {self.progress_bar.value()} images.")
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+        self.worker = None
+        self.set_running(False)
+
+    def cancel_processing(self):
+        if self.worker is not None:
+            self.worker.cancel()
+
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+        super().closeEvent(event)
+
+    def set_running(self, running, total=0):
+        self.open_button.setEnabled(not running)
+        self.cancel_button.setEnabled(running)
+        if running:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(0)
 
     def save_image(self):
         # Save the entire grid of images (all subplots), not just the visible part
-        if self.annotated_images:
+        if self.gallery.thumbnail_model.rowCount():
             filename, selected_filter = QFileDialog.getSaveFileName(
                 self, "Save Image", "", "PNG Files (*.png);;JPEG Files (*.jpg)"
             )
@@ -112,35 +188,42 @@ class ImageProcessor(QWidget):
                         filename += ".png"
                     else:
                         filename += ".jpg"
-                # Grab the entire scroll_widget (the full grid), not just the visible area
-                pixmap = self.scroll_widget.grab()
-                pixmap.save(filename)
+                # Lay out every thumbnail, not just the tiles currently on screen
+                self.gallery.save_montage(filename)
                 self.text_box.append(f"Saved subplot image to {filename}")
         else:
             self.text_box.append("No image to save.")
 
+    def flush_autosave(self):
+        # While a batch runs the last rows may still be buffered in the sink
+        if self.sink is not None:
+            self.sink.flush()
+
+    def has_light_intensity_data(self):
+        return self.rows_written > 0 and os.path.exists(self.autosave_path)
+
     def save_csv(self):
-        if not self.light_intensity_data:
+        self.flush_autosave()
+        if not self.has_light_intensity_data():
             self.text_box.append("No light intensity data to save.")
             return
         # Set default path to input image directory
         default_path = os.path.join(self.input_image_dir if self.input_image_dir else "", "light_intensity.csv")
         filename, _ = QFileDialog.getSaveFileName(
-            self, "Save CSV", default_path, "CSV Files (*.csv)"
+            self, "Save CSV", default_path, TABLE_FILTER
         )
         if filename:
-            with open(filename, mode='w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow([
-                    "Image Index", "Object Index", "Light Intensity",
-                    "Avg H", "Avg S", "Avg V", "Avg R", "Avg G", "Avg B"
-                ])
-                for row in self.light_intensity_data:
-                    writer.writerow(row)
+            if is_columnar(filename):
+                metadata = run_metadata(self.config, self.gallery.thumbnail_model.files())
+                write_rows(filename, result_header("objects"), list(read_rows(self.autosave_path)), metadata)
+            # The rows are already on disk in the autosave file
+            elif os.path.abspath(filename) != os.path.abspath(self.autosave_path):
+                shutil.copyfile(self.autosave_path, filename)
             self.text_box.append(f"Saved light intensity data to {filename}")
 
     def plot_light_intensity(self):
-        if not self.light_intensity_data:
+        self.flush_autosave()
+        if not self.has_light_intensity_data():
             self.text_box.append("No light intensity data to plot.")
             return
 
@@ -152,7 +235,7 @@ class ImageProcessor(QWidget):
         y_r = []
         y_g = []
         y_b = []
-        for img_idx, obj_idx, blue_intensity, avg_h, avg_s, avg_v, avg_r, avg_g, avg_b in self.light_intensity_data:
+        for img_idx, obj_idx, blue_intensity, avg_h, avg_s, avg_v, avg_r, avg_g, avg_b, _ in read_rows(self.autosave_path):
             x_labels.append(f"Img{img_idx}-Obj{obj_idx}")
             y_intensity.append(blue_intensity)
             y_h.append(avg_h)
@@ -200,123 +283,26 @@ class ImageProcessor(QWidget):
         plt.show(block=False)
 
     def process_image(self, file_name, image_idx):
-        image = cv2.imread(file_name)
-        if image is None:
-            print(f"Error: Could not open image {file_name}.")
-            return None, [], "", []
-
-        # rotate 90 degrees anticlockwise
-        image = cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-
-        lower_blue = np.array([90, 200, 180])
-        upper_blue = np.array([130, 255, 255])
-
-        mask = cv2.inRange(hsv, lower_blue, upper_blue)
-
-        kernel = np.ones((5, 5), np.uint8)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-
-        contours, _ = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-
-        dimensions = []
-        count_large = 0
-        count_medium = 0
-        count_small = 0
-        object_index = 1
-        intensities = []
-
-        for cnt in contours:
-            area = cv2.contourArea(cnt)
-            if area > 50000:  # Adjusted threshold for larger objects
-                x, y, w, h = cv2.boundingRect(cnt)
-                cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-                label_text = f"Object #{object_index}"
-
-                # Centered top label text
-                font_scale = 1.5
-                thickness = 2
-                font = cv2.FONT_HERSHEY_SIMPLEX
-                text_size, _ = cv2.getTextSize(label_text, font, font_scale, thickness)
-                text_width, text_height = text_size
-                text_x = x + (w - text_width) // 2
-                text_y = max(y - 10, text_height + 5)
-
-                cv2.putText(
-                    image, label_text, (text_x, text_y),
-                    font, font_scale, (0, 255, 0), thickness, cv2.LINE_AA
-                )
-
-                roi_bgr = image[y:y + h, x:x + w]
-                roi_hsv = hsv[y:y + h, x:x + w]
-
-                blue_intensity = np.mean(roi_bgr[:, :, 0])
-                avg_h = np.mean(roi_hsv[:, :, 0])
-                avg_s = np.mean(roi_hsv[:, :, 1])
-                avg_v = np.mean(roi_hsv[:, :, 2])
-                avg_r = np.mean(roi_bgr[:, :, 2])
-                avg_g = np.mean(roi_bgr[:, :, 1])
-                avg_b = np.mean(roi_bgr[:, :, 0])
-
-                intensities.append((image_idx, object_index, blue_intensity, avg_h, avg_s, avg_v, avg_r, avg_g, avg_b))
-
-                if area > 25000:
-                    size_category = "Large"
-                    count_large += 1
-                elif area > 5000:
-                    size_category = "Medium"
-                    count_medium += 1
-                else:
-                    size_category = "Small"
-                    count_small += 1
-
-                dimensions.append(
-                    f"{label_text}: W: {w}, H: {h}, Area: {area:.0f}, "
-                    f"Light Intensity: {blue_intensity:.2f}, "
-                    f"HSV: ({avg_h:.1f}, {avg_s:.1f}, {avg_v:.1f}), "
-                    f"RGB: ({avg_r:.1f}, {avg_g:.1f}, {avg_b:.1f}), "
-                    f"Size: {size_category}"
-                )
-
-                object_index += 1
-
-        total_objects = count_large + count_medium + count_small
-        summary = (f"Total Objects: {total_objects} | "
-                   f"Large: {count_large} | Medium: {count_medium} | Small: {count_small}")
-
-        return image.copy(), dimensions, summary, intensities
-
-    def display_images(self, images):
-        # Remove old QLabel widgets from grid
-        for label in self.image_labels:
-            self.grid_layout.removeWidget(label)
-            label.deleteLater()
-        self.image_labels.clear()
-
-        # Display images as thumbnails in a grid
-        max_width = self.window_width // 3 - 30
-        max_height = self.window_height // 3 - 30
-        cols = 3
-        for idx, img in enumerate(images):
-            height, width, channel = img.shape
-            bytes_per_line = 3 * width
-            q_image = QImage(img.data, width, height, bytes_per_line, QImage.Format.Format_BGR888)
-            pixmap = QPixmap.fromImage(q_image)
-            if width > max_width or height > max_height:
-                pixmap = pixmap.scaled(
-                    max_width, max_height, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation
-                )
-            label = QLabel()
-            label.setPixmap(pixmap)
-            label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-            self.grid_layout.addWidget(label, idx // cols, idx % cols)
-            self.image_labels.append(label)
+        return process_image(file_name, image_idx, self.config)
+
+    def thumbnail_size(self):
+        return (self.window_width // 3 - 30, self.window_height // 3 - 30)
+
+    def show_full_image(self, row):
+        file_name, image_idx = self.gallery.thumbnail_model.item(row)
+        annotated_img, _, _, _ = process_image(file_name, image_idx, replace(self.config, thumbnail_size=None))
+        if annotated_img is None:
+            self.text_box.append(f"Could not reload image: {file_name}")
+            return
+        viewer = ImageViewer(annotated_img, self.gallery.caption(row))
+        viewer.show()
+        self.viewers = [v for v in self.viewers if v.isVisible()] + [viewer]
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = ImageProcessor()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--autosave-dir", help="folder for the autosave CSV (default: the image folder)")
+    args, qt_args = parser.parse_known_args()
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = ImageProcessor(args.autosave_dir)
     window.show()
     sys.exit(app.exec())
\ No newline at end of file
@@ -81,6 +81,7 @@ class ImageProcessor(QWidget):
         self.resize(1000, 800)
 
         self.original_image = None
+        self.original_hsv = None
         self.annotated_image = None
 
         for slider in self.hsv_sliders.values():
@@ -96,6 +97,8 @@ class ImageProcessor(QWidget):
 
             # Rotate image 90 degrees anticlockwise
             self.original_image = cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+            # Converted once per image; slider moves only re-threshold it
+            self.original_hsv = cv2.cvtColor(self.original_image, cv2.COLOR_BGR2HSV)
             self.update_mask()
 
     def save_result(self):
@@ -112,7 +115,7 @@ class ImageProcessor(QWidget):
             return
 
         image = self.original_image.copy()
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        hsv = self.original_hsv
 
         lower = np.array([
             self.hsv_sliders['Lower H'].value(),
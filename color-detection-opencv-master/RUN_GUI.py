@@ -1,18 +1,29 @@
 import sys
+from dataclasses import replace
 import cv2
 import numpy as np
 import csv
 import os
 from PyQt6.QtWidgets import (
-    QApplication, QWidget, QLabel, QPushButton,
-    QVBoxLayout, QHBoxLayout, QTextEdit, QFileDialog, QScrollArea, QGridLayout, QSizePolicy
+    QApplication, QWidget, QPushButton,
+    QVBoxLayout, QHBoxLayout, QTextEdit, QFileDialog, QProgressBar
 )
-from PyQt6.QtGui import QImage, QPixmap
-from PyQt6.QtCore import Qt
-import matplotlib
-matplotlib.use('QtAgg')
-import matplotlib.pyplot as plt
-from statsmodels.nonparametric.smoothers_lowess import lowess
+from colordetect.lazy import LazyModule
+from colordetect.engine import PipelineConfig, load_preview, process_image
+from colordetect.gallery import ThumbnailGallery
+from colordetect.qtwidgets import ImageViewer
+from colordetect.qtworker import BatchWorker
+
+# pyplot is imported when the first plot is opened, not at start-up
+plt = LazyModule("matplotlib.pyplot", backend="QtAgg")
+
+
+def lowess(*args, **kwargs):
+    # statsmodels takes about a second to import; only pay for it when smoothing
+    from statsmodels.nonparametric.smoothers_lowess import lowess as statsmodels_lowess
+
+    return statsmodels_lowess(*args, **kwargs)
+
 
 class ImageProcessor(QWidget):
     def __init__(self):
@@ -23,37 +34,42 @@ class ImageProcessor(QWidget):
         self.save_button = QPushButton("Save Last Image", self)
         self.save_csv_button = QPushButton("Save Light Intensity CSV", self)
         self.plot_button = QPushButton("Plot Light Intensity", self)
+        self.cancel_button = QPushButton("Cancel", self)
         self.exit_button = QPushButton("Exit", self)
+        self.progress_bar = QProgressBar(self)
 
-        self.annotated_images = []
-        self.image_labels = []
+        self.worker = None          # BatchWorker of the batch in progress
+        self.viewers = []           # Open full resolution windows
         self.light_intensity_data = []
         self.input_image_dir = ""
         self.roi = None
+        self.config = None
 
         self.open_button.clicked.connect(self.open_images)
         self.save_button.clicked.connect(self.save_image)
         self.save_csv_button.clicked.connect(self.save_csv)
         self.plot_button.clicked.connect(self.plot_light_intensity)
+        self.cancel_button.clicked.connect(self.cancel_processing)
+        self.cancel_button.setEnabled(False)
         self.exit_button.clicked.connect(self.close)
 
         layout = QVBoxLayout()
-        self.scroll_area = QScrollArea(self)
-        self.scroll_widget = QWidget()
-        self.grid_layout = QGridLayout(self.scroll_widget)
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setWidget(self.scroll_widget)
-        layout.addWidget(self.scroll_area)
+        # Thumbnail gallery: only visible tiles are decoded and painted
+        self.gallery = ThumbnailGallery((200, 150), parent=self)
+        self.gallery.image_clicked.connect(self.show_full_image)
+        layout.addWidget(self.gallery)
 
         # Set text box height to about 5 lines
         self.text_box.setFixedHeight(90)  # ~5 lines depending on font size
         layout.addWidget(self.text_box)
+        layout.addWidget(self.progress_bar)
 
         button_layout = QHBoxLayout()
         button_layout.addWidget(self.open_button)
         button_layout.addWidget(self.save_button)
         button_layout.addWidget(self.save_csv_button)
         button_layout.addWidget(self.plot_button)
+        button_layout.addWidget(self.cancel_button)
         button_layout.addWidget(self.exit_button)
         layout.addLayout(button_layout)
 
@@ -64,6 +80,7 @@ class ImageProcessor(QWidget):
         self.window_width = int(screen.width() * 0.75)
         self.window_height = int(screen.height() * 0.75)
         self.resize(self.window_width, self.window_height)
+        self.gallery.set_tile_size(self.thumbnail_size())
 
     def open_images(self):
         file_names, _ = QFileDialog.getOpenFileNames(
@@ -71,31 +88,76 @@ class ImageProcessor(QWidget):
         )
         if file_names:
             self.input_image_dir = os.path.dirname(file_names[0])
-            self.annotated_images.clear()
+            self.gallery.thumbnail_model.clear()
             self.text_box.clear()
             self.light_intensity_data.clear()
-            self.roi = None
-
-            for label in self.image_labels:
-                self.grid_layout.removeWidget(label)
-                label.deleteLater()
-            self.image_labels.clear()
-
-            all_dimensions = []
-            all_summaries = []
-            for idx, file_name in enumerate(file_names):
-                annotated_img, dimensions, summary, intensities = self.process_image(file_name, idx + 1)
-                if annotated_img is not None:
-                    self.annotated_images.append(annotated_img)
-                    all_dimensions.extend(dimensions)
-                    all_summaries.append(f"Image {idx + 1}: {summary.strip()}")
-                    self.light_intensity_data.extend(intensities)
-            self.display_images(self.annotated_images)
-            self.text_box.append("\n".join(all_dimensions))
-            self.text_box.append("\n".join(all_summaries))
+            self.roi = self.select_roi(file_names)
+            if self.roi is None:
+                return
+            self.config = PipelineConfig(mode="roi", rois=[self.roi], thumbnail_size=self.thumbnail_size())
+
+            # Process all images in the background; tiles and text arrive one image at a time
+            self.worker = BatchWorker(file_names, self.config, parent=self)
+            self.worker.result_ready.connect(self.on_image_processed)
+            self.worker.progress.connect(self.on_progress)
+            self.worker.finished.connect(self.on_batch_finished)
+            self.set_running(True, len(file_names))
+            self.worker.start()
+
+    def select_roi(self, file_names):
+        # The ROI is drawn on the first image that can be read
+        for file_name in file_names:
+            # Decode at reduced resolution; the window only needs screen-sized pixels
+            image_disp, scale = load_preview(file_name, self.window_width, self.window_height)
+            if image_disp is None:
+                print(f"Error: Could not open image {file_name}.")
+                continue
+            roi_disp = cv2.selectROI("Select ROI", image_disp, showCrosshair=True, fromCenter=False)
+            cv2.destroyWindow("Select ROI")
+            if roi_disp == (0, 0, 0, 0):
+                self.text_box.append("No ROI selected.")
+                return None
+            x, y, w, h = [int(v / scale) for v in roi_disp]
+            self.text_box.append(f"ROI coordinates for 1st image: x={x}, y={y}, w={w}, h={h}")
+            return (x, y, w, h)
+        return None
+
+    def on_image_processed(self, idx, file_name, result):
+        annotated_img, dimensions, summary, intensities = result
+        if annotated_img is not None:
+            self.gallery.thumbnail_model.append(file_name, idx + 1, annotated_img)
+            self.text_box.append("\n".join(dimensions))
+            self.text_box.append(f"Image {idx + 1}: {summary.strip()}")
+            self.light_intensity_data.extend(intensities)
+
+    def on_progress(self, done, total):
+        self.progress_bar.setValue(done)
+
+    def on_batch_finished(self):
+        if self.worker.cancelled:
+            self.text_box.append(f"Cancelled after {self.progress_bar.value()} images.")
+        self.worker = None
+        self.set_running(False)
+
+    def cancel_processing(self):
+        if self.worker is not None:
+            self.worker.cancel()
+
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+        super().closeEvent(event)
+
+    def set_running(self, running, total=0):
+        self.open_button.setEnabled(not running)
+        self.cancel_button.setEnabled(running)
+        if running:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(0)
 
     def save_image(self):
-        if self.annotated_images:
+        if self.gallery.thumbnail_model.rowCount():
             filename, selected_filter = QFileDialog.getSaveFileName(
                 self, "Save Image", "", "PNG Files (*.png);;JPEG Files (*.jpg)"
             )
@@ -105,8 +167,8 @@ class ImageProcessor(QWidget):
                         filename += ".png"
                     else:
                         filename += ".jpg"
-                pixmap = self.scroll_widget.grab()
-                pixmap.save(filename)
+                # Lay out every thumbnail, not just the tiles currently on screen
+                self.gallery.save_montage(filename)
                 self.text_box.append(f"Saved subplot image to {filename}")
         else:
             self.text_box.append("No image to save.")
@@ -377,87 +439,20 @@ class ImageProcessor(QWidget):
         plt.show(block=False) """
 
     def process_image(self, file_name, image_idx):
-        image = cv2.imread(file_name)
-        if image is None:
-            print(f"Error: Could not open image {file_name}.")
-            return None, [], "", []
-
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-
-        # Fixed ROI selection for the first image
-        #self.roi = (30, 440, 275, 150)      # Uncomment to use fixed ROI 1
-        #self.roi = (374, 441, 275, 150)    # Uncomment to use fixed ROI 2       
-        #self.roi = (712, 443, 275, 150)    # Uncomment to use fixed ROI 3
-        #self.roi= (325, 433, 500, 285)
-
-        if self.roi is None:
-            gui_w, gui_h = self.window_width, self.window_height
-            img_h, img_w = image.shape[:2]
-            scale_w = gui_w / img_w
-            scale_h = gui_h / img_h
-            scale = min(scale_w, scale_h)
-            disp_w, disp_h = int(img_w * scale), int(img_h * scale)
-            image_disp = cv2.resize(image, (disp_w, disp_h), interpolation=cv2.INTER_AREA)
+        return process_image(file_name, image_idx, self.config)
 
-            roi_disp = cv2.selectROI("Select ROI", image_disp, showCrosshair=True, fromCenter=False)
-            cv2.destroyWindow("Select ROI")
-            if roi_disp == (0, 0, 0, 0):
-                self.text_box.append("No ROI selected.")
-                return None, [], "", []
-            x, y, w, h = [int(v / scale) for v in roi_disp]
-            self.roi = (x, y, w, h)
-            self.text_box.append(f"ROI coordinates for 1st image: x={x}, y={y}, w={w}, h={h}")
+    def thumbnail_size(self):
+        return (self.window_width // 3 - 30, self.window_height // 3 - 30)
 
-        x, y, w, h = self.roi
-        roi_bgr = image[y:y + h, x:x + w]
-        roi_hsv = hsv[y:y + h, x:x + w]
-
-        annotated_image = image.copy()
-        cv2.rectangle(annotated_image, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-        blue_intensity = np.mean(roi_bgr[:, :, 0])
-        avg_h = np.mean(roi_hsv[:, :, 0])
-        avg_s = np.mean(roi_hsv[:, :, 1])
-        avg_v = np.mean(roi_hsv[:, :, 2])
-        avg_r = np.mean(roi_bgr[:, :, 2])
-        avg_g = np.mean(roi_bgr[:, :, 1])
-        avg_b = np.mean(roi_bgr[:, :, 0])
-
-        intensities = [(image_idx, 1, blue_intensity, avg_h, avg_s, avg_v, avg_r, avg_g, avg_b)]
-        dimensions = [
-            f"ROI: W: {w}, H: {h}, "
-            f"Light Intensity: {blue_intensity:.2f}, "
-            f"HSV: ({avg_h:.1f}, {avg_s:.1f}, {avg_v:.1f}), "
-            f"RGB: ({avg_r:.1f}, {avg_g:.1f}, {avg_b:.1f})"
-        ]
-        summary = f"ROI Stats for Image {image_idx}"
-
-        return annotated_image, dimensions, summary, intensities
-
-    def display_images(self, images):
-        for label in self.image_labels:
-            self.grid_layout.removeWidget(label)
-            label.deleteLater()
-        self.image_labels.clear()
-
-        max_width = self.window_width // 3 - 30
-        max_height = self.window_height // 3 - 30
-        cols = 3
-        for idx, img in enumerate(images):
-            height, width, channel = img.shape
-            bytes_per_line = 3 * width
-            q_image = QImage(img.data, width, height, bytes_per_line, QImage.Format.Format_BGR888)
-            pixmap = QPixmap.fromImage(q_image)
-            if width > max_width or height > max_height:
-                pixmap = pixmap.scaled(
-                    max_width, max_height, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation
-                )
-            label = QLabel()
-            label.setPixmap(pixmap)
-            label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-            self.grid_layout.addWidget(label, idx // cols, idx % cols)
-            self.image_labels.append(label)
+    def show_full_image(self, row):
+        file_name, image_idx = self.gallery.thumbnail_model.item(row)
+        annotated_img, _, _, _ = process_image(file_name, image_idx, replace(self.config, thumbnail_size=None))
+        if annotated_img is None:
+            self.text_box.append(f"Could not reload image: {file_name}")
+            return
+        viewer = ImageViewer(annotated_img, self.gallery.caption(row))
+        viewer.show()
+        self.viewers = [v for v in self.viewers if v.isVisible()] + [viewer]
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -1,18 +1,34 @@
 import sys
-import cv2
+from itertools import groupby
+from dataclasses import replace
 import numpy as np
-import csv
 import os
+import tempfile
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton,
-    QVBoxLayout, QHBoxLayout, QTextEdit, QFileDialog, QScrollArea, QGridLayout, QSizePolicy
+    QVBoxLayout, QHBoxLayout, QTextEdit, QFileDialog, QProgressBar
 )
-from PyQt6.QtGui import QImage, QPixmap
 from PyQt6.QtCore import Qt
-import matplotlib
-matplotlib.use('QtAgg')
-import matplotlib.pyplot as plt
-from statsmodels.nonparametric.smoothers_lowess import lowess
+from colordetect.lazy import LazyModule
+from colordetect.engine import PipelineConfig, process_image
+from colordetect.gallery import ThumbnailGallery
+from colordetect.plate import load_template, row_name
+from colordetect.qtwidgets import ImageViewer
+from colordetect.qtworker import BatchWorker
+from colordetect.series import CHANNELS, ResultGrid
+from colordetect.smoothing import OnlineSmoother
+from colordetect.sink import CsvSink, read_rows, result_header
+from colordetect.table import TABLE_FILTER, run_metadata, write_rows
+from colordetect.watch import FolderWatcher
+
+# pyplot is imported when the first plot is opened, not at start-up
+plt = LazyModule("matplotlib.pyplot", backend="QtAgg")
+
+# Above this many ROIs the per-ROI R/G/B grid and legends give way to plate heatmaps
+MAX_ROI_GRID = 6
+
+# Written in the watched folder, so that watching it again resumes
+AUTOSAVE_NAME = "roi_stats_autosave.csv"
 
 class ImageProcessor(QWidget):
     def __init__(self):
@@ -20,40 +36,72 @@ class ImageProcessor(QWidget):
 
         self.text_box = QTextEdit(self)
         self.open_button = QPushButton("Open Images", self)
+        self.template_button = QPushButton("Load ROI Template", self)
         self.save_button = QPushButton("Save Last Image", self)
         self.save_csv_button = QPushButton("Save Light Intensity CSV", self)
         self.plot_button = QPushButton("Plot Light Intensity", self)
+        self.watch_button = QPushButton("Watch Folder", self)
+        self.cancel_button = QPushButton("Cancel", self)
         self.exit_button = QPushButton("Exit", self)
+        self.progress_bar = QProgressBar(self)
 
-        self.annotated_images = []
-        self.image_labels = []
-        self.light_intensity_data = []
+        self.worker = None          # BatchWorker of the batch in progress
+        self.viewers = []           # Open full resolution windows
+        self.light_intensity_data = ResultGrid()
         self.input_image_dir = ""
         self.roi = None
+        self.batch_start = 1        # image index of the first file of the running batch
+
+        # Watch mode: new files in the folder are analyzed as they arrive
+        self.watcher = None
+        self.pending_files = []     # arrived while a batch was still running
+        self.next_index = 1
+        self.sink = None            # rows are appended to the folder's autosave CSV
+        self.live_fig = None
+        self.live_ax = None
+        self.live_lines = {}        # ROI index -> (raw line, smoothed line, x list, y list)
+        self.live_x = []            # image index of every smoothed sample
+        self.live_smoother = None
+        self.live_half_window = 10  # images on each side of a smoothed point
+
+        # --- Use 3 fixed ROIs for all images ---
+        self.rois = [
+            (30, 440, 275, 150),
+            (374, 441, 275, 150),
+            (712, 443, 275, 150)
+            #(712, 443, 75, 50)
+        ]
+        self.config = PipelineConfig(mode="roi", rois=self.rois)
 
         self.open_button.clicked.connect(self.open_images)
+        self.template_button.clicked.connect(self.load_roi_template)
         self.save_button.clicked.connect(self.save_image)
         self.save_csv_button.clicked.connect(self.save_csv)
         self.plot_button.clicked.connect(self.plot_light_intensity)
+        self.watch_button.clicked.connect(self.toggle_watch)
+        self.cancel_button.clicked.connect(self.cancel_processing)
+        self.cancel_button.setEnabled(False)
         self.exit_button.clicked.connect(self.close)
 
         layout = QVBoxLayout()
-        self.scroll_area = QScrollArea(self)
-        self.scroll_widget = QWidget()
-        self.grid_layout = QGridLayout(self.scroll_widget)
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setWidget(self.scroll_widget)
-        layout.addWidget(self.scroll_area)
+        # Thumbnail gallery: only visible tiles are decoded and painted
+        self.gallery = ThumbnailGallery((200, 150), parent=self)
+        self.gallery.image_clicked.connect(self.show_full_image)
+        layout.addWidget(self.gallery)
 
         # Set text box height to about 5 lines
         self.text_box.setFixedHeight(90)  # ~5 lines depending on font size
         layout.addWidget(self.text_box)
+        layout.addWidget(self.progress_bar)
 
         button_layout = QHBoxLayout()
         button_layout.addWidget(self.open_button)
+        button_layout.addWidget(self.template_button)
         button_layout.addWidget(self.save_button)
         button_layout.addWidget(self.save_csv_button)
         button_layout.addWidget(self.plot_button)
+        button_layout.addWidget(self.watch_button)
+        button_layout.addWidget(self.cancel_button)
         button_layout.addWidget(self.exit_button)
         layout.addLayout(button_layout)
 
@@ -64,6 +112,7 @@ class ImageProcessor(QWidget):
         self.window_width = int(screen.width() * 0.75)
         self.window_height = int(screen.height() * 0.75)
         self.resize(self.window_width, self.window_height)
+        self.gallery.set_tile_size(self.thumbnail_size())
 
     def open_images(self):
         file_names, _ = QFileDialog.getOpenFileNames(
@@ -71,31 +120,229 @@ class ImageProcessor(QWidget):
         )
         if file_names:
             self.input_image_dir = os.path.dirname(file_names[0])
-            self.annotated_images.clear()
+            self.gallery.thumbnail_model.clear()
             self.text_box.clear()
             self.light_intensity_data.clear()
             self.roi = None
 
-            for label in self.image_labels:
-                self.grid_layout.removeWidget(label)
-                label.deleteLater()
-            self.image_labels.clear()
-
-            all_dimensions = []
-            all_summaries = []
-            for idx, file_name in enumerate(file_names):
-                annotated_img, dimensions, summary, intensities = self.process_image(file_name, idx + 1)
-                if annotated_img is not None:
-                    self.annotated_images.append(annotated_img)
-                    all_dimensions.extend(dimensions)
-                    all_summaries.append(f"Image {idx + 1}: {summary.strip()}")
-                    self.light_intensity_data.extend(intensities)
-            self.display_images(self.annotated_images)
-            self.text_box.append("\n".join(all_dimensions))
-            self.text_box.append("\n".join(all_summaries))
+            # Process in the background; tiles and text arrive one image at a time
+            self.start_batch(file_names, 1)
+
+    def load_roi_template(self):
+        # Well grid written by `python -m colordetect plate`, replaces the 3 fixed ROIs
+        file_name, _ = QFileDialog.getOpenFileName(self, "Open ROI Template", "", "ROI Templates (*.json)")
+        if not file_name:
+            return
+        try:
+            plate = load_template(file_name)
+        except (OSError, ValueError, TypeError) as e:
+            self.text_box.append(f"Could not load ROI template: {e}")
+            return
+        self.config.plate = plate
+        self.rois = plate.rects()
+        self.text_box.append(f"Using {len(plate)} wells from {os.path.basename(file_name)}")
+
+    def start_batch(self, file_names, start_index):
+        self.config.thumbnail_size = self.thumbnail_size()
+        self.batch_start = start_index
+        self.worker = BatchWorker(file_names, self.config, parent=self, start_index=start_index)
+        self.worker.result_ready.connect(self.on_image_processed)
+        self.worker.progress.connect(self.on_progress)
+        self.worker.finished.connect(self.on_batch_finished)
+        self.set_running(True, len(file_names))
+        self.worker.start()
+
+    def on_image_processed(self, idx, file_name, result):
+        annotated_img, dimensions, summary, intensities = result
+        image_idx = self.batch_start + idx
+        if annotated_img is not None:
+            self.gallery.thumbnail_model.append(file_name, image_idx, annotated_img)
+            self.text_box.append("\n".join(dimensions))
+            self.text_box.append(f"Image {image_idx}: {summary.strip()}")
+            self.light_intensity_data.extend(intensities)
+            if self.sink is not None:
+                self.sink.write([list(row) + [file_name] for row in intensities])
+            self.update_live_plot(intensities)
+
+    def on_progress(self, done, total):
+        self.progress_bar.setValue(done)
+
+    def on_batch_finished(self):
+        if self.worker.cancelled:
+            self.text_box.append(f"Cancelled after {self.progress_bar.value()} images.")
+        self.worker = None
+        self.set_running(False)
+        if self.watcher is not None:
+            self.process_pending()
+        elif self.sink is not None:
+            self.sink.close()
+            self.sink = None
+
+    def cancel_processing(self):
+        # Cancelling drops queued files, so a watch would silently skip them
+        if self.watcher is not None:
+            self.stop_watching()
+        if self.worker is not None:
+            self.worker.cancel()
+
+    def closeEvent(self, event):
+        if self.watcher is not None:
+            self.stop_watching()
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+        super().closeEvent(event)
+
+    def toggle_watch(self):
+        if self.watcher is not None:
+            self.stop_watching()
+            return
+        directory = QFileDialog.getExistingDirectory(self, "Watch Folder", self.input_image_dir)
+        if not directory:
+            return
+        self.input_image_dir = directory
+        self.gallery.thumbnail_model.clear()
+        self.text_box.clear()
+        self.light_intensity_data.clear()
+        self.pending_files = []
+        self.open_live_plot()
+
+        self.sink = self.open_autosave(directory)
+        self.load_previous_rows(list(read_rows(self.sink.path)) if self.sink is not None else [])
+
+        known = self.sink.completed_files if self.sink is not None else set()
+        self.watcher = FolderWatcher(directory, known=known, parent=self)
+        self.watcher.new_files.connect(self.on_new_files)
+        self.watch_button.setText("Stop Watching")
+        self.open_button.setEnabled(False)
+        self.text_box.append(
+            f"Watching {directory}"
+            + ("" if self.watcher.using_events else " (polling, change notifications unavailable)")
+        )
+        self.watcher.start()
+
+    def open_autosave(self, directory):
+        # Rows of an earlier watch on this folder are kept and its files skipped.
+        # A read-only folder, or an autosave written with other ROIs, falls back
+        # to a new file in the temp folder
+        metadata = run_metadata(self.config)
+        try:
+            return CsvSink(os.path.join(directory, AUTOSAVE_NAME), result_header("roi"),
+                           flush_every=1, resume=True, metadata=metadata)
+        except OSError as e:
+            self.text_box.append(f"Cannot autosave to {directory} ({e.strerror}).")
+        except ValueError as e:
+            self.text_box.append(f"{e}.")
+        try:
+            fd, autosave_path = tempfile.mkstemp(prefix="roi_stats_", suffix="_autosave.csv")
+            os.close(fd)
+            sink = CsvSink(autosave_path, result_header("roi"), flush_every=1, metadata=metadata)
+        except OSError as e:
+            self.text_box.append(f"Autosave disabled ({e.strerror}); results are only shown.")
+            return None
+        self.text_box.append(f"Autosaving to {autosave_path}")
+        return sink
+
+    def load_previous_rows(self, rows):
+        self.next_index = 1
+        seen = set()
+        for row in rows:
+            image_idx, file_name = row[0], row[-1]
+            if file_name not in seen:
+                seen.add(file_name)
+                self.gallery.thumbnail_model.append(file_name, image_idx)
+            self.next_index = max(self.next_index, image_idx + 1)
+        self.light_intensity_data.extend(row[:-1] for row in rows)
+        self.update_live_plot([row[:-1] for row in rows])
+        if rows:
+            self.text_box.append(f"Resumed {len(seen)} images from {os.path.basename(self.sink.path)}")
+
+    def stop_watching(self):
+        self.watcher.stop()
+        self.watcher.deleteLater()
+        self.watcher = None
+        self.pending_files = []
+        self.watch_button.setText("Watch Folder")
+        self.text_box.append("Stopped watching.")
+        if self.worker is None:
+            if self.sink is not None:
+                self.sink.close()
+                self.sink = None
+            self.set_running(False)
+
+    def on_new_files(self, paths):
+        self.pending_files.extend(paths)
+        self.process_pending()
+
+    def process_pending(self):
+        # One batch at a time; files that arrive meanwhile wait for the next one
+        if self.worker is not None or not self.pending_files:
+            return
+        file_names, self.pending_files = self.pending_files, []
+        start_index = self.next_index
+        self.next_index += len(file_names)
+        self.start_batch(file_names, start_index)
+
+    def open_live_plot(self):
+        self.live_fig, self.live_ax = plt.subplots(figsize=(10, 5))
+        self.live_lines = {}
+        self.live_x = []
+        # Fixed-window smoother: each new image refits only the last few points
+        self.live_smoother = OnlineSmoother(self.live_half_window, len(self.rois))
+        line_styles = ['-', '--', '-.']
+        for roi_idx in range(1, len(self.rois) + 1):
+            raw_line, = self.live_ax.plot(
+                [], [], marker='o', linestyle='none', alpha=0.5, label=f'ROI {roi_idx}'
+            )
+            smooth_line, = self.live_ax.plot(
+                [], [], color=raw_line.get_color(), linewidth=2,
+                linestyle=line_styles[(roi_idx - 1) % len(line_styles)],
+                label=f'ROI {roi_idx} smoothed'
+            )
+            self.live_lines[roi_idx] = (raw_line, smooth_line, [], [])
+        self.live_ax.set_xlabel("Image")
+        self.live_ax.set_ylabel("Blue Intensity")
+        self.live_ax.set_title("Blue Light Intensity - Live")
+        self.live_ax.set_ylim(0, 255)
+        if len(self.rois) <= MAX_ROI_GRID:
+            self.live_ax.legend()
+        self.live_ax.grid(True)
+        plt.show(block=False)
+
+    def update_live_plot(self, intensities):
+        # Only the new points are appended; nothing is recomputed for older images
+        if self.live_fig is None or not plt.fignum_exists(self.live_fig.number) or not intensities:
+            return
+        for image_idx, rows in groupby(intensities, key=lambda row: row[0]):
+            blue = np.full(len(self.rois), np.nan)
+            for _, roi_idx, blue_intensity, *_ in rows:
+                if roi_idx not in self.live_lines:
+                    # Resumed autosave from before its ROIs were stored with it
+                    continue
+                raw_line, _, xs, ys = self.live_lines[roi_idx]
+                xs.append(image_idx)
+                ys.append(blue_intensity)
+                raw_line.set_data(xs, ys)
+                blue[roi_idx - 1] = blue_intensity
+            self.live_x.append(image_idx)
+            self.live_smoother.append(blue)
+        for roi_idx, (_, smooth_line, _, _) in self.live_lines.items():
+            smooth_line.set_data(self.live_x, self.live_smoother.smoothed[roi_idx - 1])
+        self.live_ax.relim()
+        self.live_ax.autoscale_view(scaley=False)
+        self.live_fig.canvas.draw_idle()
+
+    def set_running(self, running, total=0):
+        self.open_button.setEnabled(not running and self.watcher is None)
+        self.template_button.setEnabled(not running and self.watcher is None)
+        self.watch_button.setEnabled(not running or self.watcher is not None)
+        self.cancel_button.setEnabled(running)
+        if running:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(0)
 
     def save_image(self):
-        if self.annotated_images:
+        if self.gallery.thumbnail_model.rowCount():
             filename, selected_filter = QFileDialog.getSaveFileName(
                 self, "Save Image", "", "PNG Files (*.png);;JPEG Files (*.jpg)"
             )
@@ -105,8 +352,8 @@ class ImageProcessor(QWidget):
                         filename += ".png"
                     else:
                         filename += ".jpg"
-                pixmap = self.scroll_widget.grab()
-                pixmap.save(filename)
+                # Lay out every thumbnail, not just the tiles currently on screen
+                self.gallery.save_montage(filename)
                 self.text_box.append(f"Saved subplot image to {filename}")
         else:
             self.text_box.append("No image to save.")
@@ -116,47 +363,11 @@ class ImageProcessor(QWidget):
             self.text_box.append("No light intensity data to save.")
             return
 
-        # Determine number of images and ROIs
-        num_images = max([img_idx for img_idx, *_ in self.light_intensity_data])
-        num_rois = max([roi_idx for _, roi_idx, *_ in self.light_intensity_data])
-
-        # Prepare data: one list per ROI per channel
-        roi_intensities = [[] for _ in range(num_rois)]
-        roi_h = [[] for _ in range(num_rois)]
-        roi_s = [[] for _ in range(num_rois)]
-        roi_v = [[] for _ in range(num_rois)]
-        roi_r = [[] for _ in range(num_rois)]
-        roi_g = [[] for _ in range(num_rois)]
-        roi_b = [[] for _ in range(num_rois)]
-
-        for img_idx in range(1, num_images + 1):
-            for roi_idx in range(1, num_rois + 1):
-                for entry in self.light_intensity_data:
-                    if entry[0] == img_idx and entry[1] == roi_idx:
-                        _, _, blue_intensity, avg_h, avg_s, avg_v, avg_r, avg_g, avg_b = entry
-                        roi_intensities[roi_idx-1].append(blue_intensity)
-                        roi_h[roi_idx-1].append(avg_h)
-                        roi_s[roi_idx-1].append(avg_s)
-                        roi_v[roi_idx-1].append(avg_v)
-                        roi_r[roi_idx-1].append(avg_r)
-                        roi_g[roi_idx-1].append(avg_g)
-                        roi_b[roi_idx-1].append(avg_b)
-                        break
-
-        # Apply LOESS smoothing for each ROI and channel
-        def get_lowess(data):
-            if len(data) > 2:
-                return lowess(data, np.arange(len(data)), frac=0.3)[:, 1]
-            else:
-                return np.array(data)
-
-        loess_intensity = [get_lowess(roi_intensities[i]) for i in range(num_rois)]
-        loess_h = [get_lowess(roi_h[i]) for i in range(num_rois)]
-        loess_s = [get_lowess(roi_s[i]) for i in range(num_rois)]
-        loess_v = [get_lowess(roi_v[i]) for i in range(num_rois)]
-        loess_r = [get_lowess(roi_r[i]) for i in range(num_rois)]
-        loess_g = [get_lowess(roi_g[i]) for i in range(num_rois)]
-        loess_b = [get_lowess(roi_b[i]) for i in range(num_rois)]
+        # (images, ROIs, channels) raw and LOWESS values
+        data = self.light_intensity_data
+        num_images, num_rois = len(data), data.n_rois
+        raw = data.values
+        loess = data.smoothed(frac=0.3)
 
         # Prepare CSV header
         header = ["Image Index"]
@@ -171,40 +382,18 @@ class ImageProcessor(QWidget):
                 f"ROI{roi_idx} Avg B", f"ROI{roi_idx} Avg B LOWESS"
             ]
 
-        # Prepare rows
-        rows = []
-        for img_idx in range(num_images):
-            row = [img_idx + 1]
-            for roi_idx in range(num_rois):
-                # Raw and LOWESS for each channel
-                row += [
-                    roi_intensities[roi_idx][img_idx] if img_idx < len(roi_intensities[roi_idx]) else "",
-                    loess_intensity[roi_idx][img_idx] if img_idx < len(loess_intensity[roi_idx]) else "",
-                    roi_h[roi_idx][img_idx] if img_idx < len(roi_h[roi_idx]) else "",
-                    loess_h[roi_idx][img_idx] if img_idx < len(loess_h[roi_idx]) else "",
-                    roi_s[roi_idx][img_idx] if img_idx < len(roi_s[roi_idx]) else "",
-                    loess_s[roi_idx][img_idx] if img_idx < len(loess_s[roi_idx]) else "",
-                    roi_v[roi_idx][img_idx] if img_idx < len(roi_v[roi_idx]) else "",
-                    loess_v[roi_idx][img_idx] if img_idx < len(loess_v[roi_idx]) else "",
-                    roi_r[roi_idx][img_idx] if img_idx < len(roi_r[roi_idx]) else "",
-                    loess_r[roi_idx][img_idx] if img_idx < len(loess_r[roi_idx]) else "",
-                    roi_g[roi_idx][img_idx] if img_idx < len(roi_g[roi_idx]) else "",
-                    loess_g[roi_idx][img_idx] if img_idx < len(loess_g[roi_idx]) else "",
-                    roi_b[roi_idx][img_idx] if img_idx < len(roi_b[roi_idx]) else "",
-                    loess_b[roi_idx][img_idx] if img_idx < len(loess_b[roi_idx]) else "",
-                ]
-            rows.append(row)
+        # One row per image: raw and LOWESS of each channel, ROI by ROI
+        rows = np.empty((num_images, 1 + num_rois * 2 * len(CHANNELS)))
+        rows[:, 0] = np.arange(1, num_images + 1)
+        rows[:, 1:] = np.stack([raw, loess], axis=-1).reshape(num_images, -1)
 
         default_path = os.path.join(self.input_image_dir if self.input_image_dir else "", "roi_stats.csv")
         filename, _ = QFileDialog.getSaveFileName(
-            self, "Save CSV", default_path, "CSV Files (*.csv)"
+            self, "Save CSV", default_path, TABLE_FILTER
         )
         if filename:
-            with open(filename, mode='w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(header)
-                for row in rows:
-                    writer.writerow(row)
+            metadata = run_metadata(self.config, self.gallery.thumbnail_model.files())
+            write_rows(filename, header, rows, metadata)
             self.text_box.append(f"Saved ROI stats data to {filename}")
 
     def plot_light_intensity(self):
@@ -212,27 +401,13 @@ class ImageProcessor(QWidget):
             self.text_box.append("No ROI stats data to plot.")
             return
 
-        # Determine number of images and ROIs
-        num_images = max([img_idx for img_idx, *_ in self.light_intensity_data])
-        num_rois = max([roi_idx for _, roi_idx, *_ in self.light_intensity_data])
-
-        # Prepare data: one list per ROI per channel
-        roi_intensities = [[] for _ in range(num_rois)]
-        roi_r = [[] for _ in range(num_rois)]
-        roi_g = [[] for _ in range(num_rois)]
-        roi_b = [[] for _ in range(num_rois)]
-
-        # Collect data for each ROI across all images
-        for img_idx in range(1, num_images + 1):
-            for roi_idx in range(1, num_rois + 1):
-                for entry in self.light_intensity_data:
-                    if entry[0] == img_idx and entry[1] == roi_idx:
-                        _, _, blue_intensity, _, _, _, avg_r, avg_g, avg_b = entry
-                        roi_intensities[roi_idx-1].append(blue_intensity)
-                        roi_r[roi_idx-1].append(avg_r)
-                        roi_g[roi_idx-1].append(avg_g)
-                        roi_b[roi_idx-1].append(avg_b)
-                        break
+        data = self.light_intensity_data
+        num_images, num_rois = len(data), data.n_rois
+        # (channel, ROI, image) slices of the blue, R, G and B series
+        picked = [CHANNELS.index(channel) for channel in ("blue", "r", "g", "b")]
+        roi_intensities, roi_r, roi_g, roi_b = data.values[:, :, picked].T
+        smoothed_blue, smoothed_r, smoothed_g, smoothed_b = data.smoothed(frac=0.3)[:, :, picked].T
+        has_loess = data.present().sum() > 2
 
         x = np.arange(num_images)
         x_labels = [f"Img{i+1}" for i in range(num_images)]
@@ -253,15 +428,15 @@ class ImageProcessor(QWidget):
         axs[0].set_ylim(0, 255)
         axs[0].set_xticks(np.arange(0, num_images, 20))
         axs[0].set_xticklabels([str(i) for i in np.arange(0, num_images, 20)])
-        axs[0].legend()
+        if num_rois <= MAX_ROI_GRID:
+            axs[0].legend()
         axs[0].grid(True)
 
         # LOWESS subplot (bottom)
         for roi_idx in range(num_rois):
-            if len(roi_intensities[roi_idx]) > 2:
-                lowess_result = lowess(roi_intensities[roi_idx], x, frac=0.3)
+            if has_loess:
                 axs[1].plot(
-                    x, lowess_result[:, 1],
+                    x, smoothed_blue[roi_idx],
                     linestyle=line_styles[roi_idx % len(line_styles)],
                     marker='o',
                     label=f'ROI {roi_idx+1} LOWESS'
@@ -272,12 +447,18 @@ class ImageProcessor(QWidget):
         axs[1].set_ylim(0, 255)
         axs[1].set_xticks(np.arange(0, num_images, 20))
         axs[1].set_xticklabels([str(i) for i in np.arange(0, num_images, 20)])
-        axs[1].legend()
+        if num_rois <= MAX_ROI_GRID:
+            axs[1].legend()
         axs[1].grid(True)
 
         plt.tight_layout()
         plt.show(block=False)
 
+        if num_rois > MAX_ROI_GRID:
+            # 2 x num_rois R/G/B panels would take minutes to draw for a 96 well plate
+            self.plot_plate_heatmaps()
+            return
+
         # --- Average R,G,B: 3x6 subplots for each line ---
         # fig, axs = plt.subplots(3, 6, figsize=(24, 12), sharex=True)
         fig, axs = plt.subplots(3, num_rois * 2, figsize=(4 * num_rois * 2, 12), sharex=True)
@@ -307,9 +488,8 @@ class ImageProcessor(QWidget):
             axs[1, roi_idx*2].set_xticklabels([str(i) for i in np.arange(0, num_images, 50)])
             axs[1, roi_idx*2].grid(True)
 
-            if len(roi_r[roi_idx]) > 2:
-                lowess_r = lowess(roi_r[roi_idx], x, frac=0.3)
-                axs[1, roi_idx*2+1].plot(x, lowess_r[:, 1], color='red', linestyle=line_styles[roi_idx % len(line_styles)], marker='o')
+            if has_loess:
+                axs[1, roi_idx*2+1].plot(x, smoothed_r[roi_idx], color='red', linestyle=line_styles[roi_idx % len(line_styles)], marker='o')
             axs[1, roi_idx*2+1].set_title(f'ROI {roi_idx+1} R LOWESS')
             axs[1, roi_idx*2+1].set_ylim(0, 255)
             axs[1, roi_idx*2+1].set_xticks(np.arange(0, num_images, 50))
@@ -317,18 +497,16 @@ class ImageProcessor(QWidget):
             axs[1, roi_idx*2+1].grid(True)
 
             # Row 2: LOWESS G, LOWESS B
-            if len(roi_g[roi_idx]) > 2:
-                lowess_g = lowess(roi_g[roi_idx], x, frac=0.3)
-                axs[2, roi_idx*2].plot(x, lowess_g[:, 1], color='green', linestyle=line_styles[roi_idx % len(line_styles)], marker='o')
+            if has_loess:
+                axs[2, roi_idx*2].plot(x, smoothed_g[roi_idx], color='green', linestyle=line_styles[roi_idx % len(line_styles)], marker='o')
             axs[2, roi_idx*2].set_title(f'ROI {roi_idx+1} G LOWESS')
             axs[2, roi_idx*2].set_ylim(0, 255)
             axs[2, roi_idx*2].set_xticks(np.arange(0, num_images, 50))
             axs[2, roi_idx*2].set_xticklabels([str(i) for i in np.arange(0, num_images, 50)])
             axs[2, roi_idx*2].grid(True)
 
-            if len(roi_b[roi_idx]) > 2:
-                lowess_b = lowess(roi_b[roi_idx], x, frac=0.3)
-                axs[2, roi_idx*2+1].plot(x, lowess_b[:, 1], color='blue', linestyle=line_styles[roi_idx % len(line_styles)], marker='o')
+            if has_loess:
+                axs[2, roi_idx*2+1].plot(x, smoothed_b[roi_idx], color='blue', linestyle=line_styles[roi_idx % len(line_styles)], marker='o')
             axs[2, roi_idx*2+1].set_title(f'ROI {roi_idx+1} B LOWESS')
             axs[2, roi_idx*2+1].set_ylim(0, 255)
             axs[2, roi_idx*2+1].set_xticks(np.arange(0, num_images, 50))
@@ -338,95 +516,50 @@ class ImageProcessor(QWidget):
         plt.tight_layout()
         plt.show(block=False)
 
-    def process_image(self, file_name, image_idx):
-        image = cv2.imread(file_name)
-        if image is None:
-            print(f"Error: Could not open image {file_name}.")
-            return None, [], "", []
+    def plot_plate_heatmaps(self):
+        # Raw and LOWESS R, G, B of every well at the last analyzed image, laid out as the plate
+        data = self.light_intensity_data
+        last = np.flatnonzero(data.present())[-1]
+        plate = self.config.plate
+        if plate is not None:
+            rows, cols = plate.rows, plate.cols
+        else:
+            cols = int(np.ceil(np.sqrt(data.n_rois)))
+            rows = -(-data.n_rois // cols)
+
+        fig, axs = plt.subplots(2, 3, figsize=(15, 8))
+        for row, (kind, values) in enumerate((("Raw", data.values), ("LOWESS", data.smoothed(frac=0.3)))):
+            for col, (channel, cmap) in enumerate((("r", "Reds"), ("g", "Greens"), ("b", "Blues"))):
+                wells = np.full(rows * cols, np.nan)
+                n = min(len(wells), data.n_rois)
+                wells[:n] = values[last, :n, CHANNELS.index(channel)]
+                ax = axs[row, col]
+                image = ax.imshow(wells.reshape(rows, cols), cmap=cmap, vmin=0, vmax=255)
+                ax.set_title(f"{kind} Avg {channel.upper()}, Img{last + 1}")
+                ax.set_xticks(np.arange(cols))
+                ax.set_xticklabels([str(c + 1) for c in range(cols)])
+                ax.set_yticks(np.arange(rows))
+                ax.set_yticklabels([row_name(r) for r in range(rows)])
+                fig.colorbar(image, ax=ax, shrink=0.8)
 
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        plt.tight_layout()
+        plt.show(block=False)
 
-        # --- Use 3 fixed ROIs for all images ---
-        """ img_h, img_w = image.shape[:2]
-        # Example: 3 ROIs horizontally across the image, each 1/4 width, half height, adjust as needed
-        roi_w = img_w // 4
-        roi_h = img_h // 2
-        self.rois = [
-            (int(img_w * 0.1), int(img_h * 0.25), roi_w, roi_h),               # Left
-            (int(img_w * 0.5) - roi_w // 2, int(img_h * 0.25), roi_w, roi_h),  # Center
-            (int(img_w * 0.9) - roi_w, int(img_h * 0.25), roi_w, roi_h),       # Right
-        ] """
-        self.rois = [
-            (30, 440, 275, 150),#
-            (374, 441, 275, 150),
-            (712, 443, 275, 150)
-            #(712, 443, 75, 50)
-        ]
-        annotated_image = image.copy()
-        dimensions = []
-        intensities = []
-        for roi_idx, (x, y, w, h) in enumerate(self.rois, 1):
-            roi_bgr = image[y:y + h, x:x + w]
-            roi_hsv = hsv[y:y + h, x:x + w]
-
-            # Draw rectangle for each ROI
-            cv2.rectangle(annotated_image, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            label_text = f"ROI {roi_idx}"
-            font_scale = 1.0
-            thickness = 2
-            font = cv2.FONT_HERSHEY_SIMPLEX
-            text_size, _ = cv2.getTextSize(label_text, font, font_scale, thickness)
-            text_width, text_height = text_size
-            text_x = x + (w - text_width) // 2
-            text_y = max(y - 10, text_height + 5)
-            cv2.putText(
-                annotated_image, label_text, (text_x, text_y),
-                font, font_scale, (0, 255, 0), thickness, cv2.LINE_AA
-            )
+    def process_image(self, file_name, image_idx):
+        return process_image(file_name, image_idx, self.config)
 
-            blue_intensity = np.mean(roi_bgr[:, :, 0])
-            avg_h = np.mean(roi_hsv[:, :, 0])
-            avg_s = np.mean(roi_hsv[:, :, 1])
-            avg_v = np.mean(roi_hsv[:, :, 2])
-            avg_r = np.mean(roi_bgr[:, :, 2])
-            avg_g = np.mean(roi_bgr[:, :, 1])
-            avg_b = np.mean(roi_bgr[:, :, 0])
-
-            intensities.append((image_idx, roi_idx, blue_intensity, avg_h, avg_s, avg_v, avg_r, avg_g, avg_b))
-            dimensions.append(
-                f"ROI {roi_idx}: W: {w}, H: {h}, "
-                f"Light Intensity: {blue_intensity:.2f}, "
-                f"HSV: ({avg_h:.1f}, {avg_s:.1f}, {avg_v:.1f}), "
-                f"RGB: ({avg_r:.1f}, {avg_g:.1f}, {avg_b:.1f})"
-            )
-        summary = f"ROI Stats for Image {image_idx}"
-
-        return annotated_image, dimensions, summary, intensities
-
-    def display_images(self, images):
-        for label in self.image_labels:
-            self.grid_layout.removeWidget(label)
-            label.deleteLater()
-        self.image_labels.clear()
-
-        max_width = self.window_width // 3 - 30
-        max_height = self.window_height // 3 - 30
-        cols = 3
-        for idx, img in enumerate(images):
-            height, width, channel = img.shape
-            bytes_per_line = 3 * width
-            q_image = QImage(img.data, width, height, bytes_per_line, QImage.Format.Format_BGR888)
-            pixmap = QPixmap.fromImage(q_image)
-            if width > max_width or height > max_height:
-                pixmap = pixmap.scaled(
-                    max_width, max_height, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation
-                )
-            label = QLabel()
-            label.setPixmap(pixmap)
-            label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-            self.grid_layout.addWidget(label, idx // cols, idx % cols)
-            self.image_labels.append(label)
+    def thumbnail_size(self):
+        return (self.window_width // 3 - 30, self.window_height // 3 - 30)
+
+    def show_full_image(self, row):
+        file_name, image_idx = self.gallery.thumbnail_model.item(row)
+        annotated_img, _, _, _ = process_image(file_name, image_idx, replace(self.config, thumbnail_size=None))
+        if annotated_img is None:
+            self.text_box.append(f"Could not reload image: {file_name}")
+            return
+        viewer = ImageViewer(annotated_img, self.gallery.caption(row))
+        viewer.show()
+        self.viewers = [v for v in self.viewers if v.isVisible()] + [viewer]
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -1,18 +1,26 @@
 import sys
+from dataclasses import replace
 import cv2
 import numpy as np
-import csv
 import os
+import sqlite3
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton,
-    QVBoxLayout, QHBoxLayout, QTextEdit, QFileDialog, QScrollArea, QGridLayout, QSizePolicy
+    QVBoxLayout, QHBoxLayout, QTextEdit, QFileDialog, QProgressBar, QMessageBox
 )
-from PyQt6.QtGui import QImage, QPixmap
 from PyQt6.QtCore import Qt
-import matplotlib
-matplotlib.use('QtAgg')
-import matplotlib.pyplot as plt
-from statsmodels.nonparametric.smoothers_lowess import lowess
+from colordetect.lazy import LazyModule
+from colordetect.cache import ResultCache
+from colordetect.engine import PipelineConfig, load_preview, process_image, scale_rects
+from colordetect.gallery import ThumbnailGallery
+from colordetect.qtwidgets import ImageViewer
+from colordetect.qtworker import BatchWorker
+from colordetect.series import CHANNELS, SeriesStore
+from colordetect.table import TABLE_FILTER, run_metadata, write_rows
+from colordetect.wells import locate_wells
+
+# pyplot is imported when the first plot is opened, not at start-up
+plt = LazyModule("matplotlib.pyplot", backend="QtAgg")
 
 class ImageProcessor(QWidget):
     def __init__(self):
@@ -23,37 +31,43 @@ class ImageProcessor(QWidget):
         self.save_button = QPushButton("Save Last Image", self)
         self.save_csv_button = QPushButton("Save Light Intensity CSV", self)
         self.plot_button = QPushButton("Plot Light Intensity", self)
+        self.cancel_button = QPushButton("Cancel", self)
         self.exit_button = QPushButton("Exit", self)
+        self.progress_bar = QProgressBar(self)
 
-        self.annotated_images = []
-        self.image_labels = []
-        self.light_intensity_data = []
+        self.worker = None          # BatchWorker of the batch in progress
+        self.cache = None           # ResultCache of the input folder
+        self.viewers = []           # Open full resolution windows
+        self.light_intensity_data = SeriesStore()
         self.input_image_dir = ""
-        self.roi = None
+        self.rois = []
+        self.config = None
 
         self.open_button.clicked.connect(self.open_images)
         self.save_button.clicked.connect(self.save_image)
         self.save_csv_button.clicked.connect(self.save_csv)
         self.plot_button.clicked.connect(self.plot_light_intensity)
+        self.cancel_button.clicked.connect(self.cancel_processing)
+        self.cancel_button.setEnabled(False)
         self.exit_button.clicked.connect(self.close)
 
         layout = QVBoxLayout()
-        self.scroll_area = QScrollArea(self)
-        self.scroll_widget = QWidget()
-        self.grid_layout = QGridLayout(self.scroll_widget)
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setWidget(self.scroll_widget)
-        layout.addWidget(self.scroll_area)
+        # Thumbnail gallery: only visible tiles are decoded and painted
+        self.gallery = ThumbnailGallery((200, 150), parent=self)
+        self.gallery.image_clicked.connect(self.show_full_image)
+        layout.addWidget(self.gallery)
 
         # Set text box height to about 5 lines
         self.text_box.setFixedHeight(90)  # ~5 lines depending on font size
         layout.addWidget(self.text_box)
+        layout.addWidget(self.progress_bar)
 
         button_layout = QHBoxLayout()
         button_layout.addWidget(self.open_button)
         button_layout.addWidget(self.save_button)
         button_layout.addWidget(self.save_csv_button)
         button_layout.addWidget(self.plot_button)
+        button_layout.addWidget(self.cancel_button)
         button_layout.addWidget(self.exit_button)
         layout.addLayout(button_layout)
 
@@ -64,6 +78,7 @@ class ImageProcessor(QWidget):
         self.window_width = int(screen.width() * 0.75)
         self.window_height = int(screen.height() * 0.75)
         self.resize(self.window_width, self.window_height)
+        self.gallery.set_tile_size(self.thumbnail_size())
 
     def open_images(self):
         file_names, _ = QFileDialog.getOpenFileNames(
@@ -71,59 +86,125 @@ class ImageProcessor(QWidget):
         )
         if file_names:
             self.input_image_dir = os.path.dirname(file_names[0])
-            self.annotated_images.clear()
+            self.gallery.thumbnail_model.clear()
             self.text_box.clear()
             self.light_intensity_data.clear()
-            self.roi = None
+            self.rois = []
 
-            for label in self.image_labels:
-                self.grid_layout.removeWidget(label)
-                label.deleteLater()
-            self.image_labels.clear()
-
-            all_dimensions = []
-            all_summaries = []
-
-            # Step 1: Select ROI on the last image
+            # Step 1: Find the wells on the last image; the result is cached next
+            # to the images, so re-opening the series skips the detection
             last_image_path = file_names[-1]
-            image = cv2.imread(last_image_path)
-            if image is None:
+            rois = locate_wells(last_image_path)
+            if rois is None:
                 self.text_box.append(f"Could not load last image: {last_image_path}")
                 return
-
-            gui_w, gui_h = self.window_width, self.window_height
-            img_h, img_w = image.shape[:2]
-            scale_w = gui_w / img_w
-            scale_h = gui_h / img_h
-            scale = min(scale_w, scale_h)
-            disp_w, disp_h = int(img_w * scale), int(img_h * scale)
-            image_disp = cv2.resize(image, (disp_w, disp_h), interpolation=cv2.INTER_AREA)
-
-            roi_disp = cv2.selectROI("Select ROI on Last Image", image_disp, showCrosshair=True, fromCenter=False)
-            cv2.destroyWindow("Select ROI on Last Image")
-            if roi_disp == (0, 0, 0, 0):
-                self.text_box.append("No ROI selected.")
+            if rois:
+                # Shown for confirmation; the ROI can still be selected by hand
+                rois = self.confirm_wells(last_image_path, rois)
+            else:
+                # Nothing that looks like a plate: select the ROI by hand instead
+                rois = self.select_roi(last_image_path)
+            if not rois:
                 return
-            x, y, w, h = [int(v / scale) for v in roi_disp]
-            self.roi = (x, y, w, h)
-            self.text_box.append(f"ROI selected from last image: x={x}, y={y}, w={w}, h={h}")
-
-            # Step 2: Process all images using the selected ROI
-            for idx, file_name in enumerate(file_names):
-                annotated_img, dimensions, summary, intensities = self.process_image(file_name, idx + 1)
-                if annotated_img is not None:
-                    self.annotated_images.append(annotated_img)
-                    all_dimensions.extend(dimensions)
-                    all_summaries.append(f"Image {idx + 1}: {summary.strip()}")
-                    self.light_intensity_data.extend(intensities)
-
-            self.display_images(self.annotated_images)
-            self.text_box.append("\n".join(all_dimensions))
-            self.text_box.append("\n".join(all_summaries))
-
+            self.rois = rois
+            self.config = PipelineConfig(mode="roi", rois=self.rois)
+
+            # Step 2: Process all images using the selected ROI, in the background;
+            # tiles and text arrive one image at a time
+            self.config.thumbnail_size = self.thumbnail_size()
+            # Images already analyzed with this ROI are read back from the folder's cache
+            try:
+                self.cache = ResultCache.for_directory(self.input_image_dir)
+            except sqlite3.Error as e:
+                self.text_box.append(f"Result cache unavailable ({e}); analyzing every image.")
+                self.cache = None
+            self.worker = BatchWorker(file_names, self.config, parent=self, cache=self.cache)
+            self.worker.result_ready.connect(self.on_image_processed)
+            self.worker.progress.connect(self.on_progress)
+            self.worker.finished.connect(self.on_batch_finished)
+            self.set_running(True, len(file_names))
+            self.worker.start()
+
+    def confirm_wells(self, image_path, rois):
+        image_disp, scale = load_preview(image_path, self.window_width, self.window_height)
+        if image_disp is None:
+            self.text_box.append(f"Could not load last image: {image_path}")
+            return []
+        for x, y, w, h in scale_rects(rois, scale):
+            cv2.rectangle(image_disp, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        preview = ImageViewer(image_disp, f"{len(rois)} wells found on last image")
+        preview.show()
+
+        box = QMessageBox(self)
+        box.setWindowTitle("Wells Found")
+        box.setText(f"{len(rois)} wells were found on the last image. Use them as ROIs?")
+        use_button = box.addButton("Use Wells", QMessageBox.ButtonRole.AcceptRole)
+        manual_button = box.addButton("Select ROI", QMessageBox.ButtonRole.ActionRole)
+        box.addButton(QMessageBox.StandardButton.Cancel)
+        box.exec()
+        preview.close()
+        if box.clickedButton() is use_button:
+            self.text_box.append(f"Using {len(rois)} wells found on last image")
+            return rois
+        if box.clickedButton() is manual_button:
+            return self.select_roi(image_path)
+        return []
+
+    def select_roi(self, image_path):
+        # Decode at reduced resolution; the window only needs screen-sized pixels
+        image_disp, scale = load_preview(image_path, self.window_width, self.window_height)
+        if image_disp is None:
+            self.text_box.append(f"Could not load last image: {image_path}")
+            return []
+
+        roi_disp = cv2.selectROI("Select ROI on Last Image", image_disp, showCrosshair=True, fromCenter=False)
+        cv2.destroyWindow("Select ROI on Last Image")
+        if roi_disp == (0, 0, 0, 0):
+            self.text_box.append("No ROI selected.")
+            return []
+        x, y, w, h = [int(v / scale) for v in roi_disp]
+        self.text_box.append(f"ROI selected from last image: x={x}, y={y}, w={w}, h={h}")
+        return [(x, y, w, h)]
+
+    def on_image_processed(self, idx, file_name, result):
+        annotated_img, dimensions, summary, intensities = result
+        if annotated_img is not None:
+            self.gallery.thumbnail_model.append(file_name, idx + 1, annotated_img)
+            self.text_box.append("\n".join(dimensions))
+            self.text_box.append(f"Image {idx + 1}: {summary.strip()}")
+            self.light_intensity_data.extend(intensities)
+
+    def on_progress(self, done, total):
+        self.progress_bar.setValue(done)
+
+    def on_batch_finished(self):
+        if self.worker.cancelled:
+            self.text_box.append(f"Cancelled after {self.progress_bar.value()} images.")
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        self.worker = None
+        self.set_running(False)
+
+    def cancel_processing(self):
+        if self.worker is not None:
+            self.worker.cancel()
+
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+        super().closeEvent(event)
+
+    def set_running(self, running, total=0):
+        self.open_button.setEnabled(not running)
+        self.cancel_button.setEnabled(running)
+        if running:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(0)
 
     def save_image(self):
-        if self.annotated_images:
+        if self.gallery.thumbnail_model.rowCount():
             filename, selected_filter = QFileDialog.getSaveFileName(
                 self, "Save Image", "", "PNG Files (*.png);;JPEG Files (*.jpg)"
             )
@@ -133,8 +214,8 @@ class ImageProcessor(QWidget):
                         filename += ".png"
                     else:
                         filename += ".jpg"
-                pixmap = self.scroll_widget.grab()
-                pixmap.save(filename)
+                # Lay out every thumbnail, not just the tiles currently on screen
+                self.gallery.save_montage(filename)
                 self.text_box.append(f"Saved subplot image to {filename}")
         else:
             self.text_box.append("No image to save.")
@@ -144,57 +225,33 @@ class ImageProcessor(QWidget):
             self.text_box.append("No light intensity data to save.")
             return
 
-        # Prepare data for LOESS smoothing
-        y_intensity = []
-        y_r = []
-        y_g = []
-        y_b = []
-        y_h = []
-        y_s = []
-        y_v = []
-
-        for _, roi_idx, blue_intensity, avg_h, avg_s, avg_v, avg_r, avg_g, avg_b in self.light_intensity_data:
-            y_intensity.append(blue_intensity)
-            y_h.append(avg_h)
-            y_s.append(avg_s)
-            y_v.append(avg_v)
-            y_r.append(avg_r)
-            y_g.append(avg_g)
-            y_b.append(avg_b)
-
-        # Apply LOESS smoothing
-        loess_intensity = lowess(y_intensity, np.arange(len(y_intensity)), frac=0.3)
-        loess_r = lowess(y_r, np.arange(len(y_r)), frac=0.3)
-        loess_g = lowess(y_g, np.arange(len(y_g)), frac=0.3)
-        loess_b = lowess(y_b, np.arange(len(y_b)), frac=0.3)
-        loess_h = lowess(y_h, np.arange(len(y_h)), frac=0.3)
-        loess_s = lowess(y_s, np.arange(len(y_s)), frac=0.3)
-        loess_v = lowess(y_v, np.arange(len(y_v)), frac=0.3)
+        # LOESS smoothing, computed once per data version and shared with the plots
+        data = self.light_intensity_data
+        loess = {
+            roi: np.array([data.smoothed(channel, roi, frac=0.3) for channel in CHANNELS]).T
+            for roi in data.rois()
+        }
 
         default_path = os.path.join(self.input_image_dir if self.input_image_dir else "", "roi_stats.csv")
         filename, _ = QFileDialog.getSaveFileName(
-            self, "Save CSV", default_path, "CSV Files (*.csv)"
+            self, "Save CSV", default_path, TABLE_FILTER
         )
         if filename:
-            with open(filename, mode='w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow([
-                    "Image Index", "ROI Index", "Blue Intensity",
-                    "Avg H", "Avg S", "Avg V", "Avg R", "Avg G", "Avg B",
-                    "LOESS Blue Intensity", "LOESS Avg H", "LOESS Avg S",
-                    "LOESS Avg V", "LOESS Avg R", "LOESS Avg G", "LOESS Avg B"
-                ])
-                for idx, row in enumerate(self.light_intensity_data):
-                    loess_row = [
-                        loess_intensity[idx][1],
-                        loess_h[idx][1],
-                        loess_s[idx][1],
-                        loess_v[idx][1],
-                        loess_r[idx][1],
-                        loess_g[idx][1],
-                        loess_b[idx][1]
-                    ]
-                    writer.writerow(list(row) + loess_row)
+            header = [
+                "Image Index", "ROI Index", "Blue Intensity",
+                "Avg H", "Avg S", "Avg V", "Avg R", "Avg G", "Avg B",
+                "LOESS Blue Intensity", "LOESS Avg H", "LOESS Avg S",
+                "LOESS Avg V", "LOESS Avg R", "LOESS Avg G", "LOESS Avg B"
+            ]
+            rows = []
+            # Rows arrive image by image, so each ROI's rows are in series order
+            seen = dict.fromkeys(loess, 0)
+            for row in self.light_intensity_data:
+                roi = row[1]
+                rows.append(list(row) + loess[roi][seen[roi]].tolist())
+                seen[roi] += 1
+            metadata = run_metadata(self.config, self.gallery.thumbnail_model.files())
+            write_rows(filename, header, rows, metadata)
             self.text_box.append(f"Saved ROI stats data to {filename}")
 
     def plot_light_intensity(self):
@@ -205,44 +262,33 @@ class ImageProcessor(QWidget):
             return
 
         # Prepare data
-        num_rois = len(self.light_intensity_data)
-        y_intensity = []
-        y_r = []
-        y_g = []
-        y_b = []
-        y_h = []
-        y_s = []
-        y_v = []
-
-        # Collect raw data
-        for img_idx, roi_idx, blue_intensity, avg_h, avg_s, avg_v, avg_r, avg_g, avg_b in self.light_intensity_data:
-            y_intensity.append(blue_intensity)
-            y_r.append(avg_r)
-            y_g.append(avg_g)
-            y_b.append(avg_b)
-            y_h.append(avg_h)
-            y_s.append(avg_s)
-            y_v.append(avg_v)
+        # One column per ROI, one row per image
+        data = self.light_intensity_data
+        rois = data.rois()
+        y_intensity, y_h, y_s, y_v, y_r, y_g, y_b = (
+            np.column_stack([data.raw(channel, roi) for roi in rois]) for channel in CHANNELS
+        )
+        num_images = len(y_intensity)
 
         # X-axis labels as numbers
-        x_labels = list(range(1, num_rois + 1))
+        x_labels = list(range(1, num_images + 1))
+
+        # Smoothed series are reused from save_csv if the data has not changed since
+        loess_intensity, loess_h, loess_s, loess_v, loess_r, loess_g, loess_b = (
+            np.column_stack([data.smoothed(channel, roi, frac=0.3) for roi in rois]) for channel in CHANNELS
+        )
 
-        # Apply LOESS smoothing
-        loess_intensity = lowess(y_intensity, np.arange(len(y_intensity)), frac=0.3)
-        loess_r = lowess(y_r, np.arange(len(y_r)), frac=0.3)
-        loess_g = lowess(y_g, np.arange(len(y_g)), frac=0.3)
-        loess_b = lowess(y_b, np.arange(len(y_b)), frac=0.3)
-        loess_h = lowess(y_h, np.arange(len(y_h)), frac=0.3)
-        loess_s = lowess(y_s, np.arange(len(y_s)), frac=0.3)
-        loess_v = lowess(y_v, np.arange(len(y_v)), frac=0.3)
+        # Every ROI is drawn in the same colour, so label only the first line
+        def legend_once(text):
+            return [text] + ["_" + text] * (len(rois) - 1)
 
         # Set x-axis limits
-        x_limit = num_rois + small_interval
+        x_limit = num_images + small_interval
 
         # Plot 1: Blue Light Intensity
         plt.figure()
         plt.subplot(2, 1, 1)
-        plt.plot(x_labels, y_intensity, marker='o', color='blue', label='Raw Blue Intensity')
+        plt.plot(x_labels, y_intensity, marker='o', color='blue', label=legend_once('Raw Blue Intensity'))
         plt.xlabel("ROI Number")
         plt.ylabel("Blue Intensity")
         plt.title("Blue Light Intensity - Raw Data")
@@ -253,7 +299,7 @@ class ImageProcessor(QWidget):
         plt.grid()
 
         plt.subplot(2, 1, 2)
-        plt.plot(x_labels, loess_intensity[:, 1], color='blue', label='LOESS Smoothed Blue Intensity')
+        plt.plot(x_labels, loess_intensity, color='blue', label=legend_once('LOESS Smoothed Blue Intensity'))
         plt.xlabel("ROI Number")
         plt.ylabel("Blue Intensity")
         plt.title("Blue Light Intensity - LOESS Smoothed")
@@ -303,7 +349,7 @@ class ImageProcessor(QWidget):
 
         # LOESS Smoothed RGB data
         plt.subplot(2, 3, 4)
-        plt.plot(x_labels, loess_r[:, 1], color='darkred', label='LOESS Smoothed Avg R')
+        plt.plot(x_labels, loess_r, color='darkred', label='LOESS Smoothed Avg R')
         plt.xlabel("ROI Number")
         plt.ylabel("Average R")
         plt.title("LOESS Smoothed Avg R")
@@ -313,7 +359,7 @@ class ImageProcessor(QWidget):
         plt.grid()
 
         plt.subplot(2, 3, 5)
-        plt.plot(x_labels, loess_g[:, 1], color='darkgreen', label='LOESS Smoothed Avg G')
+        plt.plot(x_labels, loess_g, color='darkgreen', label='LOESS Smoothed Avg G')
         plt.xlabel("ROI Number")
         plt.ylabel("Average G")
         plt.title("LOESS Smoothed Avg G")
@@ -323,7 +369,7 @@ class ImageProcessor(QWidget):
         plt.grid()
 
         plt.subplot(2, 3, 6)
-        plt.plot(x_labels, loess_b[:, 1], color='darkblue', label='LOESS Smoothed Avg B')
+        plt.plot(x_labels, loess_b, color='darkblue', label='LOESS Smoothed Avg B')
         plt.xlabel("ROI Number")
         plt.ylabel("Average B")
         plt.title("LOESS Smoothed Avg B")
@@ -372,7 +418,7 @@ class ImageProcessor(QWidget):
 
         # LOESS Smoothed HSV data
         plt.subplot(2, 3, 4)
-        plt.plot(x_labels, loess_h[:, 1], color='darkred', label='LOESS Smoothed Avg H')
+        plt.plot(x_labels, loess_h, color='darkred', label='LOESS Smoothed Avg H')
         plt.xlabel("ROI Number")
         plt.ylabel("Average H")
         plt.title("LOESS Smoothed Avg H")
@@ -382,7 +428,7 @@ class ImageProcessor(QWidget):
         plt.grid()
 
         plt.subplot(2, 3, 5)
-        plt.plot(x_labels, loess_s[:, 1], color='darkgreen', label='LOESS Smoothed Avg S')
+        plt.plot(x_labels, loess_s, color='darkgreen', label='LOESS Smoothed Avg S')
         plt.xlabel("ROI Number")
         plt.ylabel("Average S")
         plt.title("LOESS Smoothed Avg S")
@@ -392,7 +438,7 @@ class ImageProcessor(QWidget):
         plt.grid()
 
         plt.subplot(2, 3, 6)
-        plt.plot(x_labels, loess_v[:, 1], color='darkblue', label='LOESS Smoothed Avg V')
+        plt.plot(x_labels, loess_v, color='darkblue', label='LOESS Smoothed Avg V')
         plt.xlabel("ROI Number")
         plt.ylabel("Average V")
         plt.title("LOESS Smoothed Avg V")
@@ -405,86 +451,20 @@ class ImageProcessor(QWidget):
         plt.show(block=False) """
 
     def process_image(self, file_name, image_idx):
-        image = cv2.imread(file_name)
-        if image is None:
-            print(f"Error: Could not open image {file_name}.")
-            return None, [], "", []
-
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-
-        # Fixed ROI selection for the first image
-        #self.roi = (30, 440, 275, 150)      # Uncomment to use fixed ROI 1
-        #self.roi = (374, 441, 275, 150)    # Uncomment to use fixed ROI 2       
-        #self.roi = (712, 443, 275, 150)    # Uncomment to use fixed ROI 3
-
-        if self.roi is None:
-            gui_w, gui_h = self.window_width, self.window_height
-            img_h, img_w = image.shape[:2]
-            scale_w = gui_w / img_w
-            scale_h = gui_h / img_h
-            scale = min(scale_w, scale_h)
-            disp_w, disp_h = int(img_w * scale), int(img_h * scale)
-            image_disp = cv2.resize(image, (disp_w, disp_h), interpolation=cv2.INTER_AREA)
-
-            roi_disp = cv2.selectROI("Select ROI", image_disp, showCrosshair=True, fromCenter=False)
-            cv2.destroyWindow("Select ROI")
-            if roi_disp == (0, 0, 0, 0):
-                self.text_box.append("No ROI selected.")
-                return None, [], "", []
-            x, y, w, h = [int(v / scale) for v in roi_disp]
-            self.roi = (x, y, w, h)
-            self.text_box.append(f"ROI coordinates for 1st image: x={x}, y={y}, w={w}, h={h}")
-
-        x, y, w, h = self.roi
-        roi_bgr = image[y:y + h, x:x + w]
-        roi_hsv = hsv[y:y + h, x:x + w]
-
-        annotated_image = image.copy()
-        cv2.rectangle(annotated_image, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-        blue_intensity = np.mean(roi_bgr[:, :, 0])
-        avg_h = np.mean(roi_hsv[:, :, 0])
-        avg_s = np.mean(roi_hsv[:, :, 1])
-        avg_v = np.mean(roi_hsv[:, :, 2])
-        avg_r = np.mean(roi_bgr[:, :, 2])
-        avg_g = np.mean(roi_bgr[:, :, 1])
-        avg_b = np.mean(roi_bgr[:, :, 0])
-
-        intensities = [(image_idx, 1, blue_intensity, avg_h, avg_s, avg_v, avg_r, avg_g, avg_b)]
-        dimensions = [
-            f"ROI: W: {w}, H: {h}, "
-            f"Light Intensity: {blue_intensity:.2f}, "
-            f"HSV: ({avg_h:.1f}, {avg_s:.1f}, {avg_v:.1f}), "
-            f"RGB: ({avg_r:.1f}, {avg_g:.1f}, {avg_b:.1f})"
-        ]
-        summary = f"ROI Stats for Image {image_idx}"
-
-        return annotated_image, dimensions, summary, intensities
-
-    def display_images(self, images):
-        for label in self.image_labels:
-            self.grid_layout.removeWidget(label)
-            label.deleteLater()
-        self.image_labels.clear()
-
-        max_width = self.window_width // 3 - 30
-        max_height = self.window_height // 3 - 30
-        cols = 3
-        for idx, img in enumerate(images):
-            height, width, channel = img.shape
-            bytes_per_line = 3 * width
-            q_image = QImage(img.data, width, height, bytes_per_line, QImage.Format.Format_BGR888)
-            pixmap = QPixmap.fromImage(q_image)
-            if width > max_width or height > max_height:
-                pixmap = pixmap.scaled(
-                    max_width, max_height, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation
-                )
-            label = QLabel()
-            label.setPixmap(pixmap)
-            label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-            self.grid_layout.addWidget(label, idx // cols, idx % cols)
-            self.image_labels.append(label)
+        return process_image(file_name, image_idx, self.config)
+
+    def thumbnail_size(self):
+        return (self.window_width // 3 - 30, self.window_height // 3 - 30)
+
+    def show_full_image(self, row):
+        file_name, image_idx = self.gallery.thumbnail_model.item(row)
+        annotated_img, _, _, _ = process_image(file_name, image_idx, replace(self.config, thumbnail_size=None))
+        if annotated_img is None:
+            self.text_box.append(f"Could not reload image: {file_name}")
+            return
+        viewer = ImageViewer(annotated_img, self.gallery.caption(row))
+        viewer.show()
+        self.viewers = [v for v in self.viewers if v.isVisible()] + [viewer]
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
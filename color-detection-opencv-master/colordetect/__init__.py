@@ -0,0 +1,3 @@
+from colordetect.engine import PipelineConfig, process_image, iter_batch, run_batch
+
+__all__ = ["PipelineConfig", "process_image", "iter_batch", "run_batch"]
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import sqlite3
+from dataclasses import asdict
+
+import cv2
+import numpy as np
+
+from colordetect.engine import make_thumbnail, roi_summary
+
+# Options that only change what is drawn or returned, not the numbers
+PRESENTATION_FIELDS = ("annotate", "thumbnail_size")
+
+CACHE_FILE_NAME = ".colordetect_cache.sqlite"
+
+# Part of every key: bump it when the stats or the stored rows change for the
+# same settings, so that entries of older versions are no longer returned
+CACHE_VERSION = 1
+
+
+def config_key(config):
+    """Stable hash of CACHE_VERSION and the PipelineConfig fields that affect the computed stats."""
+    settings = {k: v for k, v in asdict(config).items() if k not in PRESENTATION_FIELDS}
+    settings["cache_version"] = CACHE_VERSION
+    text = json.dumps(settings, sort_keys=True, default=list)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def file_identity(file_name):
+    """(absolute path, mtime in ns, size) or None if the file is gone."""
+    try:
+        st = os.stat(file_name)
+    except OSError:
+        return None
+    return os.path.abspath(file_name), st.st_mtime_ns, st.st_size
+
+
+class ResultCache:
+    """On-disk store of process_image results.
+
+    Entries are keyed by file path and pipeline config and are only returned
+    while the file's mtime and size are unchanged, so re-opening a series with
+    the same ROIs/thresholds skips decoding and analysis for every image that
+    was seen before. Annotated thumbnails are kept as JPEG so the gallery can
+    be refilled from the cache too; full resolution annotations are not stored.
+    """
+
+    def __init__(self, path, commit_every=50):
+        self.path = path
+        self.commit_every = commit_every
+        self._uncommitted = 0
+        # The batch worker thread uses the connection after the GUI thread opened it
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " file TEXT NOT NULL, config TEXT NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL,"
+            " dimensions TEXT NOT NULL, summary TEXT NOT NULL, rows TEXT NOT NULL, thumbnail BLOB,"
+            " PRIMARY KEY (file, config))"
+        )
+
+    @classmethod
+    def for_directory(cls, directory):
+        return cls(os.path.join(directory, CACHE_FILE_NAME))
+
+    def get(self, file_name, image_idx, config):
+        """The cached process_image result for this image, or None on a miss."""
+        if config.annotate and not config.thumbnail_size:
+            return None
+        identity = file_identity(file_name)
+        if identity is None:
+            return None
+        path, mtime_ns, size = identity
+        row = self._conn.execute(
+            "SELECT dimensions, summary, rows, thumbnail FROM results"
+            " WHERE file = ? AND config = ? AND mtime_ns = ? AND size = ?",
+            (path, config_key(config), mtime_ns, size),
+        ).fetchone()
+        if row is None:
+            return None
+        dimensions, summary, rows, thumbnail = row
+
+        annotated_image = None
+        if config.annotate:
+            if thumbnail is None:
+                return None
+            annotated_image = cv2.imdecode(np.frombuffer(thumbnail, np.uint8), cv2.IMREAD_COLOR)
+            annotated_image = make_thumbnail(annotated_image, config.thumbnail_size)
+
+        # Image indices depend on the batch, so they are filled in here
+        intensities = [(image_idx,) + tuple(r) for r in json.loads(rows)]
+        if config.mode == "roi":
+            summary = roi_summary(image_idx)
+        return annotated_image, json.loads(dimensions), summary, intensities
+
+    def put(self, file_name, config, result):
+        annotated_image, dimensions, summary, intensities = result
+        if not summary:
+            return              # the image could not be decoded
+        identity = file_identity(file_name)
+        if identity is None:
+            return
+        thumbnail = None
+        if annotated_image is not None and config.thumbnail_size:
+            thumbnail = cv2.imencode(".jpg", annotated_image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+        path, mtime_ns, size = identity
+        self._conn.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, config_key(config), mtime_ns, size, json.dumps(dimensions), summary,
+             json.dumps([list(r[1:]) for r in intensities]), thumbnail),
+        )
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def clear(self):
+        self._conn.execute("DELETE FROM results")
+        self.commit()
+
+    def close(self):
+        self.commit()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
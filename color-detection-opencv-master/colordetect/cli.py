@@ -0,0 +1,323 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from contextlib import closing
+
+from colordetect.cache import ResultCache
+from colordetect.engine import (
+    PipelineConfig, DEFAULT_ROIS, BLUE_LOWER, BLUE_UPPER, IMAGE_EXTENSIONS, OBJECT_METHODS, iter_batch
+)
+from colordetect.plate import PLATE_FORMATS, PlateTemplate, load_template, save_template
+from colordetect.roistats import OBJECT_MEANS
+from colordetect.sink import open_sink, result_header
+from colordetect.table import TABLE_EXTENSIONS, run_metadata, write_rows
+from colordetect.wells import WELL_METHODS, locate_wells
+
+
+def parse_roi(text):
+    try:
+        x, y, w, h = (int(v) for v in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ROI must be x,y,w,h, got {text!r}")
+    return (x, y, w, h)
+
+
+def parse_triplet(text):
+    try:
+        a, b, c = (int(v) for v in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected three comma separated integers, got {text!r}")
+    return (a, b, c)
+
+
+def parse_pair(text):
+    """"x,y" or a single number used for both."""
+    try:
+        values = tuple(float(v) for v in text.split(","))
+    except ValueError:
+        values = ()
+    if len(values) not in (1, 2):
+        raise argparse.ArgumentTypeError(f"Expected a number or x,y, got {text!r}")
+    return values * 2 if len(values) == 1 else values
+
+
+def collect_files(inputs, recursive=False, extensions=IMAGE_EXTENSIONS):
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*") if recursive else os.path.join(item, "*")
+            matches = glob.glob(pattern, recursive=recursive)
+        elif glob.has_magic(item):
+            matches = glob.glob(item, recursive=recursive)
+        else:
+            matches = [item]
+        files.extend(sorted(
+            m for m in matches if os.path.isfile(m) and m.lower().endswith(extensions)
+        ))
+    return files
+
+
+def report_progress(done, total, started, file_name, unit="img"):
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    sys.stderr.write(
+        f"\r[{done}/{total}] {rate:.1f} {unit}/s  {os.path.basename(file_name)[:40]:<40}"
+    )
+    sys.stderr.flush()
+
+
+def run(args):
+    file_names = collect_files(args.input, args.recursive)
+    if not file_names:
+        print("No images found.", file=sys.stderr)
+        return 1
+
+    rois = args.rois or list(DEFAULT_ROIS)
+    if args.detect_wells:
+        # The last image is the reference frame, as in RUN_GUI_ROI_LastImage
+        rois = locate_wells(file_names[-1], args.detect_wells)
+        if not rois:
+            print(f"No wells found in {file_names[-1]}.", file=sys.stderr)
+            return 1
+        if not args.quiet:
+            sys.stderr.write(f"{len(rois)} wells found in {os.path.basename(file_names[-1])}\n")
+
+    config = PipelineConfig(
+        mode=args.mode,
+        rois=rois,
+        plate=load_template(args.plate) if args.plate else None,
+        rotate=args.rotate,
+        hsv_lower=args.hsv_lower,
+        hsv_upper=args.hsv_upper,
+        min_area=args.min_area,
+        annotate=False,
+        decode_scale=args.decode_scale,
+        object_method=args.object_method,
+        object_means=args.object_means,
+    )
+
+    try:
+        sink = open_sink(args.out, result_header(args.mode), resume=args.resume,
+                         flush_every=args.flush_every, metadata=run_metadata(config))
+    except ValueError as e:
+        # Columns or settings differ from the run that wrote args.out
+        print(f"{e}; run without --resume to overwrite it.", file=sys.stderr)
+        return 1
+    cache = ResultCache(args.cache) if args.cache else None
+    with sink:
+        # Image indices stay tied to the position in the full file list
+        todo = [(idx, f) for idx, f in enumerate(file_names, 1) if f not in sink.completed_files]
+        if sink.completed_files and not args.quiet:
+            sys.stderr.write(f"Resuming: {len(file_names) - len(todo)} images already in {args.out}\n")
+
+        started = time.perf_counter()
+        failed = 0
+        indices = [idx for idx, _ in todo]
+        todo_files = [f for _, f in todo]
+        # Closed here so its final cache commit runs before the cache is closed
+        with closing(iter_batch(todo_files, config, args.workers, indices=indices, cache=cache)) as results:
+            for done, (file_name, result) in enumerate(zip(todo_files, results), 1):
+                _, _, summary, intensities = result
+                if not summary:
+                    failed += 1
+                if intensities:
+                    sink.write([list(row) + [file_name] for row in intensities])
+                else:
+                    # No objects, or unreadable: still done as far as --resume is concerned
+                    sink.mark_empty(file_name)
+                if not args.quiet:
+                    report_progress(done, len(todo_files), started, file_name)
+    if cache is not None:
+        cache.close()
+
+    if not args.quiet:
+        elapsed = time.perf_counter() - started
+        sys.stderr.write(f"\nProcessed {len(todo_files)} images in {elapsed:.1f}s -> {args.out}\n")
+    if failed:
+        print(f"{failed} image(s) could not be read.", file=sys.stderr)
+    return 0
+
+
+def ttp(args):
+    from dataclasses import asdict
+
+    import numpy as np
+
+    from colordetect.ttp import (
+        SUMMARY_HEADER, CrossingConfig, calibrate, concentration_for, iter_crossings, load_concentrations
+    )
+
+    paths = collect_files(args.input, args.recursive, TABLE_EXTENSIONS)
+    if not paths:
+        print("No roi_stats tables found.", file=sys.stderr)
+        return 1
+    config = CrossingConfig(
+        threshold=args.threshold,
+        channel=args.channel,
+        rearm=args.rearm,
+        sustain=args.sustain,
+        smooth=args.smooth,
+        interpolate=args.interpolate,
+        interval=args.interval,
+    )
+    layout = load_concentrations(args.concentrations) if args.concentrations else {}
+
+    started = time.perf_counter()
+    rows = []
+    failed = 0
+    for done, (file_rows, error) in enumerate(iter_crossings(paths, config, args.workers), 1):
+        if error:
+            failed += 1
+            sys.stderr.write(f"\n{error}\n")
+        for row in file_rows:
+            concentration = concentration_for(layout, row[0], row[1])
+            usable = concentration is not None and concentration > 0
+            rows.append(row + [
+                "" if concentration is None else concentration,
+                float(np.log10(concentration)) if usable else "",
+            ])
+        if not args.quiet:
+            report_progress(done, len(paths), started, paths[done - 1], unit="files")
+
+    fit = calibrate(rows)
+    write_rows(args.out, SUMMARY_HEADER, rows, {"crossing": asdict(config), "calibration": fit})
+    if not args.quiet:
+        elapsed = time.perf_counter() - started
+        sys.stderr.write(f"\nAnalyzed {len(paths)} tables, {len(rows)} wells in {elapsed:.1f}s -> {args.out}\n")
+    detected = sum(row[2] != "" for row in rows)
+    print(f"{detected}/{len(rows)} wells crossed {args.threshold}")
+    if fit is not None:
+        print(f"log10(concentration) = {fit['slope']:.4f} * t + {fit['intercept']:.4f}"
+              f"  R² = {fit['r2']:.4f}  p = {fit['p']:.4g}  n = {fit['n']}")
+    elif layout:
+        print("Fewer than three detected wells with a concentration, no calibration fitted.")
+    if failed:
+        print(f"{failed} table(s) could not be analyzed.", file=sys.stderr)
+    return 0
+
+
+def plate(args):
+    template = PlateTemplate.standard(
+        args.wells, args.pitch, args.offset, well_size=args.well_size,
+        rotation=args.rotation, shape=args.shape,
+    )
+    save_template(args.out, template)
+    x, y, w, h = template.rects()[-1]
+    print(f"{len(template)} wells, {template.well_names()[-1]} at x={x}, y={y} -> {args.out}")
+    return 0
+
+
+def startup(args):
+    from colordetect.startup import ENTRY_POINTS, benchmark
+
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    scripts = args.scripts or [os.path.join(here, name) for name in ENTRY_POINTS]
+    slow = 0
+    print(f"{'script':<50} {'to window':>10}  heavy imports at start-up")
+    for script, seconds, loaded in benchmark(scripts, args.repeat):
+        shown = "no window" if seconds is None else f"{seconds:.2f}s"
+        print(f"{os.path.basename(script):<50} {shown:>10}  {' '.join(loaded) or '-'}", flush=True)
+        if seconds is None or seconds > args.budget:
+            slow += 1
+    if slow:
+        print(f"{slow} script(s) over the {args.budget:.1f}s budget.", file=sys.stderr)
+    return 1 if slow else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="colordetect", description="Batch blue object / ROI analysis")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="analyze a batch of images and write a CSV")
+    run_parser.add_argument("--mode", choices=["roi", "objects"], default="roi")
+    run_parser.add_argument("--input", nargs="+", required=True,
+                            help="image files, directories or glob patterns")
+    run_parser.add_argument("--recursive", action="store_true", help="descend into sub-directories")
+    run_parser.add_argument("--out", required=True, help="output .csv, .parquet or .feather path")
+    run_parser.add_argument("--resume", action="store_true",
+                            help="keep an existing --out file and only process images missing from it")
+    run_parser.add_argument("--flush-every", type=int, default=100, metavar="ROWS",
+                            help="write buffered rows to disk after this many rows")
+    run_parser.add_argument("--rois", nargs="+", type=parse_roi, metavar="X,Y,W,H",
+                            help="ROIs for --mode roi (default: the three fixed plate ROIs)")
+    run_parser.add_argument("--plate", metavar="TEMPLATE",
+                            help="well grid JSON from the plate command, used instead of --rois")
+    run_parser.add_argument("--detect-wells", choices=WELL_METHODS, metavar="METHOD",
+                            help="find the wells in the last image and use them as ROIs: "
+                                 "auto, circles (Hough) or blobs; cached next to the images")
+    run_parser.add_argument("--rotate", action="store_true", help="rotate 90 degrees anticlockwise first")
+    run_parser.add_argument("--hsv-lower", type=parse_triplet, default=BLUE_LOWER, metavar="H,S,V")
+    run_parser.add_argument("--hsv-upper", type=parse_triplet, default=BLUE_UPPER, metavar="H,S,V")
+    run_parser.add_argument("--min-area", type=float, default=50000, help="minimum object area in pixels")
+    run_parser.add_argument("--object-method", choices=OBJECT_METHODS, default="contours",
+                            help="find objects with a contour loop, or with one connected components pass "
+                                 "(faster above a few hundred objects; areas are pixel counts)")
+    run_parser.add_argument("--object-means", choices=OBJECT_MEANS, default="bbox",
+                            help="with --object-method components: average each object's bounding box "
+                                 "like the contour loop, or only its own pixels")
+    run_parser.add_argument("--decode-scale", type=int, choices=[1, 2, 4, 8], default=1,
+                            help="decode JPEGs at 1/N resolution; ROIs and areas stay in full resolution units")
+    run_parser.add_argument("--cache", metavar="PATH",
+                            help="SQLite result cache; unchanged images analyzed with the same settings are skipped")
+    run_parser.add_argument("--workers", type=int, default=None,
+                            help="worker processes (default: CPU count - 1)")
+    run_parser.add_argument("--quiet", action="store_true", help="no progress output")
+    run_parser.set_defaults(func=run)
+
+    ttp_parser = subparsers.add_parser(
+        "ttp", help="time to positive of every well in many roi_stats tables, plus a log10 calibration fit"
+    )
+    ttp_parser.add_argument("--input", nargs="+", required=True,
+                            help="roi_stats .csv/.parquet/.feather files, directories or glob patterns")
+    ttp_parser.add_argument("--recursive", action="store_true", help="descend into sub-directories")
+    ttp_parser.add_argument("--out", required=True, help="per-well summary .csv, .parquet or .feather path")
+    ttp_parser.add_argument("--threshold", type=float, required=True)
+    ttp_parser.add_argument("--channel", default="Blue Intensity",
+                            help="value column to test, e.g. 'Avg B' (default: Blue Intensity)")
+    ttp_parser.add_argument("--rearm", type=float, default=None,
+                            help="hysteresis: once above threshold a well only drops out below this level")
+    ttp_parser.add_argument("--sustain", type=int, default=1, metavar="FRAMES",
+                            help="frames the signal must stay above threshold")
+    ttp_parser.add_argument("--smooth", action="store_true", help="detect on the LOWESS of each well")
+    ttp_parser.add_argument("--interpolate", action="store_true", help="sub-frame crossing times")
+    ttp_parser.add_argument("--interval", type=float, default=1.0,
+                            help="time between images; Time To Positive is in these units (default: frames)")
+    ttp_parser.add_argument("--concentrations", metavar="LAYOUT",
+                            help="table with File, ROI Index and Concentration columns for the calibration fit")
+    ttp_parser.add_argument("--workers", type=int, default=None,
+                            help="worker processes (default: CPU count - 1)")
+    ttp_parser.add_argument("--quiet", action="store_true", help="no progress output")
+    ttp_parser.set_defaults(func=ttp)
+
+    plate_parser = subparsers.add_parser("plate", help="write a well grid template for run --plate")
+    plate_parser.add_argument("--wells", type=int, choices=sorted(PLATE_FORMATS), default=96)
+    plate_parser.add_argument("--pitch", type=parse_pair, required=True, metavar="X[,Y]",
+                              help="pixels between neighbouring well centres")
+    plate_parser.add_argument("--offset", type=parse_pair, required=True, metavar="X,Y",
+                              help="centre of well A1 in full resolution pixels")
+    plate_parser.add_argument("--well-size", type=parse_pair, default=None, metavar="W[,H]",
+                              help="well diameter, or rectangle size (default: 0.7 x pitch)")
+    plate_parser.add_argument("--rotation", type=float, default=0.0,
+                              help="plate rotation in degrees, anticlockwise about A1")
+    plate_parser.add_argument("--shape", choices=["circle", "rect"], default="circle")
+    plate_parser.add_argument("--out", required=True, help="template .json path")
+    plate_parser.set_defaults(func=plate)
+
+    startup_parser = subparsers.add_parser(
+        "startup", help="time from launch to first window for each GUI script"
+    )
+    startup_parser.add_argument("scripts", nargs="*",
+                                help="GUI scripts to time (default: the main GUI entry points)")
+    startup_parser.add_argument("--repeat", type=int, default=3, help="launches per script, median is reported")
+    startup_parser.add_argument("--budget", type=float, default=1.0, metavar="SECONDS",
+                                help="exit with status 1 if any script takes longer than this")
+    startup_parser.set_defaults(func=startup)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,98 @@
+import numpy as np
+
+from colordetect.smoothing import lowess_uniform
+
+
+def to_frames(columns):
+    """(frames, columns) float array from 1-D series of possibly different lengths.
+
+    Shorter series are padded with NaN at the end; NaN never counts as a
+    crossing.
+    """
+    columns = [np.asarray(col, dtype=np.float64) for col in columns]
+    n = max((len(col) for col in columns), default=0)
+    frames = np.full((n, len(columns)), np.nan)
+    for j, col in enumerate(columns):
+        frames[:len(col), j] = col
+    return frames
+
+
+def smooth_frames(frames, frac=0.3):
+    """LOWESS of every column of a to_frames() array, NaN frames kept.
+
+    NaN frames (padding, or images without a value) are left out of the fit
+    and stay NaN, so a gap does not shift the frames after it. Columns with
+    the same NaN frames are smoothed together in one call.
+    """
+    smoothed = np.full_like(frames, np.nan)
+    present = ~np.isnan(frames)
+    patterns, group = np.unique(present.T, axis=0, return_inverse=True)
+    for g, pattern in enumerate(patterns):
+        cols = np.flatnonzero(group.ravel() == g)
+        block = frames[np.ix_(pattern, cols)]
+        if len(block) > 2:
+            block = lowess_uniform(block.T, frac=frac).T
+        smoothed[np.ix_(pattern, cols)] = block
+    return smoothed
+
+
+def _schmitt(frames, threshold, rearm):
+    """On from a frame above threshold until the next frame below rearm."""
+    above = frames > threshold
+    below = ~(frames >= rearm)          # NaN switches the state off
+    frame = np.arange(len(frames))[:, None]
+    # Index of the latest frame that set or cleared the state, carried forward
+    last = np.maximum.accumulate(np.where(above | below, frame, -1), axis=0)
+    on = np.take_along_axis(above, np.maximum(last, 0), axis=0)
+    return on & (last >= 0)
+
+
+def first_crossings(frames, threshold, rearm=None, sustain=1, interpolate=False):
+    """First frame of every column where the signal goes above threshold.
+
+    frames is (frames, columns), e.g. from to_frames() or smooth_frames().
+    With sustain > 1 the signal has to stay above threshold for that many
+    consecutive frames and the first of them is reported. With rearm (below
+    threshold) the state is a Schmitt trigger: once above threshold a column
+    only counts as dropping out when it falls below rearm, so noise between
+    the two levels neither breaks a sustained run nor starts a new one.
+
+    Returns (index, position): index is the crossing frame or -1, position
+    is the same as float or NaN. With interpolate the position is where the
+    straight line between the previous frame and the crossing frame meets
+    threshold, which gives sub-frame times for slowly rising signals.
+    """
+    frames = np.asarray(frames, dtype=np.float64)
+    if frames.ndim == 1:
+        frames = frames[:, None]
+    n, cols = frames.shape
+    if rearm is not None and rearm > threshold:
+        raise ValueError(f"rearm ({rearm}) must not be above threshold ({threshold})")
+
+    if n == 0:
+        return np.full(cols, -1), np.full(cols, np.nan)
+
+    on = frames > threshold if rearm is None else _schmitt(frames, threshold, rearm)
+    if sustain > 1:
+        # Runs of at least `sustain` frames that are on, tested with a running count
+        counts = np.zeros((n + 1, cols), dtype=np.int64)
+        np.cumsum(on, axis=0, out=counts[1:])
+        start = np.zeros_like(on)
+        if n >= sustain:
+            start[:n - sustain + 1] = counts[sustain:] - counts[:n - sustain + 1] == sustain
+        # The earliest such window always begins where its run of on frames begins
+        on = start
+
+    found = on.any(axis=0)
+    index = np.where(found, on.argmax(axis=0), -1)
+    position = np.where(found, index, np.nan).astype(np.float64)
+
+    if interpolate:
+        cols_found = np.flatnonzero(found & (index > 0))
+        i = index[cols_found]
+        before = frames[i - 1, cols_found]
+        after = frames[i, cols_found]
+        rising = before < after
+        frac = np.where(rising, (threshold - before) / np.where(rising, after - before, 1.0), 1.0)
+        position[cols_found] = i - 1 + np.clip(frac, 0.0, 1.0)
+    return index, position
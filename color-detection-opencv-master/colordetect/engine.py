@@ -0,0 +1,398 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+
+from colordetect.plate import PlateTemplate, draw_wells, well_stats
+from colordetect.roistats import object_stats, roi_channel_stats
+
+# Fixed plate ROIs used by RUN_GUI_Multi_fixed.py
+DEFAULT_ROIS = [
+    (30, 440, 275, 150),
+    (374, 441, 275, 150),
+    (712, 443, 275, 150),
+]
+
+# Blue range used by the Enter* object detectors
+BLUE_LOWER = (90, 200, 180)
+BLUE_UPPER = (130, 255, 255)
+
+# File types offered by the GUIs' open dialogs
+IMAGE_EXTENSIONS = (".png", ".xpm", ".jpg", ".jpeg", ".bmp")
+
+# How analyze_objects finds objects: a findContours loop, or connected components
+OBJECT_METHODS = ("contours", "components")
+
+
+@dataclass
+class PipelineConfig:
+    mode: str = "objects"            # "objects" (blue object detection) or "roi" (fixed ROIs)
+    rois: list = field(default_factory=lambda: list(DEFAULT_ROIS))
+    plate: PlateTemplate = None      # well grid measured instead of rois in "roi" mode
+    rotate: bool = False             # rotate 90 degrees anticlockwise after decoding
+    hsv_lower: tuple = BLUE_LOWER
+    hsv_upper: tuple = BLUE_UPPER
+    kernel_size: int = 5             # open/close kernel for the object mask
+    min_area: float = 50000          # contours below this area are ignored
+    annotate: bool = True            # return the annotated image with each result
+    thumbnail_size: tuple = None     # (max_w, max_h): return a downscaled annotated image instead
+    decode_scale: int = 1            # 1, 2, 4 or 8: decode JPEGs at 1/N size (DCT-domain downscaling)
+    object_method: str = "contours"  # or "components": one labelling pass, faster above ~400 objects
+    object_means: str = "bbox"       # with components: average each box, or "mask" for the object's own pixels
+
+
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def load_image(file_name, decode_scale=1):
+    """cv2.imread at 1/decode_scale of the full resolution."""
+    if decode_scale not in REDUCED_DECODE_FLAGS:
+        raise ValueError(f"decode_scale must be one of 1, 2, 4, 8, got {decode_scale}")
+    return cv2.imread(file_name, REDUCED_DECODE_FLAGS[decode_scale])
+
+
+def load_preview(file_name, max_w, max_h):
+    """Decode just enough resolution to show an image within max_w x max_h.
+
+    Returns (image, scale) where scale is display pixels per full resolution
+    pixel, or (None, 0) if the file cannot be read.
+    """
+    # A 1/8 decode is nearly free and tells us roughly how big the image is
+    probe = load_image(file_name, 8)
+    if probe is None:
+        return None, 0
+    full_h, full_w = probe.shape[0] * 8, probe.shape[1] * 8
+    fit = min(max_w / full_w, max_h / full_h)
+    decode_scale = max((s for s in REDUCED_DECODE_FLAGS if fit * s <= 1), default=1)
+    image = probe if decode_scale == 8 else load_image(file_name, decode_scale)
+
+    img_h, img_w = image.shape[:2]
+    scale = min(max_w / img_w, max_h / img_h)
+    disp_w, disp_h = int(img_w * scale), int(img_h * scale)
+    image = cv2.resize(image, (disp_w, disp_h), interpolation=cv2.INTER_AREA)
+    return image, scale / decode_scale
+
+
+def scale_rects(rects, factor):
+    return [tuple(int(round(v * factor)) for v in rect) for rect in rects]
+
+
+def draw_label(image, label_text, x, y, w, font_scale):
+    thickness = 2
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    text_size, _ = cv2.getTextSize(label_text, font, font_scale, thickness)
+    text_width, text_height = text_size
+    text_x = x + (w - text_width) // 2
+    text_y = max(y - 10, text_height + 5)
+    cv2.putText(
+        image, label_text, (text_x, text_y),
+        font, font_scale, (0, 255, 0), thickness, cv2.LINE_AA
+    )
+
+
+def channel_means(roi_bgr, roi_hsv):
+    # Blue intensity, H, S, V, R, G, B - the column order every script writes
+    blue_intensity = np.mean(roi_bgr[:, :, 0])
+    avg_h = np.mean(roi_hsv[:, :, 0])
+    avg_s = np.mean(roi_hsv[:, :, 1])
+    avg_v = np.mean(roi_hsv[:, :, 2])
+    avg_r = np.mean(roi_bgr[:, :, 2])
+    avg_g = np.mean(roi_bgr[:, :, 1])
+    avg_b = np.mean(roi_bgr[:, :, 0])
+    return blue_intensity, avg_h, avg_s, avg_v, avg_r, avg_g, avg_b
+
+
+def contour_objects(image, mask, hsv, min_area, s):
+    """(box, area, means) of every contour above min_area, averaged over its box."""
+    contours, _ = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    for cnt in contours:
+        area = cv2.contourArea(cnt) * s * s
+        if area > min_area:
+            x, y, w, h = cv2.boundingRect(cnt)
+            yield (x, y, w, h), area, channel_means(image[y:y + h, x:x + w], hsv[y:y + h, x:x + w])
+
+
+def analyze_objects(image, image_idx, config):
+    # Sizes are reported and thresholded in full resolution pixels
+    s = config.decode_scale
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    mask = cv2.inRange(hsv, np.array(config.hsv_lower), np.array(config.hsv_upper))
+
+    kernel_size = max(1, round(config.kernel_size / s))
+    kernel = np.ones((kernel_size, kernel_size), np.uint8)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+
+    if config.object_method == "contours":
+        found = contour_objects(image, mask, hsv, config.min_area, s)
+    elif config.object_method == "components":
+        # One labelling pass gives every object's area, box and means
+        objects = object_stats(image, mask, hsv, config.min_area / (s * s), config.object_means)
+        found = zip(objects.bbox.tolist(), (objects.area * s * s).tolist(), objects.means.tolist())
+    else:
+        raise ValueError(f"object_method must be one of {OBJECT_METHODS}, got {config.object_method!r}")
+
+    # Annotate a copy so the drawn boxes and labels never leak into the stats
+    annotated_image = image.copy() if config.annotate else None
+    dimensions = []
+    count_large = 0
+    count_medium = 0
+    count_small = 0
+    intensities = []
+
+    for object_index, ((x, y, w, h), area, means) in enumerate(found, 1):
+        label_text = f"Object #{object_index}"
+        if annotated_image is not None:
+            cv2.rectangle(annotated_image, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            draw_label(annotated_image, label_text, x, y, w, 1.5 / s)
+
+        stats = tuple(means)
+        blue_intensity, avg_h, avg_s, avg_v, avg_r, avg_g, avg_b = stats
+        intensities.append((image_idx, object_index) + stats)
+
+        if area > 25000:
+            size_category = "Large"
+            count_large += 1
+        elif area > 5000:
+            size_category = "Medium"
+            count_medium += 1
+        else:
+            size_category = "Small"
+            count_small += 1
+
+        dimensions.append(
+            f"{label_text}: W: {w * s}, H: {h * s}, Area: {area:.0f}, "
+            f"Light Intensity: {blue_intensity:.2f}, "
+            f"HSV: ({avg_h:.1f}, {avg_s:.1f}, {avg_v:.1f}), "
+            f"RGB: ({avg_r:.1f}, {avg_g:.1f}, {avg_b:.1f}), "
+            f"Size: {size_category}"
+        )
+
+    total_objects = count_large + count_medium + count_small
+    summary = (f"Total Objects: {total_objects} | "
+               f"Large: {count_large} | Medium: {count_medium} | Small: {count_small}")
+
+    return annotated_image, dimensions, summary, intensities
+
+
+def roi_summary(image_idx):
+    return f"ROI Stats for Image {image_idx}"
+
+
+def analyze_wells(image, image_idx, config):
+    # The template is in full resolution coordinates
+    s = config.decode_scale
+    plate = config.plate.scaled(1 / s) if s != 1 else config.plate
+
+    # Per-frame cost depends on the frame size far more than on the number of wells
+    means = well_stats(image, plate)
+
+    annotated_image = None
+    if config.annotate:
+        annotated_image = image.copy()
+        draw_wells(annotated_image, plate)
+
+    w, h = config.plate.well_size
+    size = f"D: {w:g}" if plate.shape == "circle" else f"W: {w:g}, H: {h:g}"
+    dimensions = []
+    intensities = []
+    for well_idx, (name, values) in enumerate(zip(plate.well_names(), means.tolist()), 1):
+        stats = tuple(values)
+        blue_intensity, avg_h, avg_s, avg_v, avg_r, avg_g, avg_b = stats
+        intensities.append((image_idx, well_idx) + stats)
+        dimensions.append(
+            f"{name}: {size}, "
+            f"Light Intensity: {blue_intensity:.2f}, "
+            f"HSV: ({avg_h:.1f}, {avg_s:.1f}, {avg_v:.1f}), "
+            f"RGB: ({avg_r:.1f}, {avg_g:.1f}, {avg_b:.1f})"
+        )
+    return annotated_image, dimensions, roi_summary(image_idx), intensities
+
+
+def analyze_rois(image, image_idx, config):
+    if config.plate is not None:
+        return analyze_wells(image, image_idx, config)
+
+    annotated_image = image.copy() if config.annotate else None
+    multiple = len(config.rois) > 1
+
+    # ROIs are given in full resolution coordinates
+    s = config.decode_scale
+    rois = scale_rects(config.rois, 1 / s) if s != 1 else config.rois
+
+    # Only the ROI pixels are converted to HSV; all means come from integral images
+    means = roi_channel_stats(image, None, rois)
+
+    dimensions = []
+    intensities = []
+    for roi_idx, ((x, y, w, h), (_, _, full_w, full_h)) in enumerate(zip(rois, config.rois), 1):
+        if annotated_image is not None:
+            cv2.rectangle(annotated_image, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            if multiple:
+                draw_label(annotated_image, f"ROI {roi_idx}", x, y, w, 1.0 / s)
+
+        stats = tuple(means[roi_idx - 1].tolist())
+        blue_intensity, avg_h, avg_s, avg_v, avg_r, avg_g, avg_b = stats
+        intensities.append((image_idx, roi_idx) + stats)
+        dimensions.append(
+            f"{f'ROI {roi_idx}' if multiple else 'ROI'}: W: {full_w}, H: {full_h}, "
+            f"Light Intensity: {blue_intensity:.2f}, "
+            f"HSV: ({avg_h:.1f}, {avg_s:.1f}, {avg_v:.1f}), "
+            f"RGB: ({avg_r:.1f}, {avg_g:.1f}, {avg_b:.1f})"
+        )
+    summary = roi_summary(image_idx)
+
+    return annotated_image, dimensions, summary, intensities
+
+
+def make_thumbnail(image, max_size):
+    max_w, max_h = max_size
+    height, width = image.shape[:2]
+    scale = min(max_w / width, max_h / height)
+    if scale >= 1:
+        return image
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def process_image(file_name, image_idx, config):
+    """Decode, analyze and annotate one image.
+
+    Returns the same (annotated_img, dimensions, summary, intensities) tuple
+    the GUI scripts' process_image methods return; annotated_img is None when
+    the file cannot be decoded, and only a thumbnail when
+    config.thumbnail_size is set.
+    """
+    image = load_image(file_name, config.decode_scale)
+    if image is None:
+        print(f"Error: Could not open image {file_name}.")
+        return None, [], "", []
+
+    if config.rotate:
+        image = cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+
+    if config.mode == "roi":
+        result = analyze_rois(image, image_idx, config)
+    elif config.mode == "objects":
+        result = analyze_objects(image, image_idx, config)
+    else:
+        raise ValueError(f"Unknown pipeline mode: {config.mode}")
+
+    annotated_image, dimensions, summary, intensities = result
+    if annotated_image is not None and config.thumbnail_size:
+        # Shrink in the worker so only a small image crosses the process boundary
+        annotated_image = make_thumbnail(annotated_image, config.thumbnail_size)
+    return annotated_image, dimensions, summary, intensities
+
+
+def _init_worker():
+    # One OpenCV thread per process, otherwise N workers x N cv2 threads thrash the cores
+    cv2.setNumThreads(1)
+
+
+def _process_indexed(args):
+    file_name, image_idx, config = args
+    try:
+        return process_image(file_name, image_idx, config)
+    except Exception as e:
+        # One bad image is reported like an unreadable one instead of ending the batch
+        print(f"Error: Could not analyze image {file_name}: {e}")
+        return None, [], "", []
+
+
+def default_workers():
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def pool_context():
+    """Start method for worker processes: spawn, not the POSIX default fork.
+
+    Batches are run from a QThread next to the Qt event loop; a forked child
+    inherits a copy of every lock other threads held at that moment and can
+    hang on one of them. Spawned workers start from a clean interpreter.
+    """
+    return multiprocessing.get_context("spawn")
+
+
+def _cached_or_process(job, cache):
+    file_name, idx, config = job
+    result = cache.get(file_name, idx, config) if cache is not None else None
+    if result is None:
+        result = _process_indexed(job)
+        if cache is not None:
+            cache.put(file_name, config, result)
+    return result
+
+
+def iter_batch(file_names, config, workers=None, start_index=1, indices=None, cache=None):
+    """Yield process_image results for file_names, in input order.
+
+    Images are numbered from start_index, or by the matching entry of indices
+    when given. With workers=1 everything runs in this process; otherwise
+    images are spread over a process pool, keeping only a few results in
+    flight per worker so memory stays bounded. With a ResultCache, images
+    whose file and config are unchanged are served from it and everything
+    else is added to it. An image that fails to analyze yields the same
+    (None, [], "", []) as an unreadable one.
+    """
+    workers = default_workers() if workers is None else workers
+    if indices is None:
+        indices = range(start_index, start_index + len(file_names))
+    jobs = ((file_name, idx, config) for file_name, idx in zip(file_names, indices))
+
+    try:
+        if workers <= 1 or len(file_names) <= 1:
+            for job in jobs:
+                yield _cached_or_process(job, cache)
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=pool_context(), initializer=_init_worker
+        ) as executor:
+            pending = deque()       # (job, future, cached result)
+            try:
+                for job in jobs:
+                    cached = cache.get(*job) if cache is not None else None
+                    future = executor.submit(_process_indexed, job) if cached is None else None
+                    pending.append((job, future, cached))
+                    if len(pending) >= workers * 2:
+                        yield _collect(pending.popleft(), cache)
+                while pending:
+                    yield _collect(pending.popleft(), cache)
+            finally:
+                # Closing the generator early drops queued images instead of finishing them
+                for _, future, _ in pending:
+                    if future is not None:
+                        future.cancel()
+    finally:
+        if cache is not None:
+            cache.commit()
+
+
+def _collect(entry, cache):
+    job, future, cached = entry
+    if future is None:
+        return cached
+    try:
+        result = future.result()
+    except Exception as e:
+        # e.g. a worker process that died on this image
+        print(f"Error: Could not analyze image {job[0]}: {e}")
+        return None, [], "", []
+    if cache is not None:
+        cache.put(job[0], job[2], result)
+    return result
+
+
+def run_batch(file_names, config, workers=None, start_index=1, indices=None, cache=None):
+    """Process every file and return the list of results in input order."""
+    return list(iter_batch(file_names, config, workers, start_index, indices, cache))
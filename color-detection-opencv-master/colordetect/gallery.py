@@ -0,0 +1,136 @@
+import os
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PyQt6.QtWidgets import QListView
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, pyqtSignal
+
+from colordetect.engine import make_thumbnail
+from colordetect.qtwidgets import bgr_to_pixmap
+
+
+class ThumbnailModel(QAbstractListModel):
+    """List of annotated thumbnails backed by JPEG bytes and an LRU pixmap cache.
+
+    Each item keeps its thumbnail JPEG-encoded (a few KB) plus the source file
+    and image index. Pixmaps are only built when the view asks for a visible
+    row and at most cache_size of them are kept alive.
+    """
+
+    def __init__(self, tile_size, cache_size=300, parent=None):
+        super().__init__(parent)
+        self.tile_size = tile_size
+        self.cache_size = cache_size
+        self._items = []        # (file name, image index, jpeg bytes or None)
+        self._cache = OrderedDict()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._items)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        file_name, image_idx, _ = self._items[index.row()]
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.pixmap(index.row())
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"Image {image_idx}"
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return file_name
+        return None
+
+    def append(self, file_name, image_idx, thumbnail=None):
+        """Add one tile; without a thumbnail the source file is previewed instead."""
+        encoded = None
+        if thumbnail is not None:
+            encoded = cv2.imencode(".jpg", thumbnail, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+        row = len(self._items)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._items.append((file_name, image_idx, encoded))
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._items.clear()
+        self._cache.clear()
+        self.endResetModel()
+
+    def item(self, row):
+        file_name, image_idx, _ = self._items[row]
+        return file_name, image_idx
+
+    def files(self):
+        """Source file of every tile, in order."""
+        return [file_name for file_name, _, _ in self._items]
+
+    def thumbnail(self, row):
+        file_name, _, encoded = self._items[row]
+        if encoded is not None:
+            return cv2.imdecode(np.frombuffer(encoded, np.uint8), cv2.IMREAD_COLOR)
+        image = cv2.imread(file_name, cv2.IMREAD_REDUCED_COLOR_4)
+        return None if image is None else make_thumbnail(image, self.tile_size)
+
+    def pixmap(self, row):
+        if row in self._cache:
+            self._cache.move_to_end(row)
+            return self._cache[row]
+        thumbnail = self.thumbnail(row)
+        if thumbnail is None:
+            return None
+        pixmap = bgr_to_pixmap(thumbnail)
+        self._cache[row] = pixmap
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return pixmap
+
+    def montage(self, cols=3, padding=10):
+        """All thumbnails laid out in a grid, as one BGR image."""
+        tile_w, tile_h = self.tile_size
+        rows = (len(self._items) + cols - 1) // cols
+        canvas = np.full(
+            (rows * (tile_h + padding) + padding, cols * (tile_w + padding) + padding, 3), 255, np.uint8
+        )
+        for idx in range(len(self._items)):
+            thumbnail = self.thumbnail(idx)
+            if thumbnail is None:
+                continue
+            h, w = thumbnail.shape[:2]
+            top = padding + (idx // cols) * (tile_h + padding) + (tile_h - h) // 2
+            left = padding + (idx % cols) * (tile_w + padding) + (tile_w - w) // 2
+            canvas[top:top + h, left:left + w] = thumbnail
+        return canvas
+
+
+class ThumbnailGallery(QListView):
+    """Icon-mode list view that only paints (and so only decodes) visible tiles."""
+
+    image_clicked = pyqtSignal(int)
+
+    def __init__(self, tile_size, cache_size=300, parent=None):
+        super().__init__(parent)
+        self.thumbnail_model = ThumbnailModel(tile_size, cache_size, self)
+        self.setModel(self.thumbnail_model)
+
+        self.setViewMode(QListView.ViewMode.IconMode)
+        self.set_tile_size(tile_size)
+        self.setUniformItemSizes(True)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setMovement(QListView.Movement.Static)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setBatchSize(200)
+        self.setWordWrap(True)
+        self.clicked.connect(lambda index: self.image_clicked.emit(index.row()))
+
+    def set_tile_size(self, tile_size):
+        tile_w, tile_h = tile_size
+        self.thumbnail_model.tile_size = tile_size
+        self.setIconSize(QSize(tile_w, tile_h))
+        self.setGridSize(QSize(tile_w + 12, tile_h + 30))
+
+    def save_montage(self, filename, cols=3):
+        return cv2.imwrite(filename, self.thumbnail_model.montage(cols))
+
+    def caption(self, row):
+        file_name, image_idx = self.thumbnail_model.item(row)
+        return f"Image {image_idx}: {os.path.basename(file_name)}"
@@ -0,0 +1,34 @@
+import importlib
+
+
+class LazyModule:
+    """Module stand-in that imports the real module on first attribute access.
+
+    Lets GUI scripts keep `plt.plot(...)` / `pd.read_csv(...)` call sites while
+    matplotlib and pandas, which take most of the start-up time, are only
+    loaded once something is plotted or read. backend is passed to
+    matplotlib.use() before pyplot is imported.
+    """
+
+    def __init__(self, name, backend=None):
+        self._name = name
+        self._backend = backend
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            if self._backend is not None:
+                import matplotlib
+
+                matplotlib.use(self._backend)
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        if attr.startswith("_"):
+            object.__setattr__(self, attr, value)
+        else:
+            setattr(self._load(), attr, value)
@@ -0,0 +1,209 @@
+import json
+from dataclasses import asdict, dataclass, replace
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from colordetect.roistats import MANY_OBJECTS, crop_object_means, label_means, roi_bounds, roi_channel_stats
+
+# Standard plate formats: wells -> (rows, cols)
+PLATE_FORMATS = {6: (2, 3), 12: (3, 4), 24: (4, 6), 48: (6, 8), 96: (8, 12), 384: (16, 24)}
+
+WELL_SHAPES = ("rect", "circle")
+
+# Well size as a fraction of the pitch when none is given
+WELL_FRACTION = 0.7
+
+# Sub-pixel bits used when drawing wells into a label image
+_SHIFT = 4
+
+
+def row_name(row):
+    """A, B, ..., Z, AA, AB, ... for row 0, 1, ..."""
+    name = ""
+    row += 1
+    while row:
+        row, rem = divmod(row - 1, 26)
+        name = chr(ord("A") + rem) + name
+    return name
+
+
+@dataclass(frozen=True)
+class PlateTemplate:
+    """A regular grid of wells in full resolution image pixels.
+
+    Well A1 is centred on offset. Columns step by pitch[0] along the plate's
+    x axis and rows by pitch[1] along its y axis, both turned by rotation
+    degrees (anticlockwise as displayed) about A1. Wells are well_size
+    (w, h) rectangles aligned with the plate, or circles of diameter
+    well_size[0]. Wells are numbered from 1 row by row: A1, A2, ..., B1, ...
+    """
+    rows: int
+    cols: int
+    pitch: tuple             # (x, y) pixels between neighbouring well centres
+    offset: tuple            # (x, y) centre of well A1
+    well_size: tuple         # (w, h); circles use w as the diameter
+    rotation: float = 0.0
+    shape: str = "rect"
+
+    def __post_init__(self):
+        if self.shape not in WELL_SHAPES:
+            raise ValueError(f"shape must be one of {WELL_SHAPES}, got {self.shape!r}")
+        # Lists from JSON become tuples so templates stay hashable
+        for name in ("pitch", "offset", "well_size"):
+            object.__setattr__(self, name, tuple(float(v) for v in getattr(self, name)))
+
+    @classmethod
+    def standard(cls, wells, pitch, offset, well_size=None, rotation=0.0, shape="circle"):
+        """A 6 to 384 well plate; pitch and well_size may be one number or (x, y)."""
+        if wells not in PLATE_FORMATS:
+            raise ValueError(f"wells must be one of {sorted(PLATE_FORMATS)}, got {wells}")
+        rows, cols = PLATE_FORMATS[wells]
+        pitch = (pitch, pitch) if np.ndim(pitch) == 0 else tuple(pitch)
+        if well_size is None:
+            well_size = round(min(pitch) * WELL_FRACTION, 2)
+        well_size = (well_size, well_size) if np.ndim(well_size) == 0 else tuple(well_size)
+        return cls(rows, cols, pitch, offset, well_size, rotation, shape)
+
+    def __len__(self):
+        return self.rows * self.cols
+
+    def well_names(self):
+        return [f"{row_name(r)}{c + 1}" for r in range(self.rows) for c in range(self.cols)]
+
+    def axes(self):
+        """Unit vectors of the plate's x and y axes in image coordinates."""
+        t = np.deg2rad(self.rotation)
+        return np.array([np.cos(t), -np.sin(t)]), np.array([np.sin(t), np.cos(t)])
+
+    def centers(self):
+        """(N, 2) x, y of every well centre."""
+        row, col = np.divmod(np.arange(len(self)), self.cols)
+        u, v = self.axes()
+        return (np.array(self.offset) + np.outer(col * self.pitch[0], u)
+                + np.outer(row * self.pitch[1], v))
+
+    def corners(self):
+        """(N, 4, 2) corners of every well, of the square around it for circles."""
+        w, h = self.well_size if self.shape == "rect" else (self.well_size[0],) * 2
+        u, v = self.axes()
+        half = np.array([[-w, -h], [w, -h], [w, h], [-w, h]]) / 2
+        return self.centers()[:, None, :] + half[:, :1] * u + half[:, 1:] * v
+
+    def rects(self):
+        """(x, y, w, h) integer box around every well."""
+        corners = self.corners()
+        lo = np.floor(corners.min(axis=1) + 1e-9).astype(int)
+        hi = np.ceil(corners.max(axis=1) - 1e-9).astype(int)
+        return [tuple(r) for r in np.column_stack([lo, hi - lo]).tolist()]
+
+    def is_axis_aligned(self):
+        """Rectangular wells square to the image, whose means integral images give exactly."""
+        return self.shape == "rect" and self.rotation % 90 == 0
+
+    def scaled(self, factor):
+        """The same plate in an image resized by factor."""
+        return replace(
+            self,
+            pitch=[v * factor for v in self.pitch],
+            offset=[v * factor for v in self.offset],
+            well_size=[v * factor for v in self.well_size],
+        )
+
+
+def save_template(path, template):
+    with open(path, "w") as f:
+        json.dump(asdict(template), f, indent=2)
+
+
+def load_template(path):
+    with open(path) as f:
+        return PlateTemplate(**json.load(f))
+
+
+@lru_cache(maxsize=8)
+def well_labels(template, height, width):
+    """(labels, bbox, area) of a template drawn into a height x width frame.
+
+    labels is an int32 image holding each pixel's well number, 0 between
+    wells; bbox the (N, 4) x, y, w, h box around each well's labelled
+    pixels (0 x 0 for wells outside the frame) and area its pixel count.
+    Axis-aligned rectangles are labelled as their rects() boxes, the
+    pixels well_stats() averages for them. Cached per template and frame
+    size, so a series of images pays for the drawing once.
+    """
+    labels = np.zeros((height, width), np.int32)
+    scale = 1 << _SHIFT
+    if template.is_axis_aligned():
+        for i, (x0, y0, x1, y1) in enumerate(roi_bounds(template.rects(), width, height).tolist(), 1):
+            labels[y0:y1, x0:x1] = i
+    elif template.shape == "circle":
+        radius = round(template.well_size[0] / 2 * scale)
+        for i, (x, y) in enumerate(np.round(template.centers() * scale).astype(int).tolist(), 1):
+            cv2.circle(labels, (x, y), radius, i, -1, shift=_SHIFT)
+    else:
+        for i, corners in enumerate(np.round(template.corners() * scale).astype(np.int32), 1):
+            cv2.fillConvexPoly(labels, corners, i, shift=_SHIFT)
+    labels.flags.writeable = False
+
+    area = np.bincount(labels.ravel(), minlength=len(template) + 1)[1:]
+    return labels, label_boxes(labels, len(template)), area
+
+
+def label_boxes(labels, count):
+    """(count, 4) x, y, w, h box around the pixels of labels 1..count, 0 x 0 for absent labels.
+
+    Taken from the drawn pixels rather than the geometry, as rasterized
+    circles and turned wells reach past their rects() boxes.
+    """
+    ys, xs = np.nonzero(labels)
+    ids = labels[ys, xs] - 1
+    lo = np.full((2, count), np.iinfo(np.int64).max)
+    hi = np.full((2, count), -1)
+    for axis, coords in enumerate((xs, ys)):
+        np.minimum.at(lo[axis], ids, coords)
+        np.maximum.at(hi[axis], ids, coords)
+    empty = hi[0] < 0
+    lo[:, empty] = 0
+    hi[:, empty] = -1
+    return np.column_stack([lo.T, (hi - lo + 1).T])
+
+
+def well_boxes(template, height, width):
+    """(N, 4) x, y, w, h box of every well, clipped to the frame."""
+    bounds = roi_bounds(template.rects(), width, height)
+    return np.column_stack([bounds[:, :2], bounds[:, 2:] - bounds[:, :2]])
+
+
+def well_stats(image, template, hsv=None):
+    """(N, 7) STAT_COLUMNS means of every well of the template, well 1 first.
+
+    Axis-aligned rectangular wells are averaged crop by crop, or from
+    integral images beyond MANY_OBJECTS wells. Circles and turned plates
+    use the cached well_labels() image, so only each well's own pixels are
+    averaged. Either way the means are those of each well's pixels in
+    well_labels(), and the time follows the pixels inside wells rather
+    than the number of wells. Wells partly outside the frame use the pixels
+    inside it; wells entirely outside are NaN.
+    """
+    height, width = image.shape[:2]
+    wells = np.arange(1, len(template) + 1)
+    if template.is_axis_aligned():
+        if len(template) > MANY_OBJECTS:
+            return roi_channel_stats(image, hsv, template.rects())
+        return crop_object_means(image, hsv, None, wells, well_boxes(template, height, width), own_pixels=False)
+    labels, bbox, area = well_labels(template, height, width)
+    return label_means(image, hsv, labels, wells, bbox, area)
+
+
+def draw_wells(image, template, color=(0, 255, 0), thickness=2):
+    """Outline every well of the template on image."""
+    scale = 1 << _SHIFT
+    if template.shape == "circle":
+        radius = round(template.well_size[0] / 2 * scale)
+        for x, y in np.round(template.centers() * scale).astype(int).tolist():
+            cv2.circle(image, (x, y), radius, color, thickness, cv2.LINE_AA, shift=_SHIFT)
+    else:
+        corners = list(np.round(template.corners() * scale).astype(np.int32))
+        cv2.polylines(image, corners, True, color, thickness, cv2.LINE_AA, shift=_SHIFT)
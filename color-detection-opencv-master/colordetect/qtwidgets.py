@@ -0,0 +1,67 @@
+from PyQt6.QtWidgets import QApplication, QLabel, QScrollArea, QSizePolicy, QVBoxLayout, QWidget
+from PyQt6.QtGui import QImage, QPixmap
+from PyQt6.QtCore import Qt
+
+
+def bgr_to_pixmap(img):
+    height, width = img.shape[:2]
+    bytes_per_line = img.strides[0]
+    q_image = QImage(img.data, width, height, bytes_per_line, QImage.Format.Format_BGR888)
+    # QPixmap.fromImage copies the pixels, so img may be released afterwards
+    return QPixmap.fromImage(q_image)
+
+
+class ImageViewer(QScrollArea):
+    """Stand-alone window showing one full resolution annotated image."""
+
+    def __init__(self, img, title):
+        super().__init__()
+        self.setWindowTitle(title)
+        label = QLabel()
+        label.setPixmap(bgr_to_pixmap(img))
+        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.setWidget(label)
+        self.setWidgetResizable(True)
+
+        screen = QApplication.primaryScreen().availableGeometry()
+        height, width = img.shape[:2]
+        self.resize(min(width + 20, int(screen.width() * 0.9)),
+                    min(height + 20, int(screen.height() * 0.9)))
+
+
+class PlotCanvas(QWidget):
+    """Slot for a matplotlib canvas that only imports matplotlib when first plotted on.
+
+    figure creates the Figure and its FigureCanvas the first time it is used;
+    until then clear() and draw() do nothing, so the window opens without
+    paying for the matplotlib import.
+    """
+
+    def __init__(self, figsize=None, parent=None):
+        super().__init__(parent)
+        self._figsize = figsize
+        self._figure = None
+        self._canvas = None
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+
+    @property
+    def figure(self):
+        if self._figure is None:
+            from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+            from matplotlib.figure import Figure
+
+            self._figure = Figure(figsize=self._figsize)
+            self._canvas = FigureCanvasQTAgg(self._figure)
+            self.layout().addWidget(self._canvas)
+        return self._figure
+
+    def clear(self):
+        if self._figure is not None:
+            self._figure.clear()
+            self._canvas.draw()
+
+    def draw(self):
+        if self._canvas is not None:
+            self._canvas.draw()
@@ -0,0 +1,42 @@
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from colordetect.engine import iter_batch
+
+
+class BatchWorker(QThread):
+    """Runs the engine over a file list off the Qt event loop.
+
+    result_ready carries (position in file_names, file name, process_image
+    result) for every image, in input order, as soon as it is done; the
+    result rows are numbered from start_index. progress carries (done,
+    total). cancel() stops after the image being delivered and drops
+    everything still queued. An optional ResultCache serves images that were
+    already analyzed with the same config.
+    """
+
+    result_ready = pyqtSignal(int, str, object)
+    progress = pyqtSignal(int, int)
+
+    def __init__(self, file_names, config, workers=None, parent=None, cache=None, start_index=1):
+        super().__init__(parent)
+        self.file_names = list(file_names)
+        self.start_index = start_index
+        self.config = config
+        self.workers = workers
+        self.cache = cache
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        total = len(self.file_names)
+        results = iter_batch(self.file_names, self.config, self.workers, self.start_index, cache=self.cache)
+        try:
+            for pos, (file_name, result) in enumerate(zip(self.file_names, results)):
+                if self.cancelled:
+                    break
+                self.result_ready.emit(pos, file_name, result)
+                self.progress.emit(pos + 1, total)
+        finally:
+            results.close()
@@ -0,0 +1,108 @@
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+_lgamma = np.frompyfunc(math.lgamma, 1, 1)
+
+
+@dataclass
+class LinearFit:
+    """Straight line fits y = slope * x + intercept, one entry per y column."""
+    slope: np.ndarray
+    intercept: np.ndarray
+    r2: np.ndarray
+    p: np.ndarray            # two-sided p-value of the slope
+    stderr: np.ndarray       # standard error of the slope
+    n: np.ndarray            # points used
+
+    def predict(self, x):
+        """Fitted values at x, (points, columns) or (points,) for a single y."""
+        return np.multiply.outer(np.asarray(x, dtype=np.float64), self.slope) + self.intercept
+
+
+def _betainc(a, b, x):
+    """Regularized incomplete beta function I_x(a, b), elementwise.
+
+    Continued fraction (modified Lentz), using the symmetry
+    I_x(a, b) = 1 - I_(1-x)(b, a) where it converges faster.
+    """
+    a, b, x = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (a, b, x)))
+    swap = x > (a + 1.0) / (a + b + 2.0)
+    a, b, x = np.where(swap, b, a), np.where(swap, a, b), np.where(swap, 1.0 - x, x)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # frompyfunc gives a Python float, not an array, for 0-d input
+        log_front = np.asarray(_lgamma(a + b) - _lgamma(a) - _lgamma(b), dtype=np.float64) \
+            + a * np.log(x) + b * np.log1p(-x)
+        tiny = 1e-300
+        f = np.ones_like(x)
+        c = np.ones_like(x)
+        d = np.zeros_like(x)
+        for i in range(400):
+            m = i // 2
+            if i == 0:
+                num = np.ones_like(x)
+            elif i % 2 == 0:
+                num = m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m))
+            else:
+                num = -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))
+            d = 1.0 + num * d
+            d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+            c = 1.0 + num / np.where(np.abs(c) < tiny, tiny, c)
+            f *= c * d
+            if i and np.all(np.abs(1.0 - c * d) < 1e-15):
+                break
+        value = np.exp(log_front) * (f - 1.0) / a
+    value = np.where(x <= 0, 0.0, np.where(x >= 1, 1.0, value))
+    return np.where(swap, 1.0 - value, value)
+
+
+def t_pvalue(t, df):
+    """Two-sided p-value of Student's t with df degrees of freedom."""
+    t = np.asarray(t, dtype=np.float64)
+    df = np.asarray(df, dtype=np.float64)
+    valid = df > 0
+    # math.lgamma raises at 0 and the negative integers, so those get a dummy df
+    safe_df = np.where(valid, df, 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = _betainc(safe_df / 2.0, 0.5, safe_df / (safe_df + t * t))
+    return np.where(np.isinf(t), 0.0, np.where(valid, p, np.nan))
+
+
+def linear_fit(x, y):
+    """Ordinary least squares of every column of y on x, with an intercept.
+
+    x is (points,), y is (points,) or (points, columns); all columns are
+    solved at once from the closed-form sums. Rows where x or a column's y is
+    NaN are left out of that column's fit. Matches statsmodels'
+    OLS(y, add_constant(x)) params, rsquared, bse and pvalues for the slope.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    y2 = y[:, None] if y.ndim == 1 else y
+    used = np.isfinite(y2) & np.isfinite(x)[:, None]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = used.sum(axis=0)
+        mean_x = np.where(used, x[:, None], 0.0).sum(axis=0) / n
+        mean_y = np.where(used, y2, 0.0).sum(axis=0) / n
+        dx = np.where(used, x[:, None] - mean_x, 0.0)
+        dy = np.where(used, y2 - mean_y, 0.0)
+        sxx = (dx * dx).sum(axis=0)
+        sxy = (dx * dy).sum(axis=0)
+        syy = (dy * dy).sum(axis=0)
+
+        slope = sxy / sxx
+        intercept = mean_y - slope * mean_x
+        ss_res = np.maximum(syy - slope * sxy, 0.0)
+        r2 = 1.0 - ss_res / syy
+        df = n - 2
+        stderr = np.sqrt(ss_res / df / sxx)
+        p = t_pvalue(slope / stderr, df)
+
+    values = (slope, intercept, r2, p, stderr, n)
+    if y.ndim == 1:
+        # One y series: plain numbers instead of length-1 arrays
+        return LinearFit(*(v[0].item() for v in values))
+    return LinearFit(*values)
@@ -0,0 +1,198 @@
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+# Column order of every ROI/object stats tuple after (image index, roi index)
+STAT_COLUMNS = ["Blue Intensity", "Avg H", "Avg S", "Avg V", "Avg R", "Avg G", "Avg B"]
+
+# Above this bounding-box to ROI area ratio ROIs are converted one by one
+SPARSE_FACTOR = 4
+
+# What object means are averaged over: the object's own pixels, or its
+# whole bounding box including background (the numbers of the old contour loop)
+OBJECT_MEANS = ("mask", "bbox")
+
+# Above this many objects one pass over all object pixels beats a crop per object
+MANY_OBJECTS = 2048
+
+
+def roi_bounds(rois, width, height):
+    """(N, 4) array of x0, y0, x1, y1 clipped to the image, like numpy slicing."""
+    rects = np.asarray(rois, dtype=np.int64).reshape(-1, 4)
+    x0 = np.clip(rects[:, 0], 0, width)
+    y0 = np.clip(rects[:, 1], 0, height)
+    x1 = np.clip(rects[:, 0] + rects[:, 2], x0, width)
+    y1 = np.clip(rects[:, 1] + rects[:, 3], y0, height)
+    return np.stack([x0, y0, x1, y1], axis=1)
+
+
+def box_sums(table, bounds):
+    """Per-channel sums over every box, read from a (H+1, W+1, C) integral table."""
+    x0, y0, x1, y1 = bounds.T
+    return table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0]
+
+
+def stat_order(bgr, hsv):
+    """Arrange (N, 3) BGR and HSV columns as B, H, S, V, R, G, B."""
+    return np.column_stack(
+        [bgr[:, 0], hsv[:, 0], hsv[:, 1], hsv[:, 2], bgr[:, 2], bgr[:, 1], bgr[:, 0]]
+    )
+
+
+def sparse_roi_stats(image, bounds, with_std=False):
+    """Convert and average each ROI on its own, for ROIs scattered over a large frame."""
+    means = np.full((len(bounds), len(STAT_COLUMNS)), np.nan)
+    stds = np.full_like(means, np.nan)
+    for i, (x0, y0, x1, y1) in enumerate(bounds):
+        if x1 <= x0 or y1 <= y0:
+            continue
+        roi_bgr = image[y0:y1, x0:x1]
+        roi_hsv = cv2.cvtColor(roi_bgr, cv2.COLOR_BGR2HSV)
+        bgr_mean, bgr_std = cv2.meanStdDev(roi_bgr)
+        hsv_mean, hsv_std = cv2.meanStdDev(roi_hsv)
+        means[i] = stat_order(bgr_mean.T, hsv_mean.T)[0]
+        stds[i] = stat_order(bgr_std.T, hsv_std.T)[0]
+    return (means, stds) if with_std else means
+
+
+def roi_channel_stats(image, hsv, rois, with_std=False):
+    """Means (and optionally std-devs) of the 7 stats channels for all ROIs.
+
+    One integral image per colour space is built over the ROIs' bounding box,
+    after which every ROI costs four lookups, so the price is O(pixels + ROIs)
+    however many ROIs there are. Pass hsv=None to convert only the ROI pixels
+    instead of the whole frame; ROIs that cover little of their bounding box
+    are then converted one by one.
+    Returns an (N, 7) array in STAT_COLUMNS order, plus an (N, 7) std array
+    when with_std is set. Empty ROIs yield NaN.
+    """
+    height, width = image.shape[:2]
+    bounds = roi_bounds(rois, width, height)
+    counts = ((bounds[:, 2] - bounds[:, 0]) * (bounds[:, 3] - bounds[:, 1])).astype(np.float64)
+    if len(bounds) == 0:
+        empty = np.empty((0, len(STAT_COLUMNS)))
+        return (empty, empty.copy()) if with_std else empty
+
+    # Only the bounding box of all ROIs needs an integral table
+    ux0, uy0 = bounds[:, 0].min(), bounds[:, 1].min()
+    ux1, uy1 = bounds[:, 2].max(), bounds[:, 3].max()
+    if ux1 <= ux0 or uy1 <= uy0:
+        # Every ROI lies outside the image
+        nan = np.full((len(bounds), len(STAT_COLUMNS)), np.nan)
+        return (nan, nan.copy()) if with_std else nan
+    if hsv is None and (ux1 - ux0) * (uy1 - uy0) > SPARSE_FACTOR * counts.sum():
+        return sparse_roi_stats(image, bounds, with_std)
+
+    image = image[uy0:uy1, ux0:ux1]
+    if hsv is None:
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    else:
+        hsv = hsv[uy0:uy1, ux0:ux1]
+    bounds = bounds - np.array([ux0, uy0, ux0, uy0])
+
+    if with_std:
+        bgr_sum, bgr_sq = cv2.integral2(image, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+        hsv_sum, hsv_sq = cv2.integral2(hsv, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+    else:
+        bgr_sum = cv2.integral(image, sdepth=cv2.CV_64F)
+        hsv_sum = cv2.integral(hsv, sdepth=cv2.CV_64F)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sums = stat_order(box_sums(bgr_sum, bounds), box_sums(hsv_sum, bounds))
+        means = sums / counts[:, None]
+        if not with_std:
+            return means
+        squares = stat_order(box_sums(bgr_sq, bounds), box_sums(hsv_sq, bounds))
+        variance = np.maximum(squares / counts[:, None] - means ** 2, 0.0)
+    return means, np.sqrt(variance)
+
+
+@dataclass
+class ObjectStats:
+    """Connected objects of a mask, one entry per object in raster order of their top-left pixel."""
+    area: np.ndarray       # pixels
+    bbox: np.ndarray       # (N, 4) x, y, w, h
+    centroid: np.ndarray   # (N, 2) x, y
+    means: np.ndarray      # (N, 7) in STAT_COLUMNS order
+
+    def __len__(self):
+        return len(self.area)
+
+
+def crop_object_means(image, hsv, labels, keep, bbox, own_pixels=True):
+    """Means of each object's box, over the object's own pixels with own_pixels."""
+    means = np.empty((len(keep), len(STAT_COLUMNS)))
+    for i, (label, (x, y, w, h)) in enumerate(zip(keep.tolist(), bbox.tolist())):
+        if w <= 0 or h <= 0:
+            means[i] = np.nan
+            continue
+        roi_bgr = image[y:y + h, x:x + w]
+        roi_hsv = cv2.cvtColor(roi_bgr, cv2.COLOR_BGR2HSV) if hsv is None else hsv[y:y + h, x:x + w]
+        pixels = (labels[y:y + h, x:x + w] == label).view(np.uint8) if own_pixels else None
+        bgr_mean = cv2.mean(roi_bgr, pixels)[:3]
+        hsv_mean = cv2.mean(roi_hsv, pixels)[:3]
+        means[i] = stat_order(np.array([bgr_mean]), np.array([hsv_mean]))[0]
+    return means
+
+
+def bincount_object_means(image, hsv, labels, keep, area):
+    """Means over each object's own pixels from label-indexed np.bincount sums."""
+    inside = labels > 0
+    object_labels = labels[inside]
+    # Channel by channel: boolean indexing a 3-channel image is much slower
+    bgr = [image[:, :, c][inside] for c in range(3)]
+    if hsv is None:
+        pixels = np.stack(bgr, axis=1).reshape(-1, 1, 3)
+        hsv = cv2.cvtColor(pixels, cv2.COLOR_BGR2HSV).reshape(-1, 3)
+        hsv = [hsv[:, c] for c in range(3)]
+    else:
+        hsv = [hsv[:, :, c][inside] for c in range(3)]
+    length = int(keep.max(initial=0)) + 1
+    sums = [np.bincount(object_labels, weights=channel, minlength=length)[keep] for channel in bgr + hsv]
+    return stat_order(np.column_stack(sums[:3]), np.column_stack(sums[3:])) / area[:, None]
+
+
+def label_means(image, hsv, labels, keep, bbox, area):
+    """Means over the pixels of each label in keep, with bbox and area from connectedComponentsWithStats.
+
+    Up to MANY_OBJECTS labels are averaged box by box; beyond that the sums
+    come from one np.bincount per channel, which no longer depends on the count.
+    """
+    if len(keep) <= MANY_OBJECTS:
+        means = crop_object_means(image, hsv, labels, keep, bbox)
+    else:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = bincount_object_means(image, hsv, labels, keep, area)
+    # Labels without pixels (e.g. wells outside the frame) have no mean
+    means[np.asarray(area) == 0] = np.nan
+    return means
+
+
+def object_stats(image, mask, hsv=None, min_area=0, means="mask"):
+    """Area, box, centroid and channel means of every object of a binary mask.
+
+    Objects are the 8-connected components of mask with more than min_area
+    pixels, found with one connectedComponentsWithStats call. With
+    means="mask" the 7 stats channels are averaged over each object's own
+    pixels; with "bbox" over its bounding box, background included, as the
+    per-contour loops used to. Pass hsv=None to convert only the pixels in
+    the objects' boxes.
+
+    Many objects are averaged as in label_means(), or for "bbox" from
+    integral images.
+    """
+    if means not in OBJECT_MEANS:
+        raise ValueError(f"means must be one of {OBJECT_MEANS}, got {means!r}")
+    _, labels, cc_stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    keep = np.flatnonzero(cc_stats[1:, cv2.CC_STAT_AREA] > min_area) + 1
+    area = cc_stats[keep, cv2.CC_STAT_AREA]
+    bbox = cc_stats[keep, :cv2.CC_STAT_AREA]
+
+    if means == "mask":
+        values = label_means(image, hsv, labels, keep, bbox, area)
+    elif len(keep) <= MANY_OBJECTS:
+        values = crop_object_means(image, hsv, labels, keep, bbox, own_pixels=False)
+    else:
+        values = roi_channel_stats(image, hsv, bbox)
+    return ObjectStats(area, bbox, centroids[keep], values)
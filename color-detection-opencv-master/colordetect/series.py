@@ -0,0 +1,157 @@
+import numpy as np
+
+from colordetect.smoothing import lowess_uniform
+
+# Value columns of a result row, after (image index, ROI index)
+CHANNELS = ("blue", "h", "s", "v", "r", "g", "b")
+
+
+class SeriesStore:
+    """Result rows of a batch plus memoized smoothed channel series.
+
+    Behaves like the list of (image idx, ROI idx, blue, h, s, v, r, g, b)
+    rows the GUIs used to keep. raw() and smoothed() return one channel of
+    one ROI in image order; smoothed series are cached under (ROI, channel,
+    frac, data version), and the version only changes when rows are added or
+    cleared, so saving and plotting the same data smooths it once.
+    """
+
+    def __init__(self, rows=()):
+        self._rows = list(rows)
+        self.version = 0
+        self._raw = None            # ROI index -> (channels, images) array
+        self._smoothed = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __getitem__(self, idx):
+        return self._rows[idx]
+
+    def extend(self, rows):
+        rows = list(rows)
+        if rows:
+            self._rows.extend(rows)
+            self._changed()
+
+    def clear(self):
+        self._rows.clear()
+        self._changed()
+
+    def _changed(self):
+        self.version += 1
+        self._raw = None
+        self._smoothed.clear()
+
+    def rois(self):
+        return sorted(self._arrays())
+
+    def _arrays(self):
+        if self._raw is None:
+            per_roi = {}
+            for row in self._rows:
+                per_roi.setdefault(row[1], []).append(row[2:])
+            self._raw = {roi: np.array(values, dtype=float).T for roi, values in per_roi.items()}
+        return self._raw
+
+    def raw(self, channel, roi=1):
+        return self._arrays()[roi][CHANNELS.index(channel)]
+
+    def smoothed(self, channel, roi=1, frac=0.3):
+        key = (roi, channel, frac, self.version)
+        if key not in self._smoothed:
+            self._smooth_all(frac)
+        return self._smoothed[key]
+
+    def _smooth_all(self, frac):
+        # Every channel of every ROI with the same number of images in one call
+        by_length = {}
+        for roi, values in self._arrays().items():
+            by_length.setdefault(values.shape[1], []).append(roi)
+        for rois in by_length.values():
+            smoothed = lowess_uniform(np.stack([self._raw[roi] for roi in rois]), frac=frac)
+            for roi, channels in zip(rois, smoothed):
+                for channel, series in zip(CHANNELS, channels):
+                    self._smoothed[(roi, channel, frac, self.version)] = series
+
+
+class ResultGrid:
+    """Result rows of an ROI batch in a preallocated (images, ROIs, channels) array.
+
+    extend() takes the same (image idx, ROI idx, blue, h, s, v, r, g, b) rows
+    as SeriesStore and scatters them into place, so the per-ROI series are
+    plain slices instead of searches through the row list. Images without a
+    result are NaN. The array doubles when an image index runs past the end,
+    which keeps watch mode appends cheap. len() is the highest image index.
+    """
+
+    def __init__(self, n_rois=1, capacity=256):
+        self._initial_rois = n_rois
+        self._values = np.full((capacity, n_rois, len(CHANNELS)), np.nan)
+        self.n_images = 0
+        self.version = 0
+        self._smoothed = {}
+
+    def __len__(self):
+        return self.n_images
+
+    @property
+    def n_rois(self):
+        return self._values.shape[1]
+
+    @property
+    def values(self):
+        """(images, ROIs, channels) view; row i holds image index i + 1."""
+        return self._values[:self.n_images]
+
+    def extend(self, rows):
+        rows = np.asarray(list(rows), dtype=np.float64)
+        if not len(rows):
+            return
+        images = rows[:, 0].astype(np.intp) - 1
+        rois = rows[:, 1].astype(np.intp) - 1
+        n_images = max(self.n_images, images.max() + 1)
+        capacity = self._values.shape[0]
+        while capacity < n_images:
+            capacity *= 2
+        n_rois = max(self.n_rois, rois.max() + 1)
+        if (capacity, n_rois) != self._values.shape[:2]:
+            grown = np.full((capacity, n_rois, len(CHANNELS)), np.nan)
+            grown[:self.n_images, :self.n_rois] = self.values
+            self._values = grown
+        self._values[images, rois] = rows[:, 2:]
+        self.n_images = n_images
+        self.version += 1
+        self._smoothed.clear()
+
+    def clear(self):
+        # Back to the starting ROI count, so a smaller batch loaded next has no stale columns
+        self._values = np.full((self._values.shape[0], self._initial_rois, len(CHANNELS)), np.nan)
+        self.n_images = 0
+        self.version += 1
+        self._smoothed.clear()
+
+    def present(self):
+        """Mask of the image indices that have any result."""
+        return ~np.isnan(self.values).all(axis=(1, 2))
+
+    def smoothed(self, frac=0.3):
+        """LOWESS of every ROI and channel, same shape as values.
+
+        Images without a result are skipped in the fit and stay NaN, so
+        a failed image does not shift the series. Computed once per data
+        version.
+        """
+        if frac not in self._smoothed:
+            present = self.present()
+            result = np.full_like(self.values, np.nan)
+            series = self.values[present]
+            if len(series) > 2:
+                # Images on the last axis: every (ROI, channel) series in one call
+                series = np.moveaxis(lowess_uniform(np.moveaxis(series, 0, -1), frac=frac), -1, 0)
+            result[present] = series
+            self._smoothed[frac] = result
+        return self._smoothed[frac]
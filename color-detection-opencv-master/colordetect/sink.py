@@ -0,0 +1,289 @@
+import csv
+import json
+import os
+import time
+
+from colordetect.table import METADATA_KEY, arrow_schema, arrow_table
+
+FILE_COLUMN = "File"
+
+VALUE_COLUMNS = ["Avg H", "Avg S", "Avg V", "Avg R", "Avg G", "Avg B"]
+
+# Appended to a sink's path for the list of images that gave no rows (no
+# objects, unreadable), which resume counts as done like the images with rows
+EMPTY_SUFFIX = ".empty"
+
+# Appended to a CSV sink's path for the run_metadata() of the run that wrote
+# it; Parquet and Feather keep it in the schema instead
+SETTINGS_SUFFIX = ".settings.json"
+
+
+def result_header(mode):
+    """Column names of the rows written for a pipeline mode ("roi" or "objects")."""
+    if mode == "roi":
+        return ["Image Index", "ROI Index", "Blue Intensity"] + VALUE_COLUMNS + [FILE_COLUMN]
+    return ["Image Index", "Object Index", "Light Intensity"] + VALUE_COLUMNS + [FILE_COLUMN]
+
+
+def start_empty_log(path, resume):
+    """Images a previous run into path listed as empty; a fresh run clears the list."""
+    log = path + EMPTY_SUFFIX
+    if resume and os.path.exists(path):
+        try:
+            with open(log) as f:
+                # A line cut short by an interrupted run has no newline
+                return {line[:-1] for line in f if line.endswith("\n")}
+        except FileNotFoundError:
+            return set()
+    if os.path.exists(log):
+        os.remove(log)
+    return set()
+
+
+def check_settings(path, stored, metadata):
+    """Refuse to resume path if it was written with other settings than metadata.
+
+    The source file list is not compared, so a resumed run may add images.
+    Tables without stored settings (written before they were kept) are
+    accepted as they are.
+    """
+    if not stored or not metadata:
+        return
+    # Through JSON so that tuples and lists compare equal
+    current = json.loads(json.dumps(metadata))
+    changed = sorted(
+        key for key in stored.keys() | current.keys()
+        if key != "files" and stored.get(key) != current.get(key)
+    )
+    if changed:
+        raise ValueError(
+            f"Cannot resume {path}: it was written with different settings ({', '.join(changed)})"
+        )
+
+
+def log_empty(path, file_name):
+    with open(path + EMPTY_SUFFIX, mode="a") as f:
+        f.write(file_name + "\n")
+
+
+class CsvSink:
+    """Append result rows to a CSV file as images complete.
+
+    Rows are buffered and flushed every flush_every rows or flush_seconds,
+    whichever comes first, so nothing accumulates in memory. Every row carries
+    its source file in the last column; with resume=True an existing file is
+    kept, the rows of the last file in it (which may have been cut short) are
+    dropped, and completed_files lists what does not need to be redone.
+    Images that give no rows are recorded with mark_empty() so that they
+    count as completed too. metadata (see colordetect.table.run_metadata) is
+    kept next to the file, and resuming a file written with other settings
+    raises ValueError.
+    """
+
+    def __init__(self, path, header, flush_every=100, flush_seconds=5.0, resume=False, metadata=None):
+        self.path = path
+        self.header = list(header)
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self.completed_files = set()
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+        if resume and os.path.exists(path) and os.path.getsize(path) > 0:
+            check_settings(path, self._read_settings(path), metadata)
+            self.completed_files = self._truncate_incomplete(path) | start_empty_log(path, resume)
+            self._file = open(path, mode="a", newline="")
+            self._writer = csv.writer(self._file)
+        else:
+            start_empty_log(path, resume=False)
+            self._file = open(path, mode="w", newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.header)
+            self._file.flush()
+            self._write_settings(path, metadata)
+
+    def _read_settings(self, path):
+        try:
+            with open(path + SETTINGS_SUFFIX) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_settings(self, path, metadata):
+        settings = path + SETTINGS_SUFFIX
+        if metadata:
+            with open(settings, mode="w") as f:
+                json.dump(metadata, f)
+        elif os.path.exists(settings):
+            # Left by an earlier run into the same path
+            os.remove(settings)
+
+    def _truncate_incomplete(self, path):
+        with open(path, mode="rb") as f:
+            lines = f.readlines()
+        header = next(csv.reader([lines[0].decode()]))
+        if header != self.header:
+            raise ValueError(f"Cannot resume {path}: its columns do not match this run")
+
+        file_col = header.index(FILE_COLUMN)
+        completed = []          # source files in the order they appear
+        starts = {}             # byte offset where each file's rows begin
+        offset = len(lines[0])
+        for line in lines[1:]:
+            if not line.endswith(b"\n"):
+                break           # partially written last line
+            row = next(csv.reader([line.decode()]), [])
+            if len(row) != len(header):
+                break
+            if row[file_col] not in starts:
+                starts[row[file_col]] = offset
+                completed.append(row[file_col])
+            offset += len(line)
+
+        keep = offset
+        if completed:
+            # The last file may not have had all of its rows written
+            keep = starts[completed.pop()]
+        with open(path, mode="r+b") as f:
+            f.truncate(keep)
+        return set(completed)
+
+    def write(self, rows):
+        self._pending.extend(rows)
+        if (len(self._pending) >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_seconds):
+            self.flush()
+
+    def mark_empty(self, file_name):
+        """Record an image that was processed but gave no rows."""
+        log_empty(self.path, file_name)
+
+    def flush(self):
+        if self._pending:
+            self._writer.writerows(self._pending)
+            self._pending.clear()
+        self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ParquetSink:
+    """Parquet counterpart of CsvSink; each flush becomes one row group.
+
+    Value columns are float32 and the pipeline settings can be stored as
+    schema metadata (see colordetect.table). A Parquet file is only readable
+    once closed, so resuming works from a file left by a finished or
+    interrupted-but-closed run: its rows are copied into the new file before
+    appending. As with CsvSink, the stored settings have to match metadata.
+    """
+
+    def __init__(self, path, header, flush_every=1000, flush_seconds=30.0, resume=False, metadata=None):
+        import pyarrow as pa
+
+        self._pa = pa
+        self.path = path
+        self.header = list(header)
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self.completed_files = set()
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+        self.schema = arrow_schema(self.header, metadata)
+        previous = None
+        if resume and os.path.exists(path):
+            previous = self._read_previous(path)
+            if previous.column_names != self.header:
+                raise ValueError(f"Cannot resume {path}: its columns do not match this run")
+            stored = (previous.schema.metadata or {}).get(METADATA_KEY)
+            check_settings(path, json.loads(stored) if stored else {}, metadata)
+            self.completed_files = set(previous.column(FILE_COLUMN).to_pylist())
+        self.completed_files |= start_empty_log(path, resume)
+
+        self._writer = self._open_writer(path)
+        if previous is not None and previous.num_rows:
+            self._writer.write_table(previous.cast(self.schema))
+
+    def _read_previous(self, path):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path)
+
+    def _open_writer(self, path):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows):
+        self._pending.extend(rows)
+        if (len(self._pending) >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_seconds):
+            self.flush()
+
+    def mark_empty(self, file_name):
+        """Record an image that was processed but gave no rows."""
+        log_empty(self.path, file_name)
+
+    def flush(self):
+        if self._pending:
+            self._writer.write_table(arrow_table(self.header, self._pending, schema=self.schema))
+            self._pending.clear()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self._writer is not None:
+            self.flush()
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FeatherSink(ParquetSink):
+    """Feather (Arrow IPC file) counterpart of ParquetSink; each flush is one record batch."""
+
+    def _read_previous(self, path):
+        # Read everything into memory first; the writer truncates the same path
+        with self._pa.memory_map(path) as source:
+            return self._pa.ipc.open_file(source).read_all()
+
+    def _open_writer(self, path):
+        options = self._pa.ipc.IpcWriteOptions(compression="zstd")
+        return self._pa.ipc.new_file(path, self.schema, options=options)
+
+
+def open_sink(path, header, resume=False, metadata=None, **kwargs):
+    """CsvSink, ParquetSink or FeatherSink depending on the file extension.
+
+    metadata (see colordetect.table.run_metadata) goes into the schema of the
+    columnar formats and next to a CSV file.
+    """
+    lower = path.lower()
+    if lower.endswith(".parquet"):
+        return ParquetSink(path, header, resume=resume, metadata=metadata, **kwargs)
+    if lower.endswith(".feather"):
+        return FeatherSink(path, header, resume=resume, metadata=metadata, **kwargs)
+    return CsvSink(path, header, resume=resume, metadata=metadata, **kwargs)
+
+
+def read_rows(path):
+    """Iterate the rows of a sink CSV as (image idx, object idx, 7 floats, file)."""
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            yield (int(row[0]), int(row[1]), *(float(v) for v in row[2:-1]), row[-1])
@@ -0,0 +1,96 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# GUI scripts launched from the lab PCs, relative to the repository folder
+ENTRY_POINTS = (
+    "RUN_GUI.py",
+    "RUN_GUI_Multi_fixed.py",
+    "RUN_GUI_Point.py",
+    "RUN_GUI_ROI_LastImage.py",
+    "Enter1_90anticlockwise_multifiles_saveHSVRGB.py",
+    "HVS_slider_GUI.py",
+    "GUI_Qt.py",
+    "graph_gui.py",
+    "point_detect.py",
+    "point_detected_adv.py",
+    "point_detected_adv_threshold.py",
+    "point_detected_linear_fit.py",
+    "point_detected_linear_fit_adv.py",
+)
+
+# Imports that dominate start-up when pulled in at module level
+HEAVY_MODULES = ("matplotlib", "statsmodels", "pandas", "scipy", "pyarrow")
+
+# Runs a script as __main__ and reports once its first window or dialog is up,
+# with the heavy modules loaded by then. The event loop is quit right away and
+# a dialog's exec() ends the script as if it had been cancelled.
+_PROBE = r"""
+import os, runpy, sys
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QApplication, QDialog
+
+HEAVY = set(sys.argv[2].split(","))
+
+def shown():
+    loaded = {name.split(".")[0] for name in sys.modules} & HEAVY
+    print("COLORDETECT_WINDOW_SHOWN", " ".join(sorted(loaded)), flush=True)
+
+def app_exec(*args):
+    QTimer.singleShot(0, lambda: (shown(), QApplication.quit()))
+    return _app_exec()
+
+def dialog_exec(self, *args):
+    shown()
+    raise SystemExit(0)
+
+_app_exec = QApplication.exec
+QApplication.exec = app_exec
+QDialog.exec = dialog_exec
+sys.argv = [sys.argv[1]]
+# As `python script.py` would: the script's folder comes first on the path
+sys.path[0] = os.path.dirname(sys.argv[0])
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+except SystemExit:
+    pass
+"""
+
+
+def time_to_window(script, timeout=60.0):
+    """(seconds, heavy modules) from launching `python script` until its first window is shown.
+
+    The time includes interpreter start-up and every import, which is what a
+    user waits for; seconds is None if no window appeared. Runs with the
+    offscreen Qt platform, so no display is needed.
+    """
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", _PROBE, os.path.abspath(script), ",".join(HEAVY_MODULES)],
+        cwd=os.path.dirname(os.path.abspath(script)),
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=env,
+    )
+    elapsed, loaded = None, []
+    try:
+        for line in proc.stdout:
+            if line.startswith("COLORDETECT_WINDOW_SHOWN"):
+                elapsed = time.perf_counter() - started
+                loaded = line.split()[1:]
+                break
+        proc.wait(timeout=timeout)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+    return elapsed, loaded
+
+
+def benchmark(scripts, repeat=3):
+    """Yield (script, median seconds to window or None, heavy modules loaded) per script."""
+    for script in scripts:
+        runs = [time_to_window(script) for _ in range(repeat)]
+        times = [elapsed for elapsed, _ in runs if elapsed is not None]
+        yield script, statistics.median(times) if times else None, runs[-1][1]
@@ -0,0 +1,167 @@
+import csv
+import json
+from dataclasses import asdict
+
+import numpy as np
+
+# Result tables ending in these are written with pyarrow instead of csv
+COLUMNAR_EXTENSIONS = (".parquet", ".feather")
+
+# Files the batch commands accept as result tables
+TABLE_EXTENSIONS = (".csv",) + COLUMNAR_EXTENSIONS
+
+# Schema metadata key holding run_metadata() as JSON
+METADATA_KEY = b"colordetect"
+
+# Save dialog filter offering every supported table format
+TABLE_FILTER = "CSV Files (*.csv);;Parquet Files (*.parquet);;Feather Files (*.feather)"
+
+
+def is_columnar(path):
+    return path.lower().endswith(COLUMNAR_EXTENSIONS)
+
+
+def run_metadata(config, files=()):
+    """What produced a result table: pipeline mode, ROIs, HSV range and source images."""
+    return {
+        "mode": config.mode,
+        "rois": [list(roi) for roi in config.rois],
+        "plate": asdict(config.plate) if config.plate is not None else None,
+        "hsv_lower": list(config.hsv_lower),
+        "hsv_upper": list(config.hsv_upper),
+        "rotate": config.rotate,
+        "decode_scale": config.decode_scale,
+        "object_method": config.object_method,
+        "object_means": config.object_means,
+        "files": list(files),
+    }
+
+
+def _arrow_type(pa, name):
+    if name.endswith("Index"):
+        return pa.int32()
+    if name == "File":
+        return pa.string()
+    # Channel means are 0-255 averages; float32 keeps ~7 significant digits at half the size
+    return pa.float32()
+
+
+def arrow_schema(header, metadata=None):
+    import pyarrow as pa
+
+    fields = [(name, _arrow_type(pa, name)) for name in header]
+    if metadata:
+        return pa.schema(fields, metadata={METADATA_KEY: json.dumps(metadata).encode()})
+    return pa.schema(fields)
+
+
+def _arrow_column(pa, values, arrow_type):
+    if pa.types.is_floating(arrow_type):
+        try:
+            # NaN is stored as null, like "" below
+            return pa.array(np.asarray(values, dtype=np.float64), type=arrow_type, from_pandas=True)
+        except ValueError:
+            pass
+    elif isinstance(values, np.ndarray):
+        return pa.array(values, type=arrow_type)
+    # The wide GUI tables leave "" where an ROI has no value for an image
+    return pa.array([None if isinstance(v, str) and not v else v for v in values], type=arrow_type)
+
+
+def arrow_table(header, rows, metadata=None, schema=None):
+    import pyarrow as pa
+
+    schema = schema if schema is not None else arrow_schema(header, metadata)
+    if isinstance(rows, np.ndarray):
+        columns = np.ascontiguousarray(rows.T)
+    else:
+        columns = list(zip(*rows)) if rows else [()] * len(schema)
+    return pa.table(
+        [_arrow_column(pa, col, field.type) for col, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def write_rows(path, header, rows, metadata=None):
+    """Write a result table as CSV, Parquet or Feather depending on the extension.
+
+    rows is a list of rows or a 2D numeric array; "" and NaN mark missing
+    values. The columnar formats store the value columns as float32 and the
+    indices as int32, and carry metadata (see run_metadata) in the file's
+    schema.
+    """
+    lower = path.lower()
+    if lower.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        pq.write_table(arrow_table(header, rows, metadata), path, compression="zstd")
+    elif lower.endswith(".feather"):
+        import pyarrow.feather as feather
+
+        feather.write_feather(arrow_table(header, rows, metadata), path, compression="zstd")
+    else:
+        with open(path, mode="w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(_csv_rows(header, rows) if isinstance(rows, np.ndarray) else rows)
+
+
+def _csv_rows(header, array):
+    rows = array.tolist()
+    for i in np.flatnonzero(np.isnan(array).any(axis=1)):
+        rows[i] = ["" if v != v else v for v in rows[i]]
+    for col, name in enumerate(header):
+        if name.endswith("Index"):
+            for row in rows:
+                row[col] = int(row[col])
+    return rows
+
+
+def read_table(path, columns=None):
+    """pandas DataFrame from a CSV, Excel, Parquet or Feather result table."""
+    import pandas as pd
+
+    lower = path.lower()
+    if lower.endswith(".parquet"):
+        return pd.read_parquet(path, columns=columns)
+    if lower.endswith(".feather"):
+        return pd.read_feather(path, columns=columns)
+    if lower.endswith(".xlsx"):
+        return pd.read_excel(path, usecols=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def table_columns(path):
+    """Column names of a result table without loading it."""
+    lower = path.lower()
+    if lower.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.read_schema(path).names
+    if lower.endswith(".feather"):
+        import pyarrow as pa
+
+        with pa.memory_map(path) as source:
+            return pa.ipc.open_file(source).schema.names
+    if lower.endswith(".xlsx"):
+        return list(read_table(path).columns)
+    with open(path, newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def read_metadata(path):
+    """The run_metadata dict stored in a Parquet/Feather table ({} for CSV or none stored)."""
+    lower = path.lower()
+    if lower.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        schema = pq.read_schema(path)
+    elif lower.endswith(".feather"):
+        import pyarrow as pa
+
+        with pa.memory_map(path) as source:
+            schema = pa.ipc.open_file(source).schema
+    else:
+        return {}
+    raw = (schema.metadata or {}).get(METADATA_KEY)
+    return json.loads(raw) if raw else {}
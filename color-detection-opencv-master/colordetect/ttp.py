@@ -0,0 +1,150 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from colordetect.crossing import first_crossings, smooth_frames, to_frames
+from colordetect.regression import linear_fit
+from colordetect.table import read_table, table_columns
+
+# Columns of the per-well summary table written by the ttp command
+SUMMARY_HEADER = [
+    "File", "ROI Index", "Crossing Index", "Time To Positive", "Value At Crossing",
+    "Concentration", "Log10 Concentration",
+]
+
+_WIDE_COLUMN = re.compile(r"^ROI(\d+) (.+)$")
+
+
+@dataclass
+class CrossingConfig:
+    threshold: float
+    channel: str = "Blue Intensity"  # value column of the roi_stats table
+    rearm: float = None              # hysteresis level, see first_crossings
+    sustain: int = 1                 # frames the signal must stay above threshold
+    smooth: bool = False             # detect on the LOWESS of each well
+    frac: float = 0.3
+    interpolate: bool = False        # sub-frame crossing positions
+    interval: float = 1.0            # time between images, Time To Positive = position * interval
+
+
+def well_series(df, channel):
+    """{ROI index: values by image} from a long or wide roi_stats table.
+
+    Long tables (RUN_GUI_ROI_LastImage, colordetect run) have one row per
+    image and ROI with "Image Index" and "ROI Index" columns; wide tables
+    (RUN_GUI_Multi_fixed) have one row per image and "ROI<n> <channel>"
+    columns. Position i of a series is image i + 1 (row i of a wide table).
+    Images without a value are NaN rather than dropped, so a missing frame
+    does not move the crossings after it.
+    """
+    if "ROI Index" in df.columns:
+        if channel not in df.columns:
+            raise KeyError(f"no {channel!r} column")
+        rois = df["ROI Index"].to_numpy()
+        images = df["Image Index"].to_numpy(dtype=np.intp) - 1
+        values = df[channel].to_numpy(dtype=np.float64)
+        keys, well = np.unique(rois, return_inverse=True)
+        series = np.full((len(keys), images.max() + 1 if len(images) else 0), np.nan)
+        series[well.ravel(), images] = values
+        return {int(roi): values for roi, values in zip(keys, series)}
+    wells = {}
+    for col in df.columns:
+        match = _WIDE_COLUMN.match(str(col))
+        if match and match.group(2) == channel:
+            wells[int(match.group(1))] = df[col].to_numpy(dtype=np.float64)
+    if not wells:
+        raise KeyError(f"no {channel!r} column")
+    return dict(sorted(wells.items()))
+
+
+def _wanted_columns(columns, channel):
+    if "ROI Index" in columns:
+        return [c for c in ("Image Index", "ROI Index", channel) if c in columns]
+    matches = ((c, _WIDE_COLUMN.match(c)) for c in columns)
+    return [c for c, match in matches if match and match.group(2) == channel]
+
+
+def file_crossings(path, config):
+    """[file, ROI index, crossing index, time to positive, value] for every well of one table."""
+    # Only the columns of the tested channel are parsed
+    columns = _wanted_columns(table_columns(path), config.channel)
+    wells = well_series(read_table(path, columns=columns or None), config.channel)
+    frames = to_frames(wells.values())
+    signal = smooth_frames(frames, config.frac) if config.smooth else frames
+    indices, positions = first_crossings(
+        signal, config.threshold, rearm=config.rearm, sustain=config.sustain,
+        interpolate=config.interpolate,
+    )
+    rows = []
+    for j, roi in enumerate(wells):
+        found = indices[j] >= 0
+        rows.append([
+            path, roi,
+            int(indices[j]) if found else "",
+            positions[j] * config.interval if found else "",
+            signal[indices[j], j] if found else "",
+        ])
+    return rows
+
+
+def _file_crossings_or_error(args):
+    path, config = args
+    try:
+        return file_crossings(path, config), None
+    except Exception as e:
+        return [], f"{path}: {e}"
+
+
+def iter_crossings(paths, config, workers=None):
+    """Yield (rows, error) per file in input order, tables read in parallel."""
+    from colordetect.engine import default_workers, pool_context
+
+    workers = default_workers() if workers is None else workers
+    jobs = ((path, config) for path in paths)
+    if workers <= 1 or len(paths) <= 1:
+        yield from map(_file_crossings_or_error, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as executor:
+        # Small tables: hand them out in chunks so the pool overhead stays low
+        chunksize = max(1, min(64, len(paths) // (workers * 4)))
+        yield from executor.map(_file_crossings_or_error, jobs, chunksize=chunksize)
+
+
+def load_concentrations(path):
+    """{(file name, ROI index): concentration} from a plate layout table.
+
+    The layout has "File", "ROI Index" and "Concentration" columns. File is
+    matched against the base name of each roi_stats table; "*" applies a row
+    to every file, e.g. when all plates share one layout.
+    """
+    df = read_table(path)
+    missing = {"File", "ROI Index", "Concentration"} - set(df.columns)
+    if missing:
+        raise KeyError(f"{path} has no {', '.join(sorted(missing))} column")
+    return {(str(f), int(roi)): float(c)
+            for f, roi, c in zip(df["File"], df["ROI Index"], df["Concentration"])}
+
+
+def concentration_for(layout, path, roi):
+    name = os.path.basename(path)
+    for key in ((name, roi), (os.path.splitext(name)[0], roi), ("*", roi)):
+        if key in layout:
+            return layout[key]
+    return None
+
+
+def calibrate(rows):
+    """OLS of log10(concentration) on time to positive over every detected well with a concentration.
+
+    Same model as RegressionApp.fit_data; returns a dict with slope,
+    intercept, r2, p (of the slope) and n, or None with fewer than three wells.
+    """
+    points = [(row[3], row[6]) for row in rows if row[3] != "" and row[6] != ""]
+    if len(points) < 3:
+        return None
+    x, y = np.array(points, dtype=np.float64).T
+    fit = linear_fit(x, y)
+    return {"slope": fit.slope, "intercept": fit.intercept, "r2": fit.r2, "p": fit.p, "n": fit.n}
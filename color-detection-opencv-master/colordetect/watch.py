@@ -0,0 +1,87 @@
+import os
+
+from PyQt6.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSignal
+
+from colordetect.engine import IMAGE_EXTENSIONS
+
+
+def list_images(directory):
+    """Image files directly inside directory as {path: (size, mtime_ns)}."""
+    found = {}
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                    st = entry.stat()
+                    found[entry.path] = (st.st_size, st.st_mtime_ns)
+    except OSError:
+        pass
+    return found
+
+
+class FolderWatcher(QObject):
+    """Reports image files as they appear in a directory.
+
+    QFileSystemWatcher (inotify on Linux) triggers a rescan as soon as the
+    directory changes; a slow polling timer covers file systems that do not
+    deliver change events, such as network shares. A file is only reported
+    once its size and mtime are the same on two consecutive scans, so images
+    the camera is still writing are picked up on the next scan instead.
+    new_files carries the new paths in (mtime, name) order and every file is
+    reported once.
+    """
+
+    new_files = pyqtSignal(list)
+
+    def __init__(self, directory, poll_seconds=5.0, settle_ms=500, known=(), parent=None):
+        super().__init__(parent)
+        self.directory = directory
+        self._seen = {os.path.abspath(f) for f in known}
+        self._candidates = {}       # path -> (size, mtime_ns) on the previous scan
+
+        self._watcher = QFileSystemWatcher(self)
+        self.using_events = self._watcher.addPath(directory)
+        self._watcher.directoryChanged.connect(self._schedule_scan)
+
+        # Change events come in bursts while a file is written; scan once they settle
+        self._settle_timer = QTimer(self)
+        self._settle_timer.setSingleShot(True)
+        self._settle_timer.setInterval(settle_ms)
+        self._settle_timer.timeout.connect(self.scan)
+
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(int(poll_seconds * 1000))
+        self._poll_timer.timeout.connect(self.scan)
+
+    def start(self):
+        self._poll_timer.start()
+        self.scan()
+
+    def stop(self):
+        self._poll_timer.stop()
+        self._settle_timer.stop()
+        self._watcher.removePaths(self._watcher.directories())
+
+    def _schedule_scan(self, _path=None):
+        self._settle_timer.start()
+
+    def scan(self):
+        ready = []
+        unsettled = {}
+        for path, state in list_images(self.directory).items():
+            path = os.path.abspath(path)
+            if path in self._seen:
+                continue
+            if state[0] > 0 and self._candidates.get(path) == state:
+                ready.append((state[1], path))
+            else:
+                unsettled[path] = state
+        self._candidates = unsettled
+        if unsettled:
+            # Look again shortly rather than waiting for the next poll
+            self._settle_timer.start()
+        if ready:
+            ready.sort()
+            paths = [path for _, path in ready]
+            self._seen.update(paths)
+            self.new_files.emit(paths)
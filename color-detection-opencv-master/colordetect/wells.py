@@ -0,0 +1,184 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+from colordetect.cache import file_identity
+from colordetect.engine import load_preview
+
+# "auto" tries circles first and falls back to blobs
+WELL_METHODS = ("auto", "circles", "blobs")
+
+# Sidecar next to the series holding the wells found on its reference image
+WELLS_FILE_NAME = ".colordetect_wells.json"
+
+# Longest side the reference image is decoded at for detection
+DETECT_SIZE = 1024
+
+# Part of each well's width and height an ROI covers, so rims and the plate
+# around round wells stay out of the means
+ROI_FRACTION = 0.7
+
+# Blobs this far from the median well area are not wells (plate body, specks)
+AREA_RANGE = (0.25, 4.0)
+
+# A detection is only taken as a plate with at least MIN_WELLS wells whose
+# median side is MIN_WELL_SIZE of the image's longer side or more, and of which
+# ALIGNED_FRACTION share a row and a column with another well. Photos that are
+# not plates (Pics/pic_7.jpg, photo.jpg, Multiple_obj.jpg) fail these.
+MIN_WELLS = 6
+MIN_WELL_SIZE = 0.015
+ALIGNED_FRACTION = 0.9
+
+
+def find_circles(image):
+    """(N, 3) x, y, radius of the round wells found by a Hough transform."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    size = max(gray.shape)
+    min_radius = max(4, size // 100)
+    circles = cv2.HoughCircles(
+        cv2.GaussianBlur(gray, (5, 5), 0), cv2.HOUGH_GRADIENT_ALT, dp=1.5, minDist=2 * min_radius,
+        param1=100, param2=0.8, minRadius=min_radius, maxRadius=size // 6,
+    )
+    return np.zeros((0, 3)) if circles is None else circles[0]
+
+
+def find_blobs(image):
+    """(N, 4) x, y, w, h of the regions that differ from the plate colour.
+
+    The plate colour is the median of the image border. Colour edges split
+    wells that touch, so a blue well next to an empty one is two blobs.
+    """
+    border = np.concatenate([image[0], image[-1], image[:, 0], image[:, -1]])
+    plate = np.median(border, axis=0)
+    distance = cv2.absdiff(image, np.full_like(image, plate.round().astype(np.uint8))).max(axis=2)
+    _, foreground = cv2.threshold(distance, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    edges = cv2.dilate(cv2.Canny(image, 50, 150), np.ones((3, 3), np.uint8))
+    foreground = cv2.bitwise_and(foreground, cv2.bitwise_not(edges))
+    count, _, stats, _ = cv2.connectedComponentsWithStats(foreground, connectivity=4)
+    stats = stats[1:]
+    # Ignore specks before taking the typical well size
+    stats = stats[stats[:, cv2.CC_STAT_AREA] >= image.shape[0] * image.shape[1] // 10000]
+    if not len(stats):
+        return np.zeros((0, 4), int)
+    area = stats[:, cv2.CC_STAT_AREA]
+    typical = np.median(area)
+    keep = (area >= typical * AREA_RANGE[0]) & (area <= typical * AREA_RANGE[1])
+    return stats[keep, :4]
+
+
+def sort_wells(rects):
+    """rects in reading order: rows top to bottom, each row left to right.
+
+    A well starts a new row when its centre is more than half the median
+    well height below the centre of the row being filled.
+    """
+    rects = np.asarray(rects, dtype=float).reshape(-1, 4)
+    if not len(rects):
+        return rects
+    centres = rects[:, :2] + rects[:, 2:] / 2
+    gap = np.median(rects[:, 3]) / 2
+    rows, row = [], []
+    for i in np.argsort(centres[:, 1], kind="stable"):
+        if row and centres[i, 1] - centres[row, 1].mean() > gap:
+            rows.append(row)
+            row = []
+        row.append(i)
+    rows.append(row)
+    order = [i for row in rows for i in sorted(row, key=lambda i: centres[i, 0])]
+    return rects[order]
+
+
+def grid_alignment(wells):
+    """Fraction of wells whose centre shares a row and a column with another well's."""
+    wells = np.asarray(wells, dtype=float).reshape(-1, 4)
+    if not len(wells):
+        return 0.0
+    centres = wells[:, :2] + wells[:, 2:] / 2
+    half_w, half_h = np.median(wells[:, 2:], axis=0) / 2
+    # Every well is its own row and column mate, hence > 1
+    row_mates = (np.abs(centres[:, None, 1] - centres[None, :, 1]) <= half_h).sum(axis=1) > 1
+    col_mates = (np.abs(centres[:, None, 0] - centres[None, :, 0]) <= half_w).sum(axis=1) > 1
+    return float((row_mates & col_mates).mean())
+
+
+def plausible_wells(wells, shape):
+    """Whether (N, 4) detected wells in an image of this shape look like a plate."""
+    wells = np.asarray(wells, dtype=float).reshape(-1, 4)
+    if len(wells) < MIN_WELLS:
+        return False
+    if np.median(wells[:, 2:].min(axis=1)) < MIN_WELL_SIZE * max(shape[:2]):
+        return False
+    return grid_alignment(wells) >= ALIGNED_FRACTION
+
+
+def detect_wells(image, method="auto"):
+    """(x, y, w, h) ROI inside every well of a BGR image, row by row.
+
+    circles finds round wells with a Hough transform, blobs any wells that
+    stand out from the plate; auto tries circles, then blobs. A detection
+    that fails plausible_wells() is dropped, so an image that is not a plate
+    gives []. Each ROI is the central ROI_FRACTION of its well.
+    """
+    if method not in WELL_METHODS:
+        raise ValueError(f"method must be one of {WELL_METHODS}, got {method!r}")
+    wells = np.zeros((0, 4))
+    for finder in ("circles", "blobs"):
+        if method not in ("auto", finder):
+            continue
+        if finder == "circles":
+            x, y, r = find_circles(image).T
+            found = np.column_stack([x - r, y - r, 2 * r, 2 * r])
+        else:
+            found = find_blobs(image).astype(float)
+        if plausible_wells(found, image.shape):
+            wells = found
+            break
+    wells = sort_wells(wells)
+    size = wells[:, 2:] * ROI_FRACTION
+    corner = wells[:, :2] + (wells[:, 2:] - size) / 2
+    return [tuple(r) for r in np.column_stack([corner, size]).round().astype(int).tolist()]
+
+
+def _read_sidecar(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def locate_wells(file_name, method="auto", cache=True):
+    """Well ROIs of a series in full resolution pixels, from its reference image.
+
+    The image is decoded at about DETECT_SIZE pixels. The result is kept in
+    a WELLS_FILE_NAME sidecar next to the image and reused while the image
+    and method are unchanged, so re-opening a series does not detect again.
+    Returns None if the image cannot be read, [] if no plate was found.
+    """
+    identity = file_identity(file_name)
+    if identity is None:
+        return None
+    sidecar = os.path.join(os.path.dirname(identity[0]), WELLS_FILE_NAME)
+    key = {
+        "reference": identity[0], "mtime_ns": identity[1], "size": identity[2], "method": method,
+        "checks": [MIN_WELLS, MIN_WELL_SIZE, ALIGNED_FRACTION],
+    }
+    if cache:
+        saved = _read_sidecar(sidecar)
+        if all(saved.get(k) == v for k, v in key.items()) and "rois" in saved:
+            return [tuple(roi) for roi in saved["rois"]]
+
+    image, scale = load_preview(file_name, DETECT_SIZE, DETECT_SIZE)
+    if image is None:
+        return None
+    rois = [tuple(int(round(v / scale)) for v in roi) for roi in detect_wells(image, method)]
+    if cache:
+        try:
+            with open(sidecar, "w") as f:
+                json.dump(dict(key, rois=[list(roi) for roi in rois]), f, indent=2)
+        except OSError:
+            # A read-only series is detected again next time
+            pass
+    return rois
@@ -1,12 +1,13 @@
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from statsmodels.nonparametric.smoothers_lowess import lowess
+from colordetect.table import read_table
 
-# Load data from CSV file
+# Load data from a CSV, Parquet or Feather file
 file_path = 'roi_stats.csv'  # Update with your CSV file path
 columns_to_read = ['Avg R', 'Avg G', 'Avg B']  # Update with your column names
-df = pd.read_csv(file_path, usecols=columns_to_read)
+# Parquet/Feather only read the selected columns from disk
+df = read_table(file_path, columns=columns_to_read)
 
 # Define colors for each column
 colors = ['red', 'green', 'blue']
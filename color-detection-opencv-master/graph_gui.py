@@ -1,15 +1,18 @@
 import sys
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
+from colordetect.lazy import LazyModule
+from colordetect.table import read_table
 from PyQt6.QtWidgets import (
     QApplication, QFileDialog, QInputDialog, QMessageBox
 )
 
+# pyplot is imported when the first plot is opened, not at start-up
+plt = LazyModule("matplotlib.pyplot")
+
 def select_data_file():
     dialog = QFileDialog()
     dialog.setFileMode(QFileDialog.FileMode.ExistingFile)
-    dialog.setNameFilter("Data Files (*.csv *.xlsx)")
+    dialog.setNameFilter("Data Files (*.csv *.xlsx *.parquet *.feather)")
     if dialog.exec():
         return dialog.selectedFiles()[0]
     return None
@@ -38,10 +41,8 @@ def main():
         return
 
     try:
-        if file_path.endswith(".csv"):
-            df = pd.read_csv(file_path)
-        elif file_path.endswith(".xlsx"):
-            df = pd.read_excel(file_path)
+        if file_path.endswith((".csv", ".xlsx", ".parquet", ".feather")):
+            df = read_table(file_path)
         else:
             raise ValueError("Unsupported file type.")
     except Exception as e:
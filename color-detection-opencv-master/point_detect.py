@@ -1,13 +1,15 @@
 import sys
-import pandas as pd
+from colordetect.lazy import LazyModule
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QPushButton, QFileDialog,
     QLabel, QComboBox, QMessageBox
 )
 from PyQt6.QtCore import Qt
 
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
+from colordetect.qtwidgets import PlotCanvas
+
+# pandas loads on first use, not at start-up
+pd = LazyModule("pandas")
 
 
 class CSVAnalyzer(QWidget):
@@ -42,8 +44,7 @@ class CSVAnalyzer(QWidget):
         self.layout.addWidget(self.result_label)
 
         # Matplotlib Figure
-        self.figure = Figure(figsize=(5, 3))
-        self.canvas = FigureCanvas(self.figure)
+        self.canvas = PlotCanvas(figsize=(5, 3))
         self.layout.addWidget(self.canvas)
 
         self.setLayout(self.layout)
@@ -58,8 +59,7 @@ class CSVAnalyzer(QWidget):
                 self.combo.setEnabled(True)
                 self.analyze_button.setEnabled(True)
                 self.result_label.setText("")
-                self.figure.clear()
-                self.canvas.draw()
+                self.canvas.clear()
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to load CSV:\n{str(e)}")
 
@@ -84,8 +84,8 @@ class CSVAnalyzer(QWidget):
         self.plot_data(data)
 
     def plot_data(self, data):
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
+        self.canvas.figure.clear()
+        ax = self.canvas.figure.add_subplot(111)
 
         ax.plot(data, label='Data', color='blue')
 
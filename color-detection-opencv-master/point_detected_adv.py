@@ -5,11 +5,14 @@ from PyQt6.QtWidgets import (
     QMessageBox, QAbstractItemView
 )
 from PyQt6.QtCore import Qt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import pandas as pd
+from colordetect.qtwidgets import PlotCanvas
+from colordetect.lazy import LazyModule
 import sys
 
+# pandas loads on first use, not at start-up
+pd = LazyModule("pandas")
+
+
 class CSVAnalyzer(QWidget):
     def __init__(self):
         super().__init__()
@@ -68,8 +71,7 @@ class CSVAnalyzer(QWidget):
 
 
         # --- Plot below ---
-        self.figure = Figure()
-        self.canvas = FigureCanvas(self.figure)
+        self.canvas = PlotCanvas()
         main_layout.addWidget(self.canvas)
 
         self.setLayout(main_layout)
@@ -85,8 +87,7 @@ class CSVAnalyzer(QWidget):
                 self.column_list.setEnabled(True)
                 self.analyze_button.setEnabled(True)
                 self.result_label.setText("Columns loaded. Select and analyze.")
-                self.figure.clear()
-                self.canvas.draw()
+                self.canvas.clear()
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to load CSV:\n{str(e)}")
 
@@ -98,8 +99,8 @@ class CSVAnalyzer(QWidget):
             QMessageBox.warning(self, "No Column Selected", "Please select at least one column.")
             return
 
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
+        self.canvas.figure.clear()
+        ax = self.canvas.figure.add_subplot(111)
         results = []
 
         for col in selected_columns:
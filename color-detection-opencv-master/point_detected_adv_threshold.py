@@ -2,14 +2,19 @@ from PyQt6.QtGui import QGuiApplication
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
     QFileDialog, QLabel, QListWidget, QListWidgetItem,
-    QMessageBox, QAbstractItemView, QLineEdit
+    QMessageBox, QAbstractItemView, QLineEdit, QSpinBox, QCheckBox
 )
 from PyQt6.QtCore import Qt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import pandas as pd
+from colordetect.qtwidgets import PlotCanvas
+import numpy as np
+from colordetect.lazy import LazyModule
+from colordetect.crossing import first_crossings, smooth_frames, to_frames
+from colordetect.table import read_table
 import sys
 
+# pandas loads on first use, not at start-up
+pd = LazyModule("pandas")
+
 
 class CSVAnalyzer(QWidget):
     def __init__(self):
@@ -39,6 +44,24 @@ class CSVAnalyzer(QWidget):
         top_row.addWidget(QLabel("Threshold:"))
         top_row.addWidget(self.threshold_input)
 
+        # Optional lower level for hysteresis: once above threshold, only a drop below this ends a run
+        self.rearm_input = QLineEdit()
+        self.rearm_input.setPlaceholderText("optional")
+        self.rearm_input.setFixedWidth(100)
+        top_row.addWidget(QLabel("Re-arm below:"))
+        top_row.addWidget(self.rearm_input)
+
+        # Frames the signal has to stay above threshold
+        self.sustain_input = QSpinBox()
+        self.sustain_input.setRange(1, 10000)
+        top_row.addWidget(QLabel("Sustain frames:"))
+        top_row.addWidget(self.sustain_input)
+
+        self.smooth_checkbox = QCheckBox("Smooth (LOWESS)")
+        top_row.addWidget(self.smooth_checkbox)
+        self.interpolate_checkbox = QCheckBox("Sub-frame")
+        top_row.addWidget(self.interpolate_checkbox)
+
         # Analyze button
         self.analyze_button = QPushButton("📊 Analyze Selected Columns")
         self.analyze_button.setEnabled(False)
@@ -76,25 +99,24 @@ class CSVAnalyzer(QWidget):
         main_layout.addLayout(second_row)
 
         # --- Plot area ---
-        self.figure = Figure()
-        self.canvas = FigureCanvas(self.figure)
+        self.canvas = PlotCanvas()
         main_layout.addWidget(self.canvas)
 
         self.setLayout(main_layout)
 
     def browse_csv(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, "Open CSV File", "", "CSV Files (*.csv)")
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open CSV File", "",
+                                                   "Data Files (*.csv *.parquet *.feather)")
         if file_path:
             try:
-                self.df = pd.read_csv(file_path)
+                self.df = read_table(file_path)
                 self.column_list.clear()
                 for col in self.df.columns:
                     self.column_list.addItem(QListWidgetItem(col))
                 self.column_list.setEnabled(True)
                 self.analyze_button.setEnabled(True)
                 self.result_label.setText("Columns loaded. Select and analyze.")
-                self.figure.clear()
-                self.canvas.draw()
+                self.canvas.clear()
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to load CSV:\n{str(e)}")
 
@@ -113,32 +135,58 @@ class CSVAnalyzer(QWidget):
             QMessageBox.warning(self, "Invalid Threshold", "Please enter a valid numeric threshold.")
             return
 
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
+        rearm = None
+        if self.rearm_input.text().strip():
+            try:
+                rearm = float(self.rearm_input.text())
+            except ValueError:
+                QMessageBox.warning(self, "Invalid Re-arm Level", "Please enter a valid numeric re-arm level.")
+                return
+            if rearm > threshold:
+                QMessageBox.warning(self, "Invalid Re-arm Level", "The re-arm level must not be above the threshold.")
+                return
+        sustain = self.sustain_input.value()
+        smooth = self.smooth_checkbox.isChecked()
+
+        self.canvas.figure.clear()
+        ax = self.canvas.figure.add_subplot(111)
         results = []
 
+        # All selected columns side by side, NaN-padded, so detection is one pass over the array
+        series = {}
         for col in selected_columns:
             try:
-                data = pd.to_numeric(self.df[col], errors='coerce').dropna().reset_index(drop=True)
-                detected_index = None
-
-                for i in range(len(data)):
-                    if data[i] > threshold:
-                        detected_index = i
-                        break
-
-                ax.plot(data, label=col)
-
-                if detected_index is not None:
-                    ax.plot(detected_index, data[detected_index], 'ro', markersize=8)
-                    results.append(
-                        f"<b>{col}</b>: First value &gt; {threshold} at index {detected_index}, Value = {data[detected_index]:.2f}"
-                    )
-                else:
-                    results.append(f"<b>{col}</b>: No value &gt; {threshold} found.")
-
+                series[col] = pd.to_numeric(self.df[col], errors='coerce').dropna().to_numpy()
             except Exception as e:
                 results.append(f"<b>{col}</b>: Error - {str(e)}")
+        frames = to_frames(series.values())
+        signal = smooth_frames(frames, frac=0.3) if smooth else frames
+        indices, positions = first_crossings(
+            signal, threshold, rearm=rearm, sustain=sustain, interpolate=self.interpolate_checkbox.isChecked()
+        )
+
+        condition = f"&gt; {threshold}"
+        if sustain > 1:
+            condition += f" for {sustain} frames"
+        if smooth:
+            condition += " (smoothed)"
+        for j, col in enumerate(series):
+            data = series[col]
+            line, = ax.plot(data, label=col)
+            if smooth:
+                ax.plot(signal[:len(data), j], color=line.get_color(), linestyle='--')
+
+            detected_index = indices[j]
+            if detected_index >= 0:
+                position = positions[j]
+                value = np.interp(position, np.arange(len(data)), signal[:len(data), j])
+                ax.plot(position, value, 'ro', markersize=8)
+                at = f"index {detected_index}" if position == detected_index else f"index {position:.2f}"
+                results.append(
+                    f"<b>{col}</b>: First value {condition} at {at}, Value = {signal[detected_index, j]:.2f}"
+                )
+            else:
+                results.append(f"<b>{col}</b>: No value {condition} found.")
 
         ax.set_title(f"Columns with Values > {threshold}")
         ax.set_xlabel("Index")
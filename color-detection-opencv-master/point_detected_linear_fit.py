@@ -1,13 +1,15 @@
 import sys
-import pandas as pd
-import statsmodels.api as sm
+from colordetect.lazy import LazyModule
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
     QFileDialog, QLabel, QMessageBox
 )
 from PyQt6.QtGui import QGuiApplication
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
+from colordetect.qtwidgets import PlotCanvas
+
+# pandas and statsmodels load on first use, not at start-up
+pd = LazyModule("pandas")
+sm = LazyModule("statsmodels.api")
 
 
 class RegressionApp(QWidget):
@@ -36,8 +38,7 @@ class RegressionApp(QWidget):
         layout.addLayout(button_row)
 
         # Matplotlib area
-        self.figure = Figure()
-        self.canvas = FigureCanvas(self.figure)
+        self.canvas = PlotCanvas()
         layout.addWidget(self.canvas)
 
         # Summary label
@@ -69,8 +70,7 @@ class RegressionApp(QWidget):
                 raise ValueError("File must contain 'concentration' and 'Point' columns.")
             self.summary_label.setText("Data loaded. Click 'Fit Linear Model' to continue.")
             self.fit_button.setEnabled(True)
-            self.figure.clear()
-            self.canvas.draw()
+            self.canvas.clear()
         except Exception as e:
             QMessageBox.critical(self, "Error Loading Data", str(e))
 
@@ -82,8 +82,8 @@ class RegressionApp(QWidget):
             X = sm.add_constant(x)
             model = sm.OLS(y, X).fit()
 
-            self.figure.clear()
-            ax = self.figure.add_subplot(111)
+            self.canvas.figure.clear()
+            ax = self.canvas.figure.add_subplot(111)
             ax.scatter(x, y, label="Data", color='blue')
             ax.plot(x, model.predict(X), color='red', label="Linear Fit")
             ax.set_xlabel("Point")
@@ -1,14 +1,17 @@
 import sys
-import pandas as pd
-import statsmodels.api as sm
+from colordetect.lazy import LazyModule
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QFileDialog, QLabel, QMessageBox, QComboBox
+    QFileDialog, QLabel, QMessageBox, QComboBox, QListWidget, QAbstractItemView, QCheckBox
 )
 from PyQt6.QtGui import QGuiApplication
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
+from colordetect.qtwidgets import PlotCanvas
 import numpy as np
+from colordetect.regression import LinearFit, linear_fit
+
+# pandas and statsmodels load on first use, not at start-up
+pd = LazyModule("pandas")
+sm = LazyModule("statsmodels.api")
 
 
 class RegressionApp(QWidget):
@@ -49,15 +52,21 @@ class RegressionApp(QWidget):
         selector_row.addWidget(self.x_col_selector)
 
         selector_row.addWidget(QLabel("Y (Concentration):"))
-        self.y_col_selector = QComboBox()
+        # Several Y columns are fitted against the same X in one go
+        self.y_col_selector = QListWidget()
+        self.y_col_selector.setSelectionMode(QAbstractItemView.SelectionMode.MultiSelection)
+        self.y_col_selector.setFixedHeight(80)
         self.y_col_selector.setEnabled(False)
         selector_row.addWidget(self.y_col_selector)
 
+        # Full statsmodels report instead of the quick closed-form fit
+        self.detailed_checkbox = QCheckBox("Detailed (statsmodels)")
+        selector_row.addWidget(self.detailed_checkbox)
+
         layout.addLayout(selector_row)
 
         # Plotting area
-        self.figure = Figure()
-        self.canvas = FigureCanvas(self.figure)
+        self.canvas = PlotCanvas()
         layout.addWidget(self.canvas)
 
         # Summary label
@@ -94,13 +103,13 @@ class RegressionApp(QWidget):
             columns = list(self.df.columns)
             self.x_col_selector.addItems(columns)
             self.y_col_selector.addItems(columns)
+            self.y_col_selector.setCurrentRow(0)
             self.x_col_selector.setEnabled(True)
             self.y_col_selector.setEnabled(True)
 
             self.fit_button.setEnabled(True)
             self.save_button.setEnabled(False)
-            self.figure.clear()
-            self.canvas.draw()
+            self.canvas.clear()
             self.summary_label.setText("Data loaded. Select columns and click 'Fit Linear Model'.")
         except Exception as e:
             QMessageBox.critical(self, "Error Loading Data", str(e))
@@ -108,42 +117,60 @@ class RegressionApp(QWidget):
     def fit_data(self):
         try:
             x_col = self.x_col_selector.currentText()
-            y_col = self.y_col_selector.currentText()
+            y_cols = [item.text() for item in self.y_col_selector.selectedItems()]
 
-            if not x_col or not y_col:
+            if not x_col or not y_cols:
                 raise ValueError("Please select both X and Y columns.")
 
             x = self.df[x_col]
             #y = self.df[y_col]
-            y_raw = self.df[y_col]
-            if (y_raw <= 0).any():
+            y_raw = self.df[y_cols]
+            if (y_raw <= 0).any().any():
                 raise ValueError("Y values must be positive for log10 transformation.")
             y = np.log10(y_raw)
 
-            if x.isnull().any() or y.isnull().any():
+            if x.isnull().any() or y.isnull().any().any():
                 raise ValueError("Data contains missing values. Please clean your data.")
 
-            X = sm.add_constant(x)
-            model = sm.OLS(y, X).fit()
-
-            self.figure.clear()
-            ax = self.figure.add_subplot(111)
-            ax.scatter(x, y, label="Data", color='blue')
-            ax.plot(x, model.predict(X), color='red', label="Linear Fit")
-
-            # Compose equation and summary
-            equation = f"y = {model.params[x_col]:.2f}x + {model.params['const']:.2f}"
-            summary = (
-                f"R² = {model.rsquared:.4f}\n"
-                f"Intercept = {model.params['const']:.4f}\n"
-                f"Slope = {model.params[x_col]:.4f}\n"
-                f"p = {model.pvalues[x_col]:.4g}"
-            )
+            if self.detailed_checkbox.isChecked():
+                fit, details = self.fit_statsmodels(x, y)
+            else:
+                # Closed-form fit of every Y column at once
+                fit, details = linear_fit(x.to_numpy(dtype=float), y.to_numpy(dtype=float)), []
+
+            self.canvas.figure.clear()
+            ax = self.canvas.figure.add_subplot(111)
+            single = len(y_cols) == 1
+            annotations = []
+            summary_text = "<b>Linear Fit Summary:</b><br>"
+            for j, y_col in enumerate(y_cols):
+                slope, intercept = fit.slope[j], fit.intercept[j]
+                scatter = ax.scatter(x, y[y_col], label="Data" if single else y_col,
+                                     color='blue' if single else None)
+                ax.plot(x, slope * x + intercept, color='red' if single else scatter.get_facecolor()[0],
+                        label="Linear Fit" if single else f"{y_col} fit")
+
+                # Compose equation and summary
+                equation = f"y = {slope:.2f}x + {intercept:.2f}"
+                summary = (
+                    f"R² = {fit.r2[j]:.4f}\n"
+                    f"Intercept = {intercept:.4f}\n"
+                    f"Slope = {slope:.4f}\n"
+                    f"p = {fit.p[j]:.4g}"
+                )
+                annotations.append(f"{equation}\n{summary}" if single else f"{y_col}: {equation}, R² = {fit.r2[j]:.4f}")
+                summary_text += (
+                    ("" if single else f"<b>{y_col}</b><br>")
+                    + f"R²: {fit.r2[j]:.4f}<br>"
+                    f"Intercept: {intercept:.4f}<br>"
+                    f"Slope ({x_col}): {slope:.4f}<br>"
+                    f"p-value: {fit.p[j]:.4g}<br>"
+                )
 
             # Annotate bottom-left inside plot
             ax.text(
                 0.05, 0.05,
-                f"{equation}\n{summary}",
+                "\n".join(annotations),
                 transform=ax.transAxes,
                 fontsize=10,
                 verticalalignment='bottom',
@@ -153,25 +180,34 @@ class RegressionApp(QWidget):
 
             ax.set_xlabel(x_col)
             #ax.set_ylabel(y_col)
-            ax.set_ylabel(f"log10({y_col})")
+            ax.set_ylabel(f"log10({y_cols[0]})" if single else "log10(Y)")
             ax.set_title("Linear Regression")
             ax.legend()
             ax.grid(True)
             self.canvas.draw()
 
-            summary_text = (
-                f"<b>Linear Fit Summary:</b><br>"
-                f"R²: {model.rsquared:.4f}<br>"
-                f"Intercept: {model.params['const']:.4f}<br>"
-                f"Slope ({x_col}): {model.params[x_col]:.4f}<br>"
-                f"p-value: {model.pvalues[x_col]:.4g}<br>"
-            )
+            for text in details:
+                summary_text += f"<pre>{text}</pre>"
             self.summary_label.setText(summary_text)
             self.save_button.setEnabled(True)
 
         except Exception as e:
             QMessageBox.critical(self, "Error Fitting Model", str(e))
 
+    def fit_statsmodels(self, x, y):
+        """statsmodels OLS per Y column; returns the same fields as linear_fit plus the full summaries."""
+        X = sm.add_constant(x)
+        models = [sm.OLS(y[col], X).fit() for col in y.columns]
+        fit = LinearFit(
+            slope=np.array([m.params[x.name] for m in models]),
+            intercept=np.array([m.params['const'] for m in models]),
+            r2=np.array([m.rsquared for m in models]),
+            p=np.array([m.pvalues[x.name] for m in models]),
+            stderr=np.array([m.bse[x.name] for m in models]),
+            n=np.array([int(m.nobs) for m in models]),
+        )
+        return fit, [m.summary().as_text() for m in models]
+
 
     def save_plot(self):
         try:
@@ -179,7 +215,7 @@ class RegressionApp(QWidget):
                 self, "Save Plot", "", "PNG Files (*.png);;All Files (*)"
             )
             if path:
-                self.figure.savefig(path)
+                self.canvas.figure.savefig(path)
         except Exception as e:
             QMessageBox.critical(self, "Error Saving Plot", str(e))
 
@@ -0,0 +1,15 @@
+from colordetect import cache
+from colordetect.engine import PipelineConfig
+
+
+def test_config_key_ignores_presentation_only_fields():
+    config = PipelineConfig(mode="roi")
+    assert cache.config_key(config) == cache.config_key(PipelineConfig(mode="roi", annotate=False))
+    assert cache.config_key(config) != cache.config_key(PipelineConfig(mode="objects"))
+
+
+def test_config_key_changes_with_cache_version(monkeypatch):
+    config = PipelineConfig(mode="roi")
+    key = cache.config_key(config)
+    monkeypatch.setattr(cache, "CACHE_VERSION", cache.CACHE_VERSION + 1)
+    assert cache.config_key(config) != key
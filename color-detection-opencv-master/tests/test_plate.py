@@ -0,0 +1,42 @@
+import cv2
+import numpy as np
+import pytest
+
+from colordetect.plate import PlateTemplate, well_labels, well_stats
+
+HEIGHT, WIDTH = 600, 900
+
+TEMPLATES = [
+    PlateTemplate.standard(96, 60, (50, 40), shape="circle"),
+    PlateTemplate.standard(96, 60.3, (50.2, 40.7), well_size=(40.5, 30.2), shape="rect"),
+    PlateTemplate.standard(96, 60, (80, 60), shape="rect", rotation=10),
+    PlateTemplate.standard(24, 70, (40, 30), shape="circle", rotation=-7),
+    # Partly outside the frame
+    PlateTemplate.standard(96, 80, (30, 20), shape="circle"),
+]
+
+
+def brute_force_means(image, template):
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    labels, _, _ = well_labels(template, *image.shape[:2])
+    means = np.full((len(template), 7), np.nan)
+    for i in range(len(template)):
+        inside = labels == i + 1
+        if inside.any():
+            b, g, r = image[inside].mean(axis=0)
+            h, s, v = hsv[inside].mean(axis=0)
+            means[i] = [b, h, s, v, r, g, b]
+    return means
+
+
+@pytest.mark.parametrize("template", TEMPLATES)
+def test_well_stats_match_label_pixels(template):
+    image = np.random.default_rng(0).integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    np.testing.assert_allclose(well_stats(image, template), brute_force_means(image, template), rtol=1e-9)
+
+
+def test_label_boxes_cover_every_well_pixel():
+    template = TEMPLATES[0]
+    labels, bbox, area = well_labels(template, HEIGHT, WIDTH)
+    for i, (x, y, w, h) in enumerate(bbox, 1):
+        assert (labels[y:y + h, x:x + w] == i).sum() == area[i - 1] == (labels == i).sum()
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from colordetect.regression import linear_fit, t_pvalue
+
+
+def test_t_pvalue_scalar_matches_array():
+    scalar = t_pvalue(2.0, 10)
+    assert np.ndim(scalar) == 0
+    assert scalar == pytest.approx(t_pvalue([2.0], [10])[0])
+    # Two-sided p of t = 2 with 10 degrees of freedom
+    assert scalar == pytest.approx(0.0733880347707, rel=1e-9)
+
+
+def test_t_pvalue_edge_cases():
+    assert t_pvalue(np.inf, 5) == 0.0
+    assert np.isnan(t_pvalue(1.0, 0))
+    assert t_pvalue(0.0, 5) == pytest.approx(1.0)
+
+
+def test_linear_fit_matches_polyfit():
+    x = np.arange(10.0)
+    y = np.column_stack([3 * x + 1 + np.sin(x), -x])
+    fit = linear_fit(x, y)
+    for j in range(y.shape[1]):
+        slope, intercept = np.polyfit(x, y[:, j], 1)
+        assert fit.slope[j] == pytest.approx(slope)
+        assert fit.intercept[j] == pytest.approx(intercept)
+
+
+def test_two_points_have_no_p_value():
+    fit = linear_fit([1.0, 2.0], [3.0, 5.0])
+    assert fit.slope == pytest.approx(2.0)
+    assert np.isnan(fit.p)
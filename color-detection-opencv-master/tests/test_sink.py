@@ -0,0 +1,38 @@
+import pytest
+
+from colordetect.sink import CsvSink, result_header
+
+
+def _row(image, file_name):
+    return [image, 1, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, file_name]
+
+
+def test_resume_keeps_completed_files(tmp_path):
+    path = str(tmp_path / "out.csv")
+    metadata = {"mode": "roi", "rois": [(0, 0, 10, 10)], "files": ["a.jpg"]}
+    with CsvSink(path, result_header("roi"), metadata=metadata) as sink:
+        sink.write([_row(1, "a.jpg"), _row(2, "b.jpg")])
+    # Adding images is not a change of settings
+    metadata = dict(metadata, files=["a.jpg", "b.jpg", "c.jpg"])
+    with CsvSink(path, result_header("roi"), resume=True, metadata=metadata) as sink:
+        # b.jpg was the last file and may have been cut short
+        assert sink.completed_files == {"a.jpg"}
+
+
+def test_resume_with_other_settings_is_refused(tmp_path):
+    path = str(tmp_path / "out.csv")
+    with CsvSink(path, result_header("roi"), metadata={"mode": "roi", "rotate": False}) as sink:
+        sink.write([_row(1, "a.jpg")])
+    with pytest.raises(ValueError, match="rotate"):
+        CsvSink(path, result_header("roi"), resume=True, metadata={"mode": "roi", "rotate": True})
+    # The refused resume left the rows in place
+    with open(path) as f:
+        assert len(f.readlines()) == 2
+
+
+def test_resume_with_other_columns_is_refused(tmp_path):
+    path = str(tmp_path / "out.csv")
+    with CsvSink(path, result_header("objects")) as sink:
+        sink.write([_row(1, "a.jpg")])
+    with pytest.raises(ValueError, match="columns"):
+        CsvSink(path, result_header("roi"), resume=True)
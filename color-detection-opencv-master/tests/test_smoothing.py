@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from colordetect.smoothing import lowess_uniform
+
+lowess = pytest.importorskip("statsmodels.nonparametric.smoothers_lowess").lowess
+
+
+def reference(y, frac=0.3, it=3, delta=0.0):
+    x = np.arange(y.shape[-1])
+    return np.array([lowess(row, x, frac=frac, it=it, delta=delta)[:, 1] for row in y])
+
+
+@pytest.mark.parametrize("n", [5, 50, 301])
+def test_default_matches_statsmodels(n):
+    y = np.cumsum(np.random.default_rng(n).normal(size=(3, n)), axis=1)
+    y[1, ::7] += 30  # outliers for the robustness iterations
+    np.testing.assert_allclose(lowess_uniform(y), reference(y), atol=1e-9)
+
+
+@pytest.mark.parametrize("n, delta", [(500, 5.0), (997, 7.5), (3000, 30.0)])
+def test_delta_matches_statsmodels(n, delta):
+    y = np.cumsum(np.random.default_rng(n).normal(size=(3, n)), axis=1)
+    y[2, ::11] -= 25
+    np.testing.assert_allclose(lowess_uniform(y, delta=delta), reference(y, delta=delta), atol=1e-9)
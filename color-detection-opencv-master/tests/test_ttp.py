@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from colordetect.crossing import smooth_frames
+from colordetect.ttp import CrossingConfig, file_crossings, well_series
+
+
+def test_missing_frame_keeps_crossing_position(tmp_path):
+    values = [10, 20, np.nan, 40, 50, 60]
+    wide = pd.DataFrame({"ROI1 Blue Intensity": values})
+    path = tmp_path / "wide.csv"
+    wide.to_csv(path, index=False)
+    rows = file_crossings(str(path), CrossingConfig(threshold=35))
+    assert rows[0][2] == 3
+    assert rows[0][3] == 3.0
+
+
+def test_long_table_without_row_for_failed_image(tmp_path):
+    # Image 3 failed and has no row at all
+    long = pd.DataFrame({
+        "Image Index": [1, 2, 4, 5, 6],
+        "ROI Index": [1] * 5,
+        "Blue Intensity": [10, 20, 40, 50, 60],
+    })
+    series = well_series(long, "Blue Intensity")
+    np.testing.assert_array_equal(series[1], [10, 20, np.nan, 40, 50, 60])
+
+    path = tmp_path / "long.csv"
+    long.to_csv(path, index=False)
+    rows = file_crossings(str(path), CrossingConfig(threshold=35, interval=2.0))
+    assert rows[0][2] == 3
+    assert rows[0][3] == 6.0
+
+
+def test_smoothing_skips_gaps():
+    frames = np.column_stack([np.arange(20.0), np.arange(20.0)])
+    frames[5, 1] = np.nan
+    smoothed = smooth_frames(frames)
+    assert np.isnan(smoothed[5, 1])
+    assert not np.isnan(np.delete(smoothed[:, 1], 5)).any()
+    np.testing.assert_allclose(smoothed[:, 0], np.arange(20.0))